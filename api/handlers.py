@@ -1,5 +1,5 @@
 from piston.handler import BaseHandler, rc
-from systems.models import System, SystemRack,SystemStatus,NetworkAdapter,KeyValue,ScheduledTask
+from systems.models import System, SystemRack,SystemStatus,NetworkAdapter,KeyValue,ScheduledTask,SystemNic
 from truth.models import Truth, KeyValue as TruthKeyValue
 from dhcp.DHCP import DHCP as DHCPInterface
 from dhcp.models import DHCP
@@ -315,95 +315,42 @@ class KeyValueHandler(BaseHandler):
                     #tmp_list = list(set(tmp_list))
                 return tmp_list
             if key_type == 'adapters_by_system':
-                #Get keystores from truth that have dhcp.is_scope = True
                 system = System.objects.get(hostname=request.GET['system'])
-                keyvalue_pairs =
-                KeyValue.objects.filter(key__startswith='nic.').filter(obj=system).order_by('key')
-                #Iterate through the list and get all of the key/value pairs
-                tmp_dict = {}
-                adapter_ids = []
+                # Every nic number with a key is listed, with the values of
+                # its sub index 0 keys or '' for those it doesn't have
+                adapters = {}
+                for nic in SystemNic.objects.filter(system=system):
+                    if nic.sub_index == 0:
+                        adapters[nic.nic_number] = nic
+                    else:
+                        adapters.setdefault(nic.nic_number, SystemNic())
                 final_list = []
-                for kv in keyvalue_pairs:
-                    tmp_dict[kv.key] = kv.value
-                for k in tmp_dict.iterkeys():
-                    matches = re.match('nic\.(\d+).*',k)
-                    if matches.group is not None:
-                        if matches.group(1) not in adapter_ids:
-                            adapter_ids.append(matches.group(1))
-                adapter_ids.sort()
-                for a in adapter_ids:
-                    adapter_name = ''
-                    mac_address = ''
-                    dhcp_hostname = ''
-                    dhcp_filename = ''
-                    ipv4_address = ''
-                    option_domain_name = ''
-                    if 'nic.%s.ipv4_address.0' % a in tmp_dict:
-                        ipv4_address = tmp_dict['nic.%s.ipv4_address.0' % a]
-                    if 'nic.%s.name.0' % a in tmp_dict:
-                        adapter_name = tmp_dict['nic.%s.name.0' % a]
-                    if 'nic.%s.mac_address.0' % a in tmp_dict:
-                        mac_address = tmp_dict['nic.%s.mac_address.0' % a]
-                    if 'nic.%s.dhcp_hostname.0' % a in tmp_dict:
-                        dhcp_hostname = tmp_dict['nic.%s.dhcp_hostname.0' % a]
-                    if 'nic.%s.dhcp_filename.0' % a in tmp_dict:
-                        dhcp_filename = tmp_dict['nic.%s.dhcp_filename.0' % a]
-                    try:
-                        final_list.append({
-                            'system_hostname':system.hostname,
-                            'ipv4_address':ipv4_address,
-                            'adapter_name':adapter_name,
-                            'mac_address':mac_address,
-                            'dhcp_hostname':dhcp_hostname,
-                            'dhcp_filename':dhcp_filename}
-                            )
-                    except:
-                        pass
-                #tmp_list.append(tmp_dict)
+                # nic numbers sort as strings, as when they were parsed
+                # from the keys: nic 10 comes before nic 2
+                for nic_number in sorted(adapters, key=str):
+                    nic = adapters[nic_number]
+                    final_list.append({
+                        'system_hostname':system.hostname,
+                        'ipv4_address':nic.ipv4_address or '',
+                        'adapter_name':nic.name or '',
+                        'mac_address':nic.mac_address or '',
+                        'dhcp_hostname':nic.dhcp_hostname or '',
+                        'dhcp_filename':nic.dhcp_filename or ''}
+                        )
                 return final_list
             if key_type == 'adapters_by_system_and_scope':
-                #Get keystores from truth that have dhcp.is_scope = True
                 dhcp_scope = request.GET['dhcp_scope']
                 system = System.objects.get(hostname=request.GET['system'])
-                keyvalue_pairs =
-                KeyValue.objects.filter(key__startswith='nic.').filter(obj=system).order_by('key')
-                #Iterate through the list and get all of the key/value pairs
-                tmp_dict = {}
-                adapter_ids = []
+                nics = SystemNic.objects.filter(
+                    system=system, sub_index=0, dhcp_scope=dhcp_scope
+                )
                 final_list = []
-                for kv in keyvalue_pairs:
-                    tmp_dict[kv.key] = kv.value
-                for k in tmp_dict.iterkeys():
-                    matches = re.match('nic\.(\d+).*',k)
-                    if matches.group is not None:
-                        #if matches.group(1) not in adapter_ids and tmp_dict['nic.%s.dhcp_scope.0' % matches.group(1)] is not None and tmp_dict['nic.%s.dhcp_scope.0' % matches.group(1)] == dhcp_scope:
-                        dhcp_scope_match = 'nic.%s.dhcp_scope.0' % matches.group(1)
-                        if matches.group(1) not in adapter_ids and dhcp_scope_match in tmp_dict and tmp_dict[dhcp_scope_match] == dhcp_scope:
-                            adapter_ids.append(matches.group(1))
-                adapter_ids.sort()
-                for a in adapter_ids:
-                    adapter_name = ''
-                    mac_address = ''
-                    dhcp_hostname = ''
-                    dhcp_filename = ''
-                    dhcp_domain_name = ''
-                    ipv4_address = ''
-                    if 'nic.%s.ipv4_address.0' % a in tmp_dict:
-                        ipv4_address = tmp_dict['nic.%s.ipv4_address.0' % a]
-                    if 'nic.%s.name.0' % a in tmp_dict:
-                        adapter_name = tmp_dict['nic.%s.name.0' % a]
-                    if 'nic.%s.mac_address.0' % a in tmp_dict:
-                        mac_address = tmp_dict['nic.%s.mac_address.0' % a]
-                    if 'nic.%s.dhcp_hostname.0' % a in tmp_dict:
-                        dhcp_hostname = tmp_dict['nic.%s.dhcp_hostname.0' % a]
-                    if 'nic.%s.option_hostname.0' % a in tmp_dict:
-                        dhcp_hostname = tmp_dict['nic.%s.option_hostname.0' % a]
-                    if 'nic.%s.dhcp_filename.0' % a in tmp_dict:
-                        dhcp_filename = tmp_dict['nic.%s.dhcp_filename.0' % a]
-                    if 'nic.%s.dhcp_domain_name.0' % a in tmp_dict:
-                        dhcp_domain_name = tmp_dict['nic.%s.dhcp_domain_name.0' % a]
-                    final_list.append({'system_hostname':system.hostname, 'ipv4_address':ipv4_address,  'adapter_name':adapter_name, 'mac_address':mac_address, 'dhcp_hostname':dhcp_hostname, 'dhcp_filename':dhcp_filename, 'dhcp_domain_name':dhcp_domain_name})
-                #tmp_list.append(tmp_dict)
+                for nic in sorted(nics, key=lambda nic: str(nic.nic_number)):
+                    if nic.option_hostname is not None:
+                        dhcp_hostname = nic.option_hostname
+                    else:
+                        dhcp_hostname = nic.dhcp_hostname or ''
+                    final_list.append({'system_hostname':system.hostname, 'ipv4_address':nic.ipv4_address or '',  'adapter_name':nic.name or '', 'mac_address':nic.mac_address or '', 'dhcp_hostname':dhcp_hostname, 'dhcp_filename':nic.dhcp_filename or '', 'dhcp_domain_name':nic.dhcp_domain_name or ''})
                 return final_list
         elif 'key' in request.GET and request.GET['key'] > '':
             tmp_list = {}
@@ -0,0 +1,146 @@
+"""
+In-memory indexes of the small reference tables the tokenapi serializer
+fields resolve values against (statuses, system types, racks...).
+
+Each table is loaded once per process into a dict per lookup key (pk, name,
+"vendor-model"...) and reloaded after a save or delete of one of its rows
+in this process, or after `REFERENCE_LOOKUP_TTL` seconds. A batch of API
+writes then resolves every field from memory instead of running one to
+three queries per field and row.
+
+Values are compared case-insensitively and without surrounding whitespace,
+like the database collation the queries it replaces relied on. A value
+missing from memory is looked up in the database before it is reported as
+unknown, since another process may have added the row after the indexes
+were loaded; finding it there reloads the indexes.
+
+When several rows share a key the first one in the model's default
+ordering wins, which is what the ``.filter(...).first()`` lookups it
+replaces returned.
+"""
+from django.apps import apps
+from django.conf import settings
+
+from systems.cached import CachedValue
+
+
+def as_pk(value):
+    """ `value` as an int pk, or None """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def split_pair(value):
+    """ split "vendor-model" style values on the first '-' """
+    first, _, rest = str(value).partition('-')
+    return first.strip(), rest.strip()
+
+
+def normalize(value):
+    """ the form of a key value lookups compare """
+    return str(value).strip().lower()
+
+
+class ReferenceLookup(CachedValue):
+    """
+    :param model: label of the model, e.g. ``'systems.SystemStatus'``
+    :param keys: dict of index name -> tuple of the field names making up
+        an object's key in that index
+    :param ttl: seconds the indexes are kept at most
+    """
+    def __init__(self, model, keys, ttl=60):
+        self.model = model
+        self.keys = keys
+        super(ReferenceLookup, self).__init__(self.build_indexes, [model], ttl)
+
+    def queryset(self):
+        return apps.get_model(self.model).objects.all()
+
+    def key(self, index, value):
+        """ `value` as a key of the index named `index`, or None """
+        if index == 'pk':
+            return as_pk(value)
+        if not isinstance(value, tuple):
+            value = (value,)
+        if len(value) != len(self.keys[index]):
+            return None
+        return tuple(normalize(part) for part in value)
+
+    def build_indexes(self):
+        indexes = dict((name, {}) for name in self.keys)
+        indexes['pk'] = {}
+        for obj in self.queryset():
+            indexes['pk'][obj.pk] = obj
+            for name, fields in self.keys.items():
+                key = tuple(normalize(getattr(obj, field)) for field in fields)
+                indexes[name].setdefault(key, obj)
+        return indexes
+
+    def fetch(self, index, key):
+        """ the first object with `key` in the index named `index`, queried """
+        if index == 'pk':
+            lookup = {'pk': key}
+        else:
+            lookup = dict(
+                ('{0}__iexact'.format(field), part)
+                for field, part in zip(self.keys[index], key)
+            )
+        return self.queryset().filter(**lookup).first()
+
+    def find(self, *candidates):
+        """
+        The object for the first of `candidates`, ``(index name, value)``
+        pairs, found in memory or else in the database; None when there is
+        none.
+        """
+        candidates = [
+            (index, self.key(index, value)) for index, value in candidates
+        ]
+        candidates = [
+            (index, key) for index, key in candidates if key is not None
+        ]
+        indexes = self()
+        for index, key in candidates:
+            obj = indexes[index].get(key)
+            if obj is not None:
+                return obj
+        for index, key in candidates:
+            obj = self.fetch(index, key)
+            if obj is not None:
+                # added since the indexes were loaded, maybe by another
+                # process: reload them
+                self.clear()
+                return obj
+        return None
+
+
+TTL = getattr(settings, 'REFERENCE_LOOKUP_TTL', 60)
+
+server_models = ReferenceLookup( # pylint: disable=invalid-name
+    'systems.ServerModel', {
+        'vendor_model': ('vendor', 'model'),
+        'model': ('model',),
+    }, TTL
+)
+
+operating_systems = ReferenceLookup( # pylint: disable=invalid-name
+    'systems.OperatingSystem', {'name_version': ('name', 'version')}, TTL
+)
+
+system_types = ReferenceLookup( # pylint: disable=invalid-name
+    'systems.SystemType', {'type_name': ('type_name',)}, TTL
+)
+
+system_statuses = ReferenceLookup( # pylint: disable=invalid-name
+    'systems.SystemStatus', {'status': ('status',)}, TTL
+)
+
+system_racks = ReferenceLookup( # pylint: disable=invalid-name
+    'systems.SystemRack', {'name': ('name',)}, TTL
+)
+
+sites = ReferenceLookup( # pylint: disable=invalid-name
+    'systems.Site', {'name': ('name',)}, TTL
+)
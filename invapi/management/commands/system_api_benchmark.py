@@ -0,0 +1,114 @@
+"""
+Benchmark of the tokenapi systems list (GET /tokenapi/systems/).
+
+    ./manage.py system_api_benchmark --systems 10000 50000 100000
+
+For every size, systems are created inside a transaction that is rolled
+back at the end. "before" is the list as it used to be served (every system
+in one response, foreign keys loaded one query at a time), "page" is the
+first page of the cursor paginated list and "walk" follows the next links
+until every system has been fetched. The "before" run is skipped above
+--max-unpaginated systems because it takes minutes.
+"""
+import timeit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from invapi.views import SystemViewSet
+from systems.models import (
+    OperatingSystem, ServerModel, Site, System, SystemRack, SystemStatus,
+    SystemType
+)
+
+
+class UnpaginatedSystemViewSet(SystemViewSet):
+    queryset = System.objects.all()
+    pagination_class = None
+
+
+class Command(BaseCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--systems', type=int, nargs='+', default=[10000, 50000, 100000]
+        )
+        parser.add_argument('--max-unpaginated', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        for count in options['systems']:
+            with transaction.atomic():
+                user = self.load(count)
+                self.run(count, user, options)
+                transaction.set_rollback(True)
+
+    def get(self, view, user, url):
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=user)
+        response = view(request)
+        response.render()
+        return response
+
+    def run(self, count, user, options):
+        list_view = SystemViewSet.as_view({'get': 'list'})
+
+        def before():
+            self.get(
+                UnpaginatedSystemViewSet.as_view({'get': 'list'}), user,
+                '/tokenapi/systems/'
+            )
+
+        def page():
+            return self.get(list_view, user, '/tokenapi/systems/')
+
+        def walk():
+            url = '/tokenapi/systems/?page_size=1000'
+            while url:
+                url = self.get(list_view, user, url).data['next']
+
+        runs = [('page', page), ('walk', walk)]
+        if count <= options['max_unpaginated']:
+            runs.insert(0, ('before', before))
+        for name, run in runs:
+            with CaptureQueriesContext(connection) as queries:
+                run()
+            elapsed = timeit.timeit(run, number=options['repeat'])
+            self.stdout.write(
+                "{0:>7} systems {1:<7} {2:>10.1f} ms  {3:>6} queries".format(
+                    count, name, elapsed * 1000 / options['repeat'],
+                    len(queries)
+                )
+            )
+
+    def load(self, count):
+        site = Site(full_name='apibench')
+        site.save()
+        racks = [
+            SystemRack.objects.create(name='rack{0}'.format(i), site=site)
+            for i in range(20)
+        ]
+        statuses = [
+            SystemStatus.objects.get_or_create(status=status)[0]
+            for status in ('production', 'spare')
+        ]
+        system_type = SystemType.objects.create(type_name='Server')
+        operating_system = OperatingSystem.objects.create(
+            name='RHEL', version='7'
+        )
+        server_model = ServerModel.objects.create(vendor='HP', model='DL360')
+        System.objects.bulk_create([
+            System(
+                hostname='api{0}.apibench.mozilla.com'.format(i),
+                system_rack=racks[i % len(racks)],
+                system_status=statuses[i % len(statuses)],
+                system_type=system_type, operating_system=operating_system,
+                server_model=server_model,
+            )
+            for i in range(count)
+        ], batch_size=500)
+        return User.objects.create(username='apibench')
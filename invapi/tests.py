@@ -1,3 +1,330 @@
-# from django.test import TestCase
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from rest_framework import serializers
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from invapi import lookups
+from invapi.views import (
+    ServerModelTypeField, SystemRackViewSet, SystemStatusField, SystemViewSet
+)
+from systems.models import (
+    OperatingSystem, ServerModel, Site, System, SystemRack, SystemStatus,
+    SystemType
+)
+
+
+class SystemListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='api')
+        site = Site(full_name='scl3')
+        site.save()
+        rack = SystemRack.objects.create(name='rack1', site=site)
+        status = SystemStatus.objects.create(status='production')
+        system_type = SystemType.objects.create(type_name='Server')
+        operating_system = OperatingSystem.objects.create(
+            name='RHEL', version='7'
+        )
+        server_model = ServerModel.objects.create(vendor='HP', model='DL360')
+        for i in range(5):
+            System.objects.create(
+                hostname='api{0}.foobar.mozilla.com'.format(i),
+                system_rack=rack, system_status=status,
+                system_type=system_type, operating_system=operating_system,
+                server_model=server_model
+            )
+
+    def get(self, url):
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=self.user)
+        return SystemViewSet.as_view({'get': 'list'})(request)
+
+    def test_cursor_pages(self):
+        with self.assertNumQueries(1):
+            response = self.get('/tokenapi/systems/?page_size=2')
+        self.assertEqual(
+            ['api0.foobar.mozilla.com', 'api1.foobar.mozilla.com'],
+            [system['hostname'] for system in response.data['results']]
+        )
+        self.assertEqual('rack1', response.data['results'][0]['system_rack'])
+        self.assertEqual(
+            'HP-DL360', response.data['results'][0]['server_model']
+        )
+
+        hostnames = []
+        url = '/tokenapi/systems/?page_size=2'
+        while url:
+            response = self.get(url)
+            hostnames += [s['hostname'] for s in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(
+            sorted(System.objects.values_list('hostname', flat=True)),
+            hostnames
+        )
+
+
+class SystemRackListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='api')
+        site = Site(full_name='scl3')
+        site.save()
+        status = SystemStatus.objects.create(status='production')
+        server_model = ServerModel.objects.create(vendor='HP', model='DL360')
+        for i in range(3):
+            rack = SystemRack.objects.create(
+                name='rack{0}'.format(i), site=site
+            )
+            for j in range(3):
+                System.objects.create(
+                    hostname='rack{0}-{1}.foobar.mozilla.com'.format(i, j),
+                    system_rack=rack, system_status=status,
+                    server_model=server_model, rack_order=j
+                )
+
+    def get(self, url):
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=self.user)
+        return SystemRackViewSet.as_view({'get': 'list'})(request)
+
+    def test_prefetched_systems(self):
+        with self.assertNumQueries(2):
+            response = self.get('/tokenapi/systemrack/')
+        self.assertEqual(3, len(response.data))
+        self.assertEqual(
+            ['rack0-2.foobar.mozilla.com', 'rack0-1.foobar.mozilla.com',
+             'rack0-0.foobar.mozilla.com'],
+            [system['hostname'] for system in response.data[0]['systems']]
+        )
+        self.assertEqual('rack0', response.data[0]['systems'][0]['system_rack'])
+
+    def test_skip_systems(self):
+        with self.assertNumQueries(1):
+            response = self.get('/tokenapi/systemrack/?expand=')
+        self.assertNotIn('systems', response.data[0])
+        self.assertIn('site_name', response.data[0])
+
+        with self.assertNumQueries(1):
+            response = self.get('/tokenapi/systemrack/?fields=id,name')
+        self.assertEqual(['id', 'name'], sorted(response.data[0]))
+
+
+class ReferenceLookupTests(TestCase):
+    def setUp(self):
+        lookups.server_models.clear()
+        lookups.system_statuses.clear()
+        self.status = SystemStatus.objects.create(status='production')
+        self.server_model = ServerModel.objects.create(
+            vendor='HP', model='DL360-G9'
+        )
+
+    def test_lookups_from_memory(self):
+        status_field, model_field = SystemStatusField(), ServerModelTypeField()
+        status_field.to_internal_value('production')
+        model_field.to_internal_value('HP-DL360-G9')
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.assertEqual(
+                    self.status, status_field.to_internal_value('production')
+                )
+                self.assertEqual(
+                    self.status,
+                    status_field.to_internal_value(str(self.status.pk))
+                )
+                self.assertEqual(
+                    self.server_model,
+                    model_field.to_internal_value('HP - DL360-G9')
+                )
+                self.assertEqual(
+                    self.server_model,
+                    model_field.to_internal_value(self.server_model.pk)
+                )
+
+    def test_invalidated_by_save(self):
+        field = SystemStatusField()
+        with self.assertRaises(serializers.ValidationError):
+            field.to_internal_value('spare')
+        spare = SystemStatus.objects.create(status='spare')
+        self.assertEqual(spare, field.to_internal_value('spare'))
+
+    def test_added_by_another_process(self):
+        field, model_field = SystemStatusField(), ServerModelTypeField()
+        field.to_internal_value('production')
+        model_field.to_internal_value('HP-DL360-G9')
+        # bulk_create sends no post_save, like a row another process adds
+        SystemStatus.objects.bulk_create([SystemStatus(status='spare')])
+        ServerModel.objects.bulk_create([
+            ServerModel(vendor='Dell', model='R630')
+        ])
+        spare = field.to_internal_value('spare')
+        self.assertEqual('spare', spare.status)
+        self.assertEqual(
+            'R630', model_field.to_internal_value('Dell-R630').model
+        )
+        self.assertEqual(2, ServerModel.objects.count())
+        with self.assertNumQueries(1):
+            # reloaded once, then found in memory
+            self.assertEqual(spare, field.to_internal_value('spare'))
+            self.assertEqual(spare, field.to_internal_value('spare'))
+
+    def test_case_and_whitespace_insensitive(self):
+        field = SystemStatusField()
+        with self.assertNumQueries(1):
+            for value in (' Production', 'PRODUCTION '):
+                self.assertEqual(self.status, field.to_internal_value(value))
+
+
+class SystemBulkTests(TestCase):
+    def setUp(self):
+        lookups.system_statuses.clear()
+        lookups.system_types.clear()
+        self.user = User.objects.create(username='api')
+        SystemStatus.objects.create(status='production')
+        SystemType.objects.create(type_name='Server')
+        self.system = System.objects.create(
+            hostname='bulk0.foobar.mozilla.com'
+        )
+
+    def post(self, items):
+        request = APIRequestFactory().post(
+            '/tokenapi/systems/bulk/', items, format='json'
+        )
+        force_authenticate(request, user=self.user)
+        return SystemViewSet.as_view({'post': 'bulk'})(request)
+
+    def new(self, hostname):
+        return {
+            'hostname': hostname, 'system_status': 'production',
+            'system_type': 'Server',
+        }
+
+    def test_bulk(self):
+        response = self.post([
+            self.new('bulk1.foobar.mozilla.com'),
+            {'id': self.system.pk, 'serial': 'ABC'},
+            self.new('bulk0.foobar.mozilla.com'),
+            self.new('bulk1.foobar.mozilla.com'),
+            dict(self.new('bulk2.foobar.mozilla.com'), system_status='nope'),
+            {'id': 0, 'serial': 'DEF'},
+        ])
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [201, 200, 400, 400, 400, 404],
+            [result['status'] for result in response.data]
+        )
+        created = System.objects.get(hostname='bulk1.foobar.mozilla.com')
+        self.assertEqual(created.pk, response.data[0]['id'])
+        self.assertEqual('production', created.system_status.status)
+        self.assertNotEqual(0, created.current_revision)
+        self.assertEqual('ABC', System.objects.get(pk=self.system.pk).serial)
+        self.assertIn('item 0', response.data[3]['errors']['hostname'][0])
+
+    def test_hostnames_ignore_case(self):
+        response = self.post([
+            self.new('bulk3.foobar.mozilla.com'),
+            self.new('BULK3.foobar.mozilla.com'),
+        ])
+        self.assertEqual(
+            [201, 400], [result['status'] for result in response.data]
+        )
+
+    @skipUnless(connection.vendor == 'sqlite', 'uses a sqlite index')
+    def test_conflict(self):
+        # Like MySQL's collation, so a hostname differing in case passes
+        # the checks but not the insert, as if taken by a concurrent request
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE UNIQUE INDEX system_hostname_folded ON {0} '
+                '(lower(hostname))'.format(System._meta.db_table)
+            )
+        other = System.objects.create(hostname='bulk9.foobar.mozilla.com')
+        response = self.post([
+            self.new('BULK0.foobar.mozilla.com'),
+            {'id': other.pk, 'serial': 'ABC'},
+        ])
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [409, 200], [result['status'] for result in response.data]
+        )
+        response = self.post([
+            {'id': other.pk, 'hostname': 'Bulk0.foobar.mozilla.com'},
+        ])
+        self.assertEqual(409, response.data[0]['status'])
+        self.assertEqual(2, System.objects.count())
+        other = System.objects.get(pk=other.pk)
+        self.assertEqual('bulk9.foobar.mozilla.com', other.hostname)
+        self.assertEqual('ABC', other.serial)
+
+    def test_not_a_list(self):
+        self.assertEqual(400, self.post({'hostname': 'x'}).status_code)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create(username='api')
+        self.system = System.objects.create(
+            hostname='etag0.foobar.mozilla.com'
+        )
+
+    def get(self, url, action, etag=None, **kwargs):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        request = APIRequestFactory().get(url, **headers)
+        force_authenticate(request, user=self.user)
+        return SystemViewSet.as_view({'get': action})(request, **kwargs)
+
+    def test_retrieve(self):
+        url = '/tokenapi/systems/{0}/'.format(self.system.pk)
+        response = self.get(url, 'retrieve', pk=str(self.system.pk))
+        self.assertEqual(200, response.status_code)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.get(url, 'retrieve', etag, pk=str(self.system.pk))
+        self.assertEqual(304, response.status_code)
+
+        by_name = self.get(
+            url, 'retrieve', etag, pk='etag0.foobar.mozilla.com'
+        )
+        self.assertEqual(304, by_name.status_code)
+
+        self.system.serial = 'ABC'
+        self.system.save()
+        response = self.get(url, 'retrieve', etag, pk=str(self.system.pk))
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_list(self):
+        url = '/tokenapi/systems/'
+        etag = self.get(url, 'list')['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(304, self.get(url, 'list', etag).status_code)
+
+        System.objects.create(hostname='etag1.foobar.mozilla.com')
+        self.assertEqual(200, self.get(url, 'list', etag).status_code)
+        etag = self.get(url, 'list')['ETag']
+
+        SystemStatus.objects.create(status='spare')
+        self.assertEqual(200, self.get(url, 'list', etag).status_code)
+        etag = self.get(url, 'list')['ETag']
+
+        self.system.serial = 'ABC'
+        self.system.save()
+        self.assertEqual(200, self.get(url, 'list', etag).status_code)
+        etag = self.get(url, 'list')['ETag']
+
+        System.objects.get(hostname='etag1.foobar.mozilla.com').delete()
+        self.assertEqual(200, self.get(url, 'list', etag).status_code)
+
+    def test_list_page(self):
+        url = '/tokenapi/systems/?page_size=1'
+        etag = self.get(url, 'list')['ETag']
+        # a system on another page doesn't change this one, but a next
+        # page appearing does
+        other = System.objects.create(hostname='etag1.foobar.mozilla.com')
+        self.assertEqual(200, self.get(url, 'list', etag).status_code)
+        etag = self.get(url, 'list')['ETag']
+        other.serial = 'ABC'
+        other.save()
+        self.assertEqual(304, self.get(url, 'list', etag).status_code)
@@ -1,14 +1,51 @@
 """ inventory api views and serializers """
 import datetime
+import hashlib
+import reversion
 from rest_framework import status, viewsets, serializers
 from rest_framework.filters import SearchFilter
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.validators import UniqueValidator
 from django_filters.rest_framework import DjangoFilterBackend
 from dateutil.relativedelta import relativedelta
-from django.http import Http404
-from systems.models import System
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from systems.fragment_cache import system_fragments
+from systems.importer import SystemImporter, clean_system, fold
+from systems.models import BULK_ACTION_CHUNK_SIZE, System, chunked
 from systems import models
+from invapi import lookups
+
+# Foreign keys of System rendered by SystemSerializer's custom fields
+SYSTEM_RELATED = (
+    'system_rack', 'system_status', 'system_type', 'operating_system',
+    'server_model',
+)
+
+
+def omitted_fields(query_params, field_names, expandable=()):
+    """
+    Return the names in `field_names` a GET request leaves out of the
+    response: ``?fields=a,b`` keeps only the listed fields and ``?expand=``
+    lists which of the `expandable` (nested) fields to include, so a bare
+    ``?expand=`` skips all of them.
+    """
+    omitted = set()
+    if 'fields' in query_params:
+        wanted = set(
+            name.strip() for name in query_params['fields'].split(',')
+        )
+        omitted.update(name for name in field_names if name not in wanted)
+    if 'expand' in query_params:
+        expand = set(
+            name.strip() for name in query_params['expand'].split(',')
+        )
+        omitted.update(name for name in expandable if name not in expand)
+    return omitted
 
 
 class WarrantyStartField(serializers.Field):
@@ -37,26 +74,10 @@ class ServerModelTypeField(serializers.Field):
         return "{}-{}".format(value.vendor, value.model)
 
     def to_internal_value(self, data):
-        obj = None
-        try:
-            pk_int = int(data)
-            obj = models.ServerModel.objects.get(pk=pk_int)
-        except (models.ServerModel.DoesNotExist, ValueError):
-            obj = None
-        if obj is None:
-            try:
-                vendor = str(data.split("-")[0]).strip()
-                model = str("-".join(data.split("-")[1:])).strip()
-                obj = models.ServerModel.objects.filter(vendor=vendor, model=model).first()
-            except models.ServerModel.DoesNotExist:
-                obj = None
-        if obj is None:
-            try:
-                vendor = str(data.split("-")[0]).strip()
-                model = str("-".join(data.split("-")[1:])).strip()
-                obj = models.ServerModel.objects.filter(model=model).first()
-            except models.ServerModel.DoesNotExist:
-                obj = None
+        vendor, model = lookups.split_pair(data)
+        obj = lookups.server_models.find(
+            ('pk', data), ('vendor_model', (vendor, model)), ('model', model)
+        )
         if obj is None:
             tmp = data
             obj = models.ServerModel.objects.create(vendor=tmp, model=tmp).save()
@@ -75,18 +96,10 @@ class OperatingSystemTypeField(serializers.Field):
         return "{}-{}".format(value.name, value.version)
 
     def to_internal_value(self, data):
-        obj = None
-        try:
-            pk_int = int(data)
-            obj = models.OperatingSystem.objects.get(pk=pk_int)
-        except (models.OperatingSystem.DoesNotExist, ValueError):
-            pass
-        try:
-            name = data.split("-")[0]
-            version = "-".join(data.split("-")[1:])
-            obj = models.OperatingSystem.objects.get(name=name, version=version)
-        except models.OperatingSystem.DoesNotExist:
-            pass
+        name, _, version = str(data).partition("-")
+        obj = lookups.operating_systems.find(
+            ('name_version', (name, version)), ('pk', data)
+        )
         if not obj:
             raise serializers.ValidationError(
                 "Unable to find OperatingSystem {}".format(data),
@@ -101,16 +114,7 @@ class SystemTypeField(serializers.Field):
         return value.type_name
 
     def to_internal_value(self, data):
-        obj = None
-        try:
-            pk_int = int(data)
-            obj = models.SystemType.objects.get(pk=pk_int)
-        except (models.SystemType.DoesNotExist, ValueError):
-            pass
-        try:
-            obj = models.SystemType.objects.get(type_name=data)
-        except models.SystemType.DoesNotExist:
-            pass
+        obj = lookups.system_types.find(('type_name', data), ('pk', data))
         if not obj:
             raise serializers.ValidationError(
                 "Unable to find SystemType {}".format(data),
@@ -125,16 +129,7 @@ class SystemStatusField(serializers.Field):
         return value.status
 
     def to_internal_value(self, data):
-        obj = None
-        try:
-            pk_int = int(data)
-            obj = models.SystemStatus.objects.get(pk=pk_int)
-        except (models.SystemStatus.DoesNotExist, ValueError):
-            pass
-        try:
-            obj = models.SystemStatus.objects.get(status=data)
-        except models.SystemStatus.DoesNotExist:
-            pass
+        obj = lookups.system_statuses.find(('status', data), ('pk', data))
         if not obj:
             raise serializers.ValidationError(
                 "Unable to find SystemStatus {}".format(data),
@@ -174,16 +169,7 @@ class SystemRackField(serializers.Field):
         return value.name
 
     def to_internal_value(self, data):
-        obj = None
-        try:
-            pk_int = int(data)
-            obj = models.SystemRack.objects.get(pk=pk_int)
-        except (models.SystemRack.DoesNotExist, ValueError):
-            pass
-        try:
-            obj = models.SystemRack.objects.filter(name=data).first()
-        except models.SystemRack.DoesNotExist:
-            pass
+        obj = lookups.system_racks.find(('name', data), ('pk', data))
         if not obj:
             raise serializers.ValidationError(
                 "Unable to find SystemRack {}".format(data),
@@ -199,11 +185,14 @@ class SiteField(serializers.Field):
         return value.name
 
     def to_internal_value(self, data):
-        try:
-            pk_int = int(data)
-            return models.Site.objects.get(pk=pk_int)
-        except (models.Site.DoesNotExist, ValueError):
-            return models.Site.objects.get(name=data)
+        obj = lookups.sites.find(('pk', data), ('name', data))
+        if not obj:
+            raise serializers.ValidationError(
+                "Unable to find Site {}".format(data),
+                code=400
+            )
+        else:
+            return obj
 
 
 class PatchModelSerializer(serializers.ModelSerializer):
@@ -265,39 +254,76 @@ class SystemSerializer(serializers.ModelSerializer):
 
 
         if 'serial' not in attrs or attrs['serial'] == '':
-            if attrs['server_model'].model != u'VMware Virtual Platform':
+            server_model = attrs.get('server_model')
+            if server_model and server_model.model != u'VMware Virtual Platform':
                 pass
                 #raise serializers.ValidationError("Serial Required", code=400)
 
         if self.context['request'].method != 'PATCH':
-            if System.objects.filter(hostname=attrs['hostname']):
-                raise serializers.ValidationError(
-                    "Hostname already used", code=400
-                )
+            self.check_hostname(attrs)
         return attrs
 
+    def check_hostname(self, attrs): # pylint: disable=no-self-use
+        if System.objects.filter(hostname=attrs['hostname']):
+            raise serializers.ValidationError(
+                "Hostname already used", code=400
+            )
+
     class Meta:
         """ class Meta """
         model = models.System
         fields = '__all__'
 
+
+class BulkSystemSerializer(SystemSerializer):
+    """
+    SystemSerializer for SystemViewSet.bulk, which checks that hostnames are
+    unused for the whole batch at once instead of once per item.
+    """
+    def get_fields(self):
+        fields = super(BulkSystemSerializer, self).get_fields()
+        fields['hostname'].validators = [
+            validator for validator in fields['hostname'].validators
+            if not isinstance(validator, UniqueValidator)
+        ]
+        return fields
+
+    def check_hostname(self, attrs):
+        pass
+
+
 class SystemRackSerializer(serializers.ModelSerializer):
     """ DRF serializer for SystemRack """
     location = serializers.SerializerMethodField()
     site_name = serializers.SerializerMethodField()
     systems = serializers.SerializerMethodField()
     site = SiteField()
+    expandable_fields = ('systems',)
     class Meta:
         """ class Meta """
         model = models.SystemRack
         fields = '__all__'
 
+    def __init__(self, *args, **kwargs):
+        super(SystemRackSerializer, self).__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None and request.method == 'GET':
+            for name in omitted_fields(
+                    request.query_params, list(self.fields),
+                    self.expandable_fields):
+                self.fields.pop(name)
+
     def get_systems(self, value):
         """
-            method function to include ordering.
+            method function to include ordering. Uses the systems
+            prefetched by SystemRackViewSet when there are some.
         """
-
-        serializer = SystemSerializer(value.systems().order_by("-rack_order"), many=True)
+        systems = getattr(value, 'api_systems', None)
+        if systems is None:
+            systems = value.system_set.select_related(
+                *SYSTEM_RELATED
+            ).order_by("-rack_order")
+        serializer = SystemSerializer(systems, many=True)
         return serializer.data
 
     def get_location(self, value):
@@ -356,6 +382,21 @@ class SystemRackViewSet(MultipleFieldLookupMixin, viewsets.ModelViewSet):
     lookup_fields = ('pk', 'name')
     search_fields = ('id', 'name', 'location__name', 'site__name')
 
+    def get_queryset(self):
+        queryset = super(SystemRackViewSet, self).get_queryset()
+        queryset = queryset.select_related('site', 'location')
+        if not omitted_fields(
+                self.request.query_params, ['systems'],
+                SystemRackSerializer.expandable_fields):
+            # The systems of every listed rack in one query
+            queryset = queryset.prefetch_related(Prefetch(
+                'system_set', to_attr='api_systems',
+                queryset=models.System.objects.select_related(
+                    *SYSTEM_RELATED
+                ).order_by('-rack_order')
+            ))
+        return queryset
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid()
@@ -403,17 +444,103 @@ class OperatingSystemViewSet(MultipleFieldLookupMixin, viewsets.ModelViewSet):
     lookup_fields = ('pk', 'name', 'version')
     search_fields = ('id', 'name', 'version')
 
+# Most items accepted by one request to SystemViewSet.bulk
+BULK_SYSTEMS_MAX = 1000
+
+
+def revision_etag(*parts):
+    """
+    A strong ETag for a system representation versioned by `parts`
+    (revisions, counts...). The token of the shared rows is mixed in, as
+    the serializer renders rack, status and server model names.
+    """
+    parts += (system_fragments.shared_token(),)
+    return quote_etag(hashlib.md5(
+        ':'.join(str(part) for part in parts).encode('utf-8')
+    ).hexdigest())
+
+
+def not_modified(request, etag):
+    """ a 304 response when the request's If-None-Match matches `etag` """
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in etags or '*' in etags:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    return None
+
+
+class SystemCursorPagination(CursorPagination):
+    """
+    Cursor pagination over system ids. The id never changes, so a client
+    walking the pages sees every system once even while systems are added
+    or renamed, and each page is a single indexed range query.
+    """
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
 class SystemViewSet(MultipleFieldLookupMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows users to be viewed or edited.
     """
-    queryset = models.System.objects.all()
+    queryset = models.System.objects.select_related(*SYSTEM_RELATED)
     serializer_class = SystemSerializer
+    pagination_class = SystemCursorPagination
     permission_classes = [IsAuthenticated]
     filter_backends = (DjangoFilterBackend,)
     lookup_fields = ('pk', 'id', 'hostname')
     filter_fields = ('id', 'hostname', 'system_status__status')
 
+    def get_revision(self):
+        """
+        ``(pk, current_revision)`` of the system get_object() would return,
+        None if there's none.
+        """
+        for field in self.lookup_fields:
+            try:
+                return self.queryset.filter(
+                    **{field: self.kwargs['pk']}
+                ).values_list('pk', 'current_revision').first()
+            except (ValueError, IndexError, AttributeError, TypeError):
+                continue
+        return None
+
+    def retrieve(self, request, *args, **kwargs):
+        # Every save creates a revision, so current_revision versions the
+        # representation and a poller's 304 costs one indexed query.
+        revision = self.get_revision()
+        if revision is None:
+            return super(SystemViewSet, self).retrieve(request, *args, **kwargs)
+        etag = revision_etag('system', *revision)
+        response = not_modified(request, etag)
+        if response is None:
+            response = super(SystemViewSet, self).retrieve(
+                request, *args, **kwargs
+            )
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        # The page versions itself: a changed system has a new
+        # current_revision, an added or deleted one changes the pks or
+        # whether there is a next page.
+        etag = revision_etag(
+            'systems', request.get_full_path(), self.paginator.has_next,
+            self.paginator.has_previous,
+            *[(system.pk, system.current_revision) for system in page]
+        )
+        response = not_modified(request, etag)
+        if response is None:
+            serializer = self.get_serializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+            response['ETag'] = etag
+        return response
+
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
@@ -477,3 +604,145 @@ class SystemViewSet(MultipleFieldLookupMixin, viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save()
+
+    def bulk(self, request):
+        """
+        Create or update up to BULK_SYSTEMS_MAX systems in one request.
+
+        The body is a list of system payloads. Items with an ``id`` update
+        that system (partially), the others create a system. Every item is
+        validated first, with the reference lookups in memory and the
+        hostnames checked in batches. The valid items are then written in a
+        single transaction and revision, new systems with ``bulk_create``.
+        The response has a result per item, in request order:
+
+            [{"index": 0, "status": 201, "id": 12},
+             {"index": 1, "status": 400, "errors": {...}}]
+        """
+        items = request.data
+        if not isinstance(items, list) or len(items) > BULK_SYSTEMS_MAX:
+            raise serializers.ValidationError({'non_field_errors': [
+                'Expected a list of at most {} systems'.format(
+                    BULK_SYSTEMS_MAX)
+            ]})
+
+        results = [None] * len(items)
+
+        def fail(index, errors, code=status.HTTP_400_BAD_REQUEST):
+            results[index] = {'index': index, 'status': code, 'errors': errors}
+
+        ids = set(
+            lookups.as_pk(item.get('id')) for item in items
+            if isinstance(item, dict) and 'id' in item
+        )
+        instances = {}
+        for pks in chunked(ids, BULK_ACTION_CHUNK_SIZE):
+            instances.update(
+                (system.pk, system)
+                for system in self.queryset.filter(pk__in=pks)
+            )
+
+        context = self.get_serializer_context()
+        valid = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                fail(index, {'non_field_errors': ['Expected an object']})
+                continue
+            instance = None
+            if 'id' in item:
+                instance = instances.get(lookups.as_pk(item['id']))
+                if instance is None:
+                    fail(index, {'id': ['Not found']},
+                         status.HTTP_404_NOT_FOUND)
+                    continue
+            serializer = BulkSystemSerializer(
+                instance, data=item, partial=instance is not None,
+                context=context
+            )
+            if serializer.is_valid():
+                valid.append((index, serializer))
+            else:
+                fail(index, serializer.errors)
+
+        systems = self.check_bulk_hostnames(valid, fail)
+        new_systems, updated = [], []
+        for index, system in systems:
+            errors = clean_system(system)
+            if errors:
+                fail(index, {'non_field_errors': errors})
+            elif system.pk is None:
+                new_systems.append((index, system))
+            else:
+                updated.append((index, system))
+
+        # A concurrent request may take a hostname after it was checked:
+        # the items that then fail to write get a 409 and the rest is kept
+        conflict = {'hostname': ['Hostname already used']}
+        with transaction.atomic(), reversion.create_revision():
+            reversion.set_user(request.user)
+            reversion.set_comment('tokenapi bulk')
+            try:
+                with transaction.atomic():
+                    created = SystemImporter(user=request.user).insert(
+                        [system for _, system in new_systems]
+                    )
+            except IntegrityError:
+                created = None
+            for index, system in new_systems:
+                if created is None:
+                    fail(index, conflict, status.HTTP_409_CONFLICT)
+                    continue
+                results[index] = {
+                    'index': index, 'status': status.HTTP_201_CREATED,
+                    'id': created[fold(system.hostname)],
+                }
+            for index, system in updated:
+                try:
+                    with transaction.atomic():
+                        system.save(request=request)
+                except IntegrityError:
+                    fail(index, conflict, status.HTTP_409_CONFLICT)
+                    continue
+                results[index] = {
+                    'index': index, 'status': status.HTTP_200_OK,
+                    'id': system.pk,
+                }
+        return Response(results, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def check_bulk_hostnames(valid, fail):
+        """
+        Apply the validated data of the `valid` ``(index, serializer)``
+        pairs to System instances, failing the items whose hostname is used
+        by another system or by an earlier item. Return the
+        ``(index, system)`` pairs that passed.
+        """
+        systems = []
+        for index, serializer in valid:
+            system = serializer.instance or System()
+            for attr, value in serializer.validated_data.items():
+                setattr(system, attr, value)
+            systems.append((index, system))
+
+        # Hostnames are compared folded, as the unique index does
+        owners = {}
+        for chunk in chunked(systems, BULK_ACTION_CHUNK_SIZE):
+            owners.update(
+                (fold(hostname), pk) for hostname, pk in System.objects.filter(
+                    hostname__in=[system.hostname for _, system in chunk]
+                ).values_list('hostname', 'pk')
+            )
+
+        passed, seen = [], {}
+        for index, system in systems:
+            hostname = fold(system.hostname)
+            if hostname in seen:
+                fail(index, {'hostname': [
+                    'Hostname already used by item {}'.format(seen[hostname])
+                ]})
+            elif owners.get(hostname, system.pk) != system.pk:
+                fail(index, {'hostname': ['Hostname already used']})
+            else:
+                seen[hostname] = index
+                passed.append((index, system))
+        return passed
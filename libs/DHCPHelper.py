@@ -1,5 +1,4 @@
-from systems.models import ScheduledTask, KeyValue, System
-import re
+from systems.models import ScheduledTask, KeyValue, System, SystemNic
 
 
 class DHCPHelper(object):
@@ -12,66 +11,31 @@ class DHCPHelper(object):
         return ScheduledTask.objects.get_all_dhcp()
 
     def systems_by_scope(self, scope):
-        keyvalue_pairs = KeyValue.objects.filter(key__contains='dhcp_scope',value=scope).filter(key__startswith='nic.')
-        #Iterate through the list and get all of the key/value pairs
-        tmp_list = []
-        for row in keyvalue_pairs:
-            keyvalue = KeyValue.objects.filter(obj=row.obj)
-            tmp_dict = {}
-            for kv in keyvalue:
-                tmp_dict[kv.key] = kv.value
-            tmp_dict['hostname'] = row.obj.hostname
-            appendable = True
-            for the_items in tmp_list:
-                if 'hostname' not in the_items:
-                    appendable = True
-                elif the_items['hostname'] == row.obj.hostname:
-                    appendable = False
-            if appendable is True:
-                tmp_list.append(tmp_dict)
+        systems = System.objects.filter(
+            pk__in=SystemNic.objects.filter(dhcp_scope=scope).values('system')
+        ).order_by('hostname')
+        tmp_dicts = {}
+        for system in systems:
+            tmp_dicts[system.pk] = {'hostname': system.hostname}
+        #Pull every key/value pair of those systems in one query
+        keyvalue_pairs = KeyValue.objects.filter(obj__in=list(tmp_dicts.keys()))
+        for kv in keyvalue_pairs.values_list('obj', 'key', 'value'):
+            tmp_dicts[kv[0]][kv[1]] = kv[2]
+        tmp_list = [tmp_dicts[system.pk] for system in systems]
         return tmp_list
 
     def adapters_by_system_and_scope(self, system, scope):
         dhcp_scope = scope
         system = System.objects.get(hostname=system)
-        keyvalue_pairs = KeyValue.objects.filter(key__startswith='nic.').filter(obj=system).order_by('key')
-        #Iterate through the list and get all of the key/value pairs
-        tmp_dict = {}
-        adapter_ids = []
+        nics = SystemNic.objects.filter(
+            system=system, sub_index=0, dhcp_scope=dhcp_scope,
+            ipv4_address__isnull=False
+        ).order_by('nic_number')
         final_list = []
-        for kv in keyvalue_pairs:
-            tmp_dict[kv.key] = kv.value
-        for k in tmp_dict.iterkeys():
-            matches = re.match('nic\.(\d+).*',k)
-            if matches.group is not None:
-                dhcp_scope_match = 'nic.%s.dhcp_scope.0' % matches.group(1)
-                ip_address_match = 'nic.%s.ipv4_address.0' % matches.group(1)
-                if matches.group(1) not in adapter_ids and ip_address_match in tmp_dict and dhcp_scope_match in tmp_dict and tmp_dict[dhcp_scope_match] == dhcp_scope:
-                    adapter_ids.append(matches.group(1))
-        adapter_ids.sort()
-        for a in adapter_ids:
-            adapter_name = ''
-            mac_address = ''
-            dhcp_hostname = ''
-            dhcp_filename = ''
-            dhcp_domain_name = ''
-            ipv4_address = ''
-            dhcp_domain_name_servers = ''
-            if 'nic.%s.ipv4_address.0' % a in tmp_dict:
-                ipv4_address = tmp_dict['nic.%s.ipv4_address.0' % a]
-            if 'nic.%s.name.0' % a in tmp_dict:
-                adapter_name = tmp_dict['nic.%s.name.0' % a]
-            if 'nic.%s.mac_address.0' % a in tmp_dict:
-                mac_address = tmp_dict['nic.%s.mac_address.0' % a]
-            if 'nic.%s.dhcp_hostname.0' % a in tmp_dict and 'nic.%s.option_hostname.0' % a not in tmp_dict:
-                dhcp_hostname = tmp_dict['nic.%s.dhcp_hostname.0' % a]
-            if  'nic.%s.option_hostname.0' % a in tmp_dict:
-                dhcp_hostname = tmp_dict['nic.%s.option_hostname.0' % a]
-            if 'nic.%s.dhcp_filename.0' % a in tmp_dict:
-                dhcp_filename = tmp_dict['nic.%s.dhcp_filename.0' % a]
-            if 'nic.%s.dhcp_domain_name.0' % a in tmp_dict:
-                dhcp_domain_name = tmp_dict['nic.%s.dhcp_domain_name.0' % a]
-            if 'nic.%s.dhcp_domain_name_servers.0' % a in tmp_dict:
-                dhcp_domain_name_servers = tmp_dict['nic.%s.dhcp_domain_name_servers.0' % a]
-            final_list.append({'system_hostname':system.hostname, 'ipv4_address':ipv4_address,  'adapter_name':adapter_name, 'mac_address':mac_address, 'option_hostname': dhcp_hostname, 'dhcp_hostname':dhcp_hostname, 'dhcp_filename':dhcp_filename, 'dhcp_domain_name':dhcp_domain_name, 'dhcp_domain_name_servers':dhcp_domain_name_servers})
+        for nic in nics:
+            if nic.option_hostname is not None:
+                dhcp_hostname = nic.option_hostname
+            else:
+                dhcp_hostname = nic.dhcp_hostname or ''
+            final_list.append({'system_hostname':system.hostname, 'ipv4_address':nic.ipv4_address,  'adapter_name':nic.name or '', 'mac_address':nic.mac_address or '', 'option_hostname': dhcp_hostname, 'dhcp_hostname':dhcp_hostname, 'dhcp_filename':nic.dhcp_filename or '', 'dhcp_domain_name':nic.dhcp_domain_name or '', 'dhcp_domain_name_servers':nic.dhcp_domain_name_servers or ''})
         return final_list
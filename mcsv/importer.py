@@ -6,6 +6,7 @@ import datetime
 import functools
 
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from mcsv.resolver import Resolver
 from systems import models as sys_models
 
@@ -173,6 +174,8 @@ class Generator(object):
         return s, kv_cbs
 
 
+# A failing row rolls back the rows imported before it
+@transaction.atomic
 def csv_import(csv_text, save=True, primary_attr='hostname'):
     r = Resolver()
     generator = None
@@ -220,13 +223,17 @@ def csv_import(csv_text, save=True, primary_attr='hostname'):
             s = sys_models.System(**vars(mock_s))
             orig_system = None
 
+        # Check the row's pairs before anything of the row is written,
+        # with one uniqueness query instead of one per pair
+        kvs = [cb(s, save=False) for cb in kv_callbacks]
+        sys_models.KeyValue.clean_many(kv for kv, _ in kvs)
         if save:
             if not s.created_on:
                 s.created_on = datetime.datetime.now()
             s.save()
-        kvs = []
-        for cb in kv_callbacks:
-            kvs.append(cb(s, save=save))
+            for kv, _ in kvs:
+                kv.obj = s  # a new system only has a pk now
+                kv.save()
         ret.append({'system': s, 'orig_system': orig_system, 'kvs': kvs})
     return ret
 
@@ -1,5 +1,5 @@
 import re
-from systems.models import System
+from systems.models import System, SystemNic
 from migrate_dns.utils import *
 
 import pprint
@@ -80,10 +80,13 @@ def get_nic_objs():
     build.
     :return: list of tuples. See :function:`get_nick_data`
     """
-    systems = System.objects.all()
+    # Only systems that have a row in the nic table can have nic keys.
+    systems = System.objects.filter(
+        pk__in=SystemNic.objects.values('system')
+    )
     formated_nics = []
     for system in systems:
-        raw_nics = system.keyvalue_set.all()
+        raw_nics = system.keyvalue_set.filter(key__startswith='nic.')
         if not raw_nics:
             continue
         formated_nics.append(transform_nics(raw_nics))
@@ -137,9 +140,6 @@ def get_dns_data():
     return dns_data
 
 
-get_nic_primary_number = re.compile("^nic\.(\d+).*$")
-
-
 def transform_nics(nics):
     """
     Since KV systems have no structure, storing structured data in a KV makes
@@ -161,67 +161,21 @@ def transform_nics(nics):
                             '1': ['nic.1.ipv4_address.1': '192.168.1.2',
                                   'nic.1.mac_address.1': '11:22:33:44:55:66'
                                   'nic.1.hostname.1': 'bazbar']}}}
-    """
-    formated_nics = _build_primary_nics(nics)
-    for nic_number, nics in formated_nics.items():
-        formated_nics[nic_number]['sub_nics'] = _build_sub_nics(nics)
-        formated_nics[nic_number].pop('nics')  # We don't need nics anymore.
-
-    return formated_nics
 
-
-def _build_primary_nics(all_nics):
-    """
-    Aggregate all nics into their primary groups.
-    I.E. All nic\.X.\.*\.Y nics go into a list where all X's are the same.
-
-    :param all_nics: All nics to consider.
-    :type all_nics: list
+    Keys are split with :meth:`SystemNic.parse_key`, the parsing the
+    SystemNic rows are built with. Keys not of the form ``nic.N.field.M``
+    are skipped.
     """
-    primary_nics = {}
-    for nic in all_nics:
-        if not isinstance(nic.key, basestring):
-            log("=" * 15, DEBUG)
-            log("System {0} and NIC {1} not in valid format.  Value is not "
-                    "type basestring Skipping.".format(nic.system, nic), DEBUG)
-            log(print_system(nic.system), DEBUG)
-            continue
-        possible_primary_nic = get_nic_primary_number.match(nic.key)
-        if not possible_primary_nic:
-            log("=" * 15, DEBUG)
-            log("System {0} and NIC {1} not in valid format. "
-                "Skipping.".format(nic.system, nic), DEBUG)
-            log(print_system(nic.system), DEBUG)
-            continue
-        primary_nic_number = possible_primary_nic.group(1)
-        if primary_nic_number in primary_nics:
-            primary_nics[primary_nic_number]['nics'].append(nic)
-        else:
-            primary_nics[primary_nic_number] = {'nics': [nic]}
-    return primary_nics
-
-
-get_nic_sub_number = re.compile("^nic\.\d+.*\.(\d+)$")
-
-
-def _build_sub_nics(all_nics):
-    """
-    Aggregate all sub nics into their sub groups.
-    I.E. All nic\.X.\.*\.Y nics go into a list where all Y's are the same.
-
-    :param all_nics: All nics to consider.
-    :type all_nics: list
-    """
-    sub_nics = {}
-    for nic in all_nics['nics']:
-        possible_sub_nic = get_nic_sub_number.match(nic.key)
-        if not possible_sub_nic:
+    formated_nics = {}
+    for nic in nics:
+        parsed = SystemNic.parse_key(nic.key)
+        if not parsed:
             log("System {0} and NIC {1} not in valid format. "
                 "Skipping.".format(nic.system, nic.key), DEBUG)
             continue
-        sub_nic_number = possible_sub_nic.group(1)
-        if sub_nic_number in sub_nics:
-            sub_nics[sub_nic_number].append(nic)
-        else:
-            sub_nics[sub_nic_number] = [nic]
-    return sub_nics
+        nic_number, _, sub_index = parsed
+        primary_nic = formated_nics.setdefault(
+            str(nic_number), {'sub_nics': {}}
+        )
+        primary_nic['sub_nics'].setdefault(str(sub_index), []).append(nic)
+    return formated_nics
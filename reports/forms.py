@@ -8,7 +8,7 @@ except ImportError:
 import models
 from django.forms.widgets import RadioSelect, CheckboxSelectMultiple
 from systems.models import Allocation, SystemStatus, OperatingSystem
-from core.site.models import Site
+from systems.choices import site_choices, status_choices, with_all
 class MultiSelectFormField(forms.MultipleChoiceField):
     widget = forms.CheckboxSelectMultiple
     
@@ -42,12 +42,12 @@ class ReportForm(forms.Form):
         required=False,
         
         widget=CheckboxSelectMultiple(attrs={'class': 'system_status'}),
-        choices=[('-1', 'All')] + [(m.id, m) for m in SystemStatus.objects.all()])
+        choices=with_all(status_choices, '-1', 'All'))
 
     site = forms.MultipleChoiceField(
         required=False,
         widget=CheckboxSelectMultiple(attrs={'class': 'system_site'}),
-        choices=[('-1', 'All')] + [(m.id, m) for m in Site.objects.all()])
+        choices=with_all(site_choices, '-1', 'All'))
                     
     allocation = forms.ChoiceField(
         required=False,
@@ -0,0 +1,49 @@
+"""
+Process-local cache of a value built from the database.
+
+The value is built the first time it is needed and kept until one of the
+models it depends on is saved or deleted in this process, or until `ttl`
+seconds have passed (which is how changes made by other processes show up).
+This module doesn't import any model, so models.py can use it too.
+"""
+import threading
+import time
+
+from django.db.models.signals import post_delete, post_save
+
+
+class CachedValue(object):
+    """
+    :param build: callable returning the value to cache
+    :param models: models (or model labels) whose changes invalidate it
+    :param ttl: seconds the value is kept at most
+    """
+    def __init__(self, build, models, ttl=60, clock=time.time):
+        self.build = build
+        self.ttl = ttl
+        self.clock = clock
+        self._value = None
+        self._expires = 0
+        self._lock = threading.Lock()
+        for model in models:
+            post_save.connect(self.clear, sender=model, weak=False)
+            post_delete.connect(self.clear, sender=model, weak=False)
+
+    def load(self):
+        return self.build()
+
+    def __call__(self):
+        with self._lock:
+            if self._value is None or self._expires < self.clock():
+                self._value = self.load()
+                self._expires = self.clock() + self.ttl
+            return self._value
+
+    def clear(self, **kwargs): # pylint: disable=unused-argument
+        with self._lock:
+            self._value = None
+
+    def __deepcopy__(self, memo):
+        # Form fields are deep copied for every form instance, the cache has
+        # to stay shared.
+        return self
@@ -0,0 +1,71 @@
+"""
+Lazily built, cached choice lists for forms and rack pickers.
+
+Nothing here touches the database at import time. Each provider builds its
+list the first time it is called and keeps it until one of the models it
+depends on is saved or deleted in this process, or until `CHOICES_CACHE_TTL`
+seconds have passed (which is how changes made by other processes show up).
+
+Providers are callables, so they can be handed straight to a ChoiceField,
+which will call them each time a form is instantiated:
+
+    status = forms.ChoiceField(choices=with_all(status_choices))
+
+The caching itself is `systems.cached.CachedValue`, which caches any other
+value built from the database the same way.
+"""
+from django.conf import settings
+
+from systems.cached import CachedValue
+from systems.models import Site, SystemRack, SystemStatus
+
+
+class CachedChoices(CachedValue):
+    """ a cached list, `build` may return any iterable """
+    def load(self):
+        return list(self.build())
+
+
+def with_all(provider, value='', label='ALL'):
+    """ a choices callable putting an 'all' choice in front of `provider`'s """
+    return lambda: [(value, label)] + provider()
+
+
+TTL = getattr(settings, 'CHOICES_CACHE_TTL', 60)
+
+site_choices = CachedChoices( # pylint: disable=invalid-name
+    lambda: Site.objects.order_by('name').values_list('pk', 'full_name'),
+    [Site], TTL
+)
+
+status_choices = CachedChoices( # pylint: disable=invalid-name
+    lambda: SystemStatus.objects.values_list('pk', 'status'),
+    [SystemStatus], TTL
+)
+
+# (rack pk, site pk, site full name, rack name) of every rack
+rack_rows = CachedChoices( # pylint: disable=invalid-name
+    lambda: SystemRack.objects.order_by('site', 'name').values_list(
+        'pk', 'site', 'site__full_name', 'name'
+    ),
+    [SystemRack, Site], TTL
+)
+
+rack_choices = CachedChoices( # pylint: disable=invalid-name
+    lambda: [
+        (pk, '{0} - {1}'.format(site_name, name) if site else ' ' + name)
+        for pk, site, site_name, name in rack_rows()
+    ],
+    [SystemRack, Site], TTL
+)
+
+
+def racks_for_site(site_id=None):
+    """
+    Return ``(rack pk, site full name, rack name)`` for the racks of the site
+    with pk `site_id`, or of every rack when `site_id` is None.
+    """
+    return [
+        (pk, site_name, name) for pk, site, site_name, name in rack_rows()
+        if site_id is None or site == site_id
+    ]
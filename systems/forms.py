@@ -7,10 +7,11 @@ except ImportError:
     from django.utils.functional import wraps  # Python 2.3, 2.4 fallback.
 
 from systems import models
+from systems.choices import (
+    rack_choices, site_choices, status_choices, with_all
+)
 
 from systems.constants import VALID_SYSTEM_SUFFIXES
-# from core.site.models import Site
-from .models import Site
 
 
 
@@ -31,43 +32,20 @@ class ServerModelForm(forms.ModelForm):
         fields = '__all__'
 
 class RackFilterForm(forms.Form):
-
-    site_choices = [('', 'ALL')]
-    site_choices += [
-        (m.id, m) for m in Site.objects.order_by('name').all()
-    ]
-    status_choices = [('', 'ALL')]
-    status_choices += [(m.id, m) for m in models.SystemStatus.objects.all()]
-
     site = forms.ChoiceField(
         required=False,
-        choices=site_choices
+        choices=with_all(site_choices)
     )
     status = forms.ChoiceField(
         required=False,
-        choices=status_choices
+        choices=with_all(status_choices)
     )
     rack = forms.ChoiceField(
         required=False,
-        choices=[('', 'ALL')] + [
-            (m.id, '{0} - {1}'.format(m.site.full_name, m.name) if m.site else '' + ' ' +  m.name)
-            for m in models.SystemRack.objects.all().order_by('site', 'name')
-        ]
+        choices=with_all(rack_choices)
     )
 
-    show_decommissioned = forms.BooleanField(required=False)
-
-    def __init__(self, *args, **kwargs):
-        super(RackFilterForm, self).__init__(*args, **kwargs)
-        self.fields['site'].choices = [('', 'ALL')]\
-             + [(m.id, m.full_name) for m in Site.objects.order_by('name').all()]
-        self.fields['status'].choices = [('', 'ALL')]\
-             + [(m.id, m) for m in models.SystemStatus.objects.all()]
-        self.fields['rack'].choices = [('', 'ALL')] + [
-            (m.id, '{0} - {1}'.format(m.site.full_name, m.name) if m.site else '' + ' ' +  m.name)
-            for m in models.SystemRack.objects.all().order_by('site', 'name')
-        ]
-        self.fields['show_decommissioned'].initial = False
+    show_decommissioned = forms.BooleanField(required=False, initial=False)
 
 def return_data_if_true(f):
     @wraps(f)
@@ -0,0 +1,109 @@
+"""
+Cache of rendered per-system page fragments.
+
+A fragment is stored under a key made of the system pk, a version supplied
+by the caller (``System.current_revision`` and whatever else the rendering
+depends on) and two generation tokens kept in the cache:
+
+* a per-system token, replaced when a KeyValue of the system changes (those
+  don't create a System revision), and
+* a global token, replaced when one of the shared rows a fragment shows
+  (racks, sites, statuses, server models...) changes.
+
+Replacing a token orphans every fragment built with it, the cache backend
+drops them eventually. Tokens are random rather than counters, so a token
+evicted from the cache can't come back with a value an old fragment was
+stored under. Point SYSTEM_FRAGMENT_CACHE at a cache shared between the WSGI
+workers (memcached) so an edit made through one worker expires the fragment
+for all of them.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class FragmentCache(object):
+    """
+    :param cache_alias: the Django cache holding fragments and tokens
+    :param timeout: seconds a fragment is kept at most
+    :param prefix: prefix of every cache key
+    """
+    def __init__(self, cache_alias='default', timeout=3600,
+                 prefix='systems.fragment'):
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _token_keys(self, system_pk):
+        return (
+            '{0}.token'.format(self.prefix),
+            '{0}.token.{1}'.format(self.prefix, system_pk),
+        )
+
+    def _tokens(self, system_pk):
+        cache = self.cache
+        keys = self._token_keys(system_pk)
+        tokens = cache.get_many(keys)
+        for key in keys:
+            if key not in tokens:
+                cache.add(key, uuid.uuid4().hex, None)
+                tokens[key] = cache.get(key)
+        return [tokens[key] for key in keys]
+
+    def shared_token(self):
+        """
+        The global token alone. It changes whenever one of the shared rows
+        changes, so it can version other representations of systems that
+        show them.
+        """
+        cache = self.cache
+        key = self._token_keys(None)[0]
+        token = cache.get(key)
+        if token is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            token = cache.get(key)
+        return token
+
+    def _replace_token(self, key):
+        self.cache.set(key, uuid.uuid4().hex, None)
+
+    def get_or_render(self, system_pk, version, render):
+        """
+        Return the fragment of system `system_pk` for `version` (a tuple of
+        values), calling `render` to build it when it isn't cached.
+        """
+        key = '.'.join(
+            [self.prefix, str(system_pk)] + self._tokens(system_pk) +
+            [str(part) for part in version]
+        )
+        fragment = self.cache.get(key)
+        if fragment is None:
+            fragment = render()
+            self.cache.set(key, fragment, self.timeout)
+        return fragment
+
+    def expire(self, system_pk):
+        """ Drop the fragments of a system """
+        # Once now for this transaction and once after commit, in case
+        # another request cached the old data in between.
+        key = self._token_keys(system_pk)[1]
+        self._replace_token(key)
+        transaction.on_commit(lambda: self._replace_token(key))
+
+    def expire_all(self):
+        """ Drop the fragments of every system """
+        key = self._token_keys(None)[0]
+        self._replace_token(key)
+        transaction.on_commit(lambda: self._replace_token(key))
+
+
+system_fragments = FragmentCache( # pylint: disable=invalid-name
+    cache_alias=getattr(settings, 'SYSTEM_FRAGMENT_CACHE', 'default'),
+    timeout=getattr(settings, 'SYSTEM_FRAGMENT_CACHE_TIMEOUT', 3600),
+)
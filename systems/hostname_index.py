@@ -0,0 +1,157 @@
+"""
+Process-local hostname index for system autocompletion.
+
+The index is a sorted list of lowercased hostnames that is loaded from the
+database on first use and then kept up to date from the System save/delete
+signals, so completing a hostname never touches the database. Changes are
+applied when the transaction commits, a rolled back save leaves the index
+alone. Prefix
+matches are found with a binary search and infix matches with a scan of the
+in-memory list; both are capped at `limit` results.
+
+Every hostname change also bumps a generation counter in the Django cache. Each
+process remembers the generation its index was built from and reloads when
+another process has moved it on, so point HOSTNAME_INDEX_CACHE at a cache
+that is shared between the WSGI workers (memcached) to keep them all
+consistent. Code that changes hostnames without sending signals
+(``QuerySet.update``, ``bulk_create``) must call `invalidate` itself.
+"""
+import bisect
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def load_hostnames():
+    from systems.models import System
+    return System.objects.values_list('pk', 'hostname').iterator()
+
+
+class HostnameIndex(object):
+    """
+    :param load: callable returning ``(pk, hostname)`` pairs of all systems
+    :param cache_alias: the Django cache holding the shared generation
+    :param limit: default maximum number of completions
+    """
+    def __init__(self, load=load_hostnames, cache_alias='default', limit=50,
+                 generation_key='systems.hostname_index.generation'):
+        self.load = load
+        self.cache_alias = cache_alias
+        self.limit = limit
+        self.generation_key = generation_key
+        self._lock = threading.RLock()
+        self._keys = None  # sorted [(hostname.lower(), pk)]
+        self._hostnames = {}  # pk -> hostname
+        self._generation = None
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _build(self, generation):
+        hostnames = dict(self.load())
+        self._keys = sorted(
+            (hostname.lower(), pk) for pk, hostname in hostnames.items()
+        )
+        self._hostnames = hostnames
+        self._generation = generation
+
+    def _ensure_current(self):
+        # Read the generation before loading so a change made while we load
+        # makes us load again next time.
+        cache = self.cache
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            cache.add(self.generation_key, 0, None)
+            generation = cache.get(self.generation_key)
+        with self._lock:
+            if self._keys is None or generation != self._generation:
+                self._build(generation)
+
+    def _publish(self):
+        """ Tell the other processes that the index changed """
+        cache = self.cache
+        cache.add(self.generation_key, 0, None)
+        try:
+            generation = cache.incr(self.generation_key)
+        except ValueError:
+            # Evicted between add() and incr()
+            generation = None
+        with self._lock:
+            if (generation is not None and self._generation is not None and
+                    generation == self._generation + 1):
+                # Nobody else changed anything, our copy is current
+                self._generation = generation
+            else:
+                self._keys = None
+
+    def _remove_locked(self, pk):
+        hostname = self._hostnames.pop(pk, None)
+        if hostname is not None:
+            key = (hostname.lower(), pk)
+            i = bisect.bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+
+    def update(self, pk, hostname):
+        """ Add or rename a system once the current transaction commits """
+        transaction.on_commit(lambda: self._update(pk, hostname))
+
+    def _update(self, pk, hostname):
+        with self._lock:
+            if self._keys is not None:
+                if self._hostnames.get(pk) == hostname:
+                    return
+                self._remove_locked(pk)
+                self._hostnames[pk] = hostname
+                bisect.insort(self._keys, (hostname.lower(), pk))
+        self._publish()
+
+    def remove(self, pk):
+        """ Forget a system once the current transaction commits """
+        transaction.on_commit(lambda: self._remove(pk))
+
+    def _remove(self, pk):
+        with self._lock:
+            if self._keys is not None:
+                self._remove_locked(pk)
+        self._publish()
+
+    def invalidate(self):
+        """ Make every process reload its index on next use """
+        with self._lock:
+            self._keys = None
+        transaction.on_commit(self._publish)
+
+    def complete(self, query, limit=None):
+        """
+        Return up to `limit` ``(hostname, pk)`` pairs of the systems whose
+        hostname contains `query` (case insensitively). Hostnames starting
+        with `query` come first, in alphabetical order.
+        """
+        limit = limit or self.limit
+        needle = query.lower()
+        self._ensure_current()
+        with self._lock:
+            keys = self._keys
+            pks = []
+            i = bisect.bisect_left(keys, (needle,))
+            while (i < len(keys) and len(pks) < limit and
+                   keys[i][0].startswith(needle)):
+                pks.append(keys[i][1])
+                i += 1
+            if len(pks) < limit:
+                for key, pk in keys:
+                    if needle in key and not key.startswith(needle):
+                        pks.append(pk)
+                        if len(pks) >= limit:
+                            break
+            return [(self._hostnames[pk], pk) for pk in pks]
+
+
+hostname_index = HostnameIndex( # pylint: disable=invalid-name
+    cache_alias=getattr(settings, 'HOSTNAME_INDEX_CACHE', 'default'),
+    limit=getattr(settings, 'SYSTEM_AUTOCOMPLETE_LIMIT', 50),
+)
@@ -0,0 +1,241 @@
+"""
+Batch import of systems from CSV rows.
+
+Importing row by row costs a few reference lookups, a uniqueness check, an
+insert and a reversion revision per system. `SystemImporter` instead loads
+the status, server model and rack tables into dicts once, validates every
+row without touching the database, checks hostname uniqueness with one
+query per chunk and inserts the valid rows with ``bulk_create`` inside a
+single transaction and a single reversion revision:
+
+    >>> result = SystemImporter(user=request.user).run(csv.reader(lines))
+    >>> result.created, result.errors
+    (4998, [RowError(line=17, hostname='web1', messages=[...]), ...])
+
+Rows that fail validation are reported and skipped, the other rows are
+still imported.
+"""
+import collections
+
+import reversion
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from systems.hostname_index import hostname_index
+from systems.models import (
+    BULK_ACTION_CHUNK_SIZE, ServerModel, System, SystemRack,
+    SystemSearchDocument, SystemStatus, chunked, natural_sort_key,
+    validate_names
+)
+
+# Columns a CSV file may have, other columns are ignored.
+IMPORT_COLUMNS = (
+    'hostname', 'asset_tag', 'serial', 'notes', 'oob_ip', 'system_status',
+    'system_rack', 'rack_order', 'server_model', 'purchase_price',
+)
+
+# Foreign keys resolved from the preloaded tables. full_clean() would check
+# that each of them exists with a query per row.
+RESOLVED_FIELDS = (
+    'system_status', 'system_rack', 'server_model', 'system_type',
+    'operating_system',
+)
+
+ImportResult = collections.namedtuple('ImportResult', 'created errors')
+RowError = collections.namedtuple('RowError', 'line hostname messages')
+
+
+def clean_system(system, exclude=()):
+    """
+    Validate a System whose foreign keys were resolved from loaded rows,
+    without querying: uniqueness and the existence of the related rows are
+    not checked. Fields in `exclude` aren't validated either. Return a list
+    of "field: message" strings.
+    """
+    try:
+        system.full_clean(
+            exclude=RESOLVED_FIELDS + tuple(exclude), validate_unique=False
+        )
+    except ValidationError as e:
+        return [
+            '{0}: {1}'.format(field, message)
+            for field, messages in sorted(e.message_dict.items())
+            for message in messages
+        ]
+    # Cleaning converted the field values, e.g. rack_order to Decimal
+    system.hostname_sort_key = natural_sort_key(system.hostname)
+    return []
+
+
+def fold(value):
+    """ `value` as compared with the database's case-insensitive collation """
+    return (value or '').strip().lower()
+
+
+class SystemImporter(object):
+    """
+    :param user: user the import revision is recorded for
+    :param chunk_size: rows per ``bulk_create`` and uniqueness query
+    """
+    def __init__(self, user=None, chunk_size=BULK_ACTION_CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.statuses = None
+        self.server_models = None
+        self.racks = None
+
+    def load_references(self):
+        self.statuses = dict(
+            (fold(status.status), status)
+            for status in SystemStatus.objects.all()
+        )
+        self.server_models = dict(
+            (str(server_model.pk), server_model)
+            for server_model in ServerModel.objects.all()
+        )
+        # Rack names are only unique within a site
+        self.racks = collections.defaultdict(list)
+        for rack in SystemRack.objects.all():
+            self.racks[fold(rack.name)].append(rack)
+
+    def default_status(self):
+        """ the status System.clean() gives new systems """
+        if 'building' not in self.statuses:
+            self.statuses['building'], _ = SystemStatus.objects.get_or_create(
+                status='building'
+            )
+        return self.statuses['building']
+
+    def build(self, data, name_error=None):
+        """
+        Return an unsaved System for the row dict `data` and the list of
+        messages of the problems found with it. `name_error` is the
+        ValidationError validate_names() reported for its hostname.
+        """
+        errors = []
+        if name_error is not None:
+            errors.extend(
+                'hostname: {0}'.format(message)
+                for message in name_error.messages
+            )
+        racks = self.racks.get(fold(data.get('system_rack')), [])
+        if len(racks) > 1:
+            errors.append(
+                'system_rack: {0} racks are named {1}'.format(
+                    len(racks), data['system_rack'])
+            )
+        system = System(
+            hostname=data.get('hostname'),
+            asset_tag=data.get('asset_tag'),
+            serial=data['serial'].upper() if data.get('serial') else None,
+            notes=data.get('notes'),
+            oob_ip=data.get('oob_ip'),
+            system_status=(
+                self.statuses.get(fold(data.get('system_status'))) or
+                self.default_status()
+            ),
+            system_rack=racks[0] if len(racks) == 1 else None,
+            rack_order=data.get('rack_order') or None,
+            server_model=self.server_models.get(data.get('server_model')),
+            purchase_price=data.get('purchase_price'),
+        )
+        # An invalid hostname was reported already
+        exclude = ('hostname',) if name_error is not None else ()
+        return system, errors + clean_system(system, exclude)
+
+    def validate(self, rows):
+        """
+        Build a System for every row of `rows` (a header row followed by
+        value rows). Return the valid systems and the list of RowErrors.
+        """
+        rows = iter(rows)
+        headers = [header.strip() for header in next(rows, [])]
+        parsed = [
+            (line, dict(
+                (header, value) for header, value in zip(headers, values)
+                if header in IMPORT_COLUMNS
+            ))
+            for line, values in enumerate(rows, 2) if any(values)
+        ]
+        # Every hostname of the file in one pass, duplicates checked once
+        name_errors = validate_names(
+            data['hostname'] for _, data in parsed if data.get('hostname')
+        )
+
+        systems, errors = [], []
+        # The unique index on hostname ignores case: compare folded
+        # hostnames, or bulk_create() fails on "Web1" after "web1"
+        lines = {}  # folded hostname -> line of the first row with it
+        for line, data in parsed:
+            system, messages = self.build(
+                data, name_errors.get(data.get('hostname'))
+            )
+            hostname = fold(system.hostname)
+            if hostname in lines:
+                messages.append(
+                    'hostname: duplicate of line {0}'.format(lines[hostname])
+                )
+            elif hostname:
+                lines[hostname] = line
+            if messages:
+                errors.append(RowError(line, hostname, messages))
+            else:
+                systems.append((line, system))
+
+        valid = []
+        for chunk in chunked(systems, self.chunk_size):
+            existing = set(fold(hostname) for hostname in (
+                System.objects.filter(
+                    hostname__in=[system.hostname for _, system in chunk]
+                ).values_list('hostname', flat=True)
+            ))
+            for line, system in chunk:
+                if fold(system.hostname) in existing:
+                    errors.append(RowError(line, system.hostname, [
+                        'hostname: System with this Hostname already exists.'
+                    ]))
+                else:
+                    valid.append(system)
+        return valid, sorted(errors)
+
+    def insert(self, systems):
+        """
+        Insert the validated `systems` and add them to the current revision.
+        Must be called inside ``reversion.create_revision()``. Return a dict
+        of folded hostname -> pk of the new systems.
+        """
+        pks = {}
+        if not systems:
+            return pks
+        for chunk in chunked(systems, self.chunk_size):
+            System.objects.bulk_create(chunk)
+            # bulk_create() only sets pks on PostgreSQL
+            created = System.objects.filter(
+                hostname__in=[system.hostname for system in chunk]
+            ).select_related(*RESOLVED_FIELDS)
+            for system in created:
+                reversion.add_to_revision(system)
+                pks[fold(system.hostname)] = system.pk
+        # bulk_create() doesn't send the signals maintaining these
+        SystemSearchDocument.index_systems(pks.values(), self.chunk_size)
+        hostname_index.invalidate()
+        return pks
+
+    def create(self, systems):
+        """
+        Insert `systems` and record them in a single revision. Return the
+        pks of the new systems.
+        """
+        with transaction.atomic(), reversion.create_revision():
+            if self.user is not None and not self.user.is_anonymous:
+                reversion.set_user(self.user)
+            reversion.set_comment('CSV import')
+            return list(self.insert(systems).values())
+
+    def run(self, rows):
+        """ Import `rows` and return an ImportResult """
+        self.load_references()
+        systems, errors = self.validate(rows)
+        if systems:
+            self.create(systems)
+        return ImportResult(len(systems), errors)
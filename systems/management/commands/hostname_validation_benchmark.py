@@ -0,0 +1,93 @@
+"""
+Benchmark of hostname validation.
+
+    ./manage.py hostname_validation_benchmark --names 10000
+
+"before" is the character by character validate_name() that used to run on
+every System.full_clean(), "after" is the current validate_name() called
+once per name, and "batch" is validate_names() over the whole list the way
+importers use it. The generated names are mostly valid with a sprinkling of
+invalid ones, like a real import file. No database access is needed.
+"""
+import string
+import timeit
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from systems.models import validate_name, validate_names
+
+
+def legacy_validate_label(label):
+    valid_chars = string.ascii_letters + "0123456789" + "-" + "_"
+    for char in label:
+        if char == '.':
+            raise ValidationError("Invalid name {0}. Please do not span "
+                                  "multiple domains when creating records."
+                                  .format(label))
+        if valid_chars.find(char) < 0:
+            raise ValidationError("Invalid name {0}. Character '{1}' is "
+                                  "invalid.".format(label, char))
+    end_chars = string.ascii_letters + "0123456789"
+    if (
+            label and
+            not label.endswith(tuple(end_chars)) or
+            not label.startswith(tuple(end_chars + '_'))
+    ):
+        raise ValidationError(
+            "Labels must end and begin only with a letter or digit"
+        )
+
+
+def legacy_validate_name(fqdn):
+    if not isinstance(fqdn, str):
+        raise ValidationError("Error: A name must be of type str.")
+    if fqdn[0] == '*':
+        fqdn = fqdn[1:].strip('.')
+    for label in fqdn.split('.'):
+        if not label:
+            raise ValidationError("Invalid name {0}. Empty label."
+                                  .format(fqdn))
+        legacy_validate_label(label)
+
+
+def generate_names(count, invalid_every):
+    names = []
+    for i in range(count):
+        if invalid_every and i % invalid_every == 0:
+            names.append('bad_host{0}-.scl3.mozilla.com'.format(i))
+        else:
+            names.append('web{0}.webapp.scl3.mozilla.com'.format(i))
+    return names
+
+
+def each(validate, names):
+    for name in names:
+        try:
+            validate(name)
+        except ValidationError:
+            pass
+
+
+class Command(BaseCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--invalid-every', type=int, default=50)
+
+    def handle(self, *args, **options):
+        names = generate_names(options['names'], options['invalid_every'])
+        total = len(names) * options['repeat']
+
+        for name, run in (
+                ('before', lambda: each(legacy_validate_name, names)),
+                ('after', lambda: each(validate_name, names)),
+                ('batch', lambda: validate_names(names))):
+            elapsed = timeit.timeit(run, number=options['repeat'])
+            self.stdout.write(
+                "{0:<7} {1:>8.2f} us/name  {2:>10.0f} names/s".format(
+                    name, elapsed * 1e6 / total, total / elapsed
+                )
+            )
@@ -0,0 +1,130 @@
+"""
+Load synthetic KeyValue rows and check that the hot key_value lookups are
+answered from an index instead of a full table scan.
+
+    ./manage.py key_value_index_benchmark --rows 1000000
+
+Everything is done inside a transaction that is rolled back at the end, so
+point it at a scratch database; nothing is left behind either way.
+"""
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from systems.models import KeyValue, System
+from systems.query_plans import index_lookups
+
+NIC_KEYS = ('mac_address', 'ipv4_address', 'dhcp_scope', 'hostname')
+
+
+def synthetic_value(key, system_index, nic_number):
+    if key == 'mac_address':
+        return '00:00:{0:02x}:{1:02x}:{2:02x}:{3:02x}'.format(
+            (system_index >> 16) & 0xff, (system_index >> 8) & 0xff,
+            system_index & 0xff, nic_number & 0xff
+        )
+    if key == 'ipv4_address':
+        return '10.{0}.{1}.{2}'.format(
+            (system_index >> 8) & 0xff, system_index & 0xff, nic_number & 0xff
+        )
+    if key == 'dhcp_scope':
+        return 'scope-{0}'.format(system_index % 200)
+    return 'bench{0}-nic{1}'.format(system_index, nic_number)
+
+
+class Command(BaseCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--systems', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=100)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        connection = connections[KeyValue.objects.db]
+        if connection.vendor not in ('sqlite', 'mysql'):
+            raise CommandError("Only SQLite and MySQL are supported")
+
+        failures = []
+        with transaction.atomic():
+            system_pks = self.load(options)
+            for name, queryset, vendors in self.lookups(system_pks):
+                if connection.vendor not in vendors:
+                    continue
+                indexes = index_lookups(queryset, KeyValue._meta.db_table)
+                elapsed = timeit.timeit(
+                    lambda qs=queryset: list(qs.all()),
+                    number=options['repeat']
+                )
+                self.stdout.write("{0:<12} {1:>9.3f} ms/query  {2}".format(
+                    name, elapsed * 1000 / options['repeat'],
+                    ', '.join(indexes) if indexes else 'FULL SCAN'
+                ))
+                if not indexes:
+                    failures.append(name)
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(
+                "Full table scan for: {0}".format(', '.join(failures))
+            )
+
+    def load(self, options):
+        rows, n_systems = options['rows'], options['systems']
+        System.objects.bulk_create(
+            [
+                System(hostname='bench{0}.kvbench.mozilla.com'.format(i))
+                for i in range(n_systems)
+            ],
+            batch_size=options['batch_size']
+        )
+        system_pks = list(
+            System.objects.filter(hostname__endswith='.kvbench.mozilla.com')
+            .order_by('hostname').values_list('pk', flat=True)
+        )
+
+        batch = []
+        for i in range(rows):
+            system_index = i % n_systems
+            nic_key = NIC_KEYS[(i // n_systems) % len(NIC_KEYS)]
+            nic_number = i // (n_systems * len(NIC_KEYS))
+            batch.append(KeyValue(
+                obj_id=system_pks[system_index],
+                key='nic.{0}.{1}.0'.format(nic_number, nic_key),
+                value=synthetic_value(nic_key, system_index, nic_number)
+            ))
+            if len(batch) >= options['batch_size']:
+                KeyValue.objects.bulk_create(batch)
+                batch = []
+        KeyValue.objects.bulk_create(batch)
+        self.stdout.write("Loaded {0} rows for {1} systems".format(
+            rows, n_systems
+        ))
+        return system_pks
+
+    def lookups(self, system_pks):
+        pk = system_pks[len(system_pks) // 2]
+        both = ('sqlite', 'mysql')
+        return [
+            ('obj_key', KeyValue.objects.filter(
+                obj=pk, key='nic.0.mac_address.0'
+            ), both),
+            ('obj_prefix', KeyValue.objects.filter(
+                obj=pk, key__startswith='nic.'
+            ), both),
+            ('key_value', KeyValue.objects.filter(
+                key='nic.0.dhcp_scope.0', value='scope-7'
+            ), both),
+            ('ip_in_use', KeyValue.objects.filter(
+                value='10.0.7.0'
+            ).exclude(obj=pk), both),
+            ('dhcp_scope', KeyValue.objects.filter(
+                key__contains='dhcp_scope', value='scope-7'
+            ).filter(key__startswith='nic.'), both),
+            # SQLite's LIKE is case insensitive and can't use the index
+            ('key_prefix', KeyValue.objects.filter(
+                key__startswith='nic.0.'
+            ), ('mysql',)),
+        ]
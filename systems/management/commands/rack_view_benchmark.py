@@ -0,0 +1,100 @@
+"""
+Benchmark of loading and rendering rack elevations for the racks view.
+
+    ./manage.py rack_view_benchmark --racks 300 --systems-per-rack 30
+
+Creates a site full of racks and systems inside a transaction that is rolled
+back at the end, then loads every rack of the site the way the racks view
+did before (a systems query per rack plus a decommissioned status lookup)
+and the way it does now (SystemRack.with_systems), rendering a rack row for
+every system in both cases.
+"""
+import decimal
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.template.loader import get_template
+from django.test.utils import CaptureQueriesContext
+
+from systems.models import (
+    ServerModel, Site, System, SystemRack, SystemStatus
+)
+
+
+class Command(BaseCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--racks', type=int, default=300)
+        parser.add_argument('--systems-per-rack', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            site = self.load(options)
+            racks = SystemRack.objects.filter(site=site).select_related('site')
+            row = get_template('systems/rack_row_partial.html')
+
+            def render(rack_systems):
+                for _, systems in rack_systems:
+                    for system in systems:
+                        row.render({'system': system, 'read_only': False})
+
+            def before():
+                decommissioned = SystemStatus.objects.get(
+                    status='decommissioned'
+                )
+                render([
+                    (rack, list(rack.system_set.select_related(
+                        'server_model', 'system_status',
+                    ).filter(~Q(system_status=decommissioned))
+                                .order_by('-rack_order')))
+                    for rack in racks
+                ])
+
+            def after():
+                system_filter = ~Q(
+                    system_status=SystemStatus.get_id('decommissioned')
+                )
+                render(SystemRack.with_systems(racks, system_filter))
+
+            for name, run in (('before', before), ('after', after)):
+                with CaptureQueriesContext(connection) as queries:
+                    run()
+                elapsed = timeit.timeit(run, number=options['repeat'])
+                self.stdout.write(
+                    "{0:<7} {1:>8.1f} ms/page  {2:>5} queries".format(
+                        name, elapsed * 1000 / options['repeat'],
+                        len(queries)
+                    )
+                )
+            transaction.set_rollback(True)
+
+    def load(self, options):
+        site = Site(full_name='rackbench')
+        site.save()
+        statuses = [
+            SystemStatus.objects.get_or_create(status=status)[0]
+            for status in ('production', 'spare', 'decommissioned')
+        ]
+        server_model = ServerModel.objects.create(vendor='HP', model='DL360')
+        SystemRack.objects.bulk_create([
+            SystemRack(name='rack{0}'.format(i), site=site)
+            for i in range(options['racks'])
+        ])
+        systems = []
+        for i, rack in enumerate(SystemRack.objects.filter(site=site)):
+            for j in range(options['systems_per_rack']):
+                systems.append(System(
+                    hostname='rack{0}-{1}.rackbench.mozilla.com'.format(i, j),
+                    system_rack=rack, server_model=server_model,
+                    system_status=statuses[j % len(statuses)],
+                    rack_order=decimal.Decimal(j),
+                ))
+        System.objects.bulk_create(systems, batch_size=500)
+        self.stdout.write("Loaded {0} racks with {1} systems".format(
+            options['racks'], len(systems)
+        ))
+        return site
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark of System instantiation.
+
+    ./manage.py system_init_benchmark --number 10000
+
+"before" replays what DirtyFieldsMixin.__init__ used to do for every
+instance (a post_save.connect() call plus a dict snapshot of every local
+field) on top of the current constructor, "after" is the constructor alone.
+Both the plain constructor and the from_db() path used by querysets are
+measured. No database access is needed.
+"""
+import datetime
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db.models.signals import post_save
+
+from systems.models import System
+
+
+def legacy_dirty_fields_init(instance):
+    post_save.connect(
+        instance._reset_state, sender=instance.__class__, # pylint: disable=protected-access
+        dispatch_uid='{0}-DirtyFieldsMixin-sweeper'.format(
+            instance.__class__.__name__)
+    )
+    instance._legacy_state = dict([ # pylint: disable=protected-access
+        (f.attname, getattr(instance, f.attname))
+        for f in instance._meta.local_fields # pylint: disable=protected-access
+    ])
+
+
+class Command(BaseCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        number = options['number']
+        now = datetime.datetime.now()
+        kwargs = {
+            'hostname': 'bench1.foobar.mozilla.com', 'serial': 'ABC123',
+            'asset_tag': '1234', 'created_on': now, 'updated_on': now,
+        }
+        fields = System._meta.concrete_fields # pylint: disable=protected-access
+        field_names = [f.attname for f in fields]
+        row = tuple(kwargs.get(name, None) for name in field_names)
+
+        def init():
+            System(**kwargs)
+
+        def init_legacy():
+            legacy_dirty_fields_init(System(**kwargs))
+
+        def from_db():
+            System.from_db('default', field_names, row)
+
+        def from_db_legacy():
+            legacy_dirty_fields_init(
+                System.from_db('default', field_names, row)
+            )
+
+        for name, before, after in (
+                ('System()', init_legacy, init),
+                ('from_db()', from_db_legacy, from_db)):
+            before_time = timeit.timeit(before, number=number)
+            after_time = timeit.timeit(after, number=number)
+            self.stdout.write(
+                "{0:<10} before {1:>10.0f}/s  after {2:>10.0f}/s  "
+                "({3:.2f}x)".format(
+                    name, number / before_time, number / after_time,
+                    before_time / after_time
+                )
+            )
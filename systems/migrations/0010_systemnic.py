@@ -0,0 +1,75 @@
+# Generated by Django 2.0.13 on 2019-04-01 10:12
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+NIC_KEY_RE = re.compile(r'^nic\.(\d+)\.(.+)\.(\d+)$')
+
+NIC_FIELDS = (
+    'mac_address', 'ipv4_address', 'dhcp_scope', 'hostname', 'name',
+    'adapter_name', 'option_hostname', 'dhcp_hostname', 'dhcp_filename',
+    'dhcp_domain_name', 'dhcp_domain_name_servers', 'reverse_dns_zone',
+)
+
+
+def populate_system_nics(apps, schema_editor):
+    KeyValue = apps.get_model('systems', 'KeyValue')
+    SystemNic = apps.get_model('systems', 'SystemNic')
+    rows = {}
+    key_values = KeyValue.objects.filter(
+        key__startswith='nic.', obj__isnull=False
+    ).order_by('id').values_list('obj', 'key', 'value')
+    for system_id, key, value in key_values.iterator():
+        match = NIC_KEY_RE.match(key)
+        if not match:
+            continue
+        index = (system_id, int(match.group(1)), int(match.group(3)))
+        row = rows.setdefault(index, SystemNic(
+            system_id=system_id, nic_number=index[1], sub_index=index[2]
+        ))
+        if match.group(2) in NIC_FIELDS:
+            setattr(row, match.group(2), value)
+    SystemNic.objects.bulk_create(list(rows.values()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0009_auto_20190315_1523'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemNic',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nic_number', models.PositiveIntegerField()),
+                ('sub_index', models.PositiveIntegerField()),
+                ('mac_address', models.CharField(blank=True, db_index=True, max_length=255, null=True)),
+                ('ipv4_address', models.CharField(blank=True, db_index=True, max_length=255, null=True)),
+                ('dhcp_scope', models.CharField(blank=True, db_index=True, max_length=255, null=True)),
+                ('hostname', models.CharField(blank=True, db_index=True, max_length=255, null=True)),
+                ('name', models.CharField(blank=True, max_length=255, null=True)),
+                ('adapter_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('option_hostname', models.CharField(blank=True, max_length=255, null=True)),
+                ('dhcp_hostname', models.CharField(blank=True, max_length=255, null=True)),
+                ('dhcp_filename', models.CharField(blank=True, max_length=255, null=True)),
+                ('dhcp_domain_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('dhcp_domain_name_servers', models.CharField(blank=True, max_length=255, null=True)),
+                ('reverse_dns_zone', models.CharField(blank=True, max_length=255, null=True)),
+                ('system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='systems.System')),
+            ],
+            options={
+                'db_table': 'system_nics',
+                'ordering': ['nic_number', 'sub_index'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='systemnic',
+            unique_together={('system', 'nic_number', 'sub_index')},
+        ),
+        migrations.RunPython(populate_system_nics, migrations.RunPython.noop),
+    ]
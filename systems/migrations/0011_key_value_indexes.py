@@ -0,0 +1,25 @@
+# Generated by Django 2.0.13 on 2019-04-02 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0010_systemnic'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='keyvalue',
+            index=models.Index(fields=['obj', 'key'], name='key_value_obj_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='keyvalue',
+            index=models.Index(fields=['key', 'value'], name='key_value_key_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='keyvalue',
+            index=models.Index(fields=['value'], name='key_value_value_idx'),
+        ),
+    ]
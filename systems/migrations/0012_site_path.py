@@ -0,0 +1,27 @@
+# Generated by Django 2.0.13 on 2019-04-03 14:05
+
+from django.db import migrations, models
+
+
+def populate_site_paths(apps, schema_editor):
+    Site = apps.get_model('systems', 'Site')
+    for site in Site.objects.exclude(full_name__isnull=True).only('full_name'):
+        Site.objects.filter(pk=site.pk).update(
+            path='.'.join(reversed(site.full_name.split('.'))) + '.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0011_key_value_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='site',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_site_paths, migrations.RunPython.noop),
+    ]
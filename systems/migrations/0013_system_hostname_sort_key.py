@@ -0,0 +1,36 @@
+# Generated by Django 2.0.13 on 2019-04-04 10:12
+
+import re
+
+from django.db import migrations, models
+
+
+def natural_sort_key(value):
+    return re.sub(
+        r'[0-9]+', lambda match: match.group(0).lstrip('0').zfill(10),
+        value or ''
+    )[:255]
+
+
+def populate_hostname_sort_keys(apps, schema_editor):
+    System = apps.get_model('systems', 'System')
+    for pk, hostname in System.objects.values_list('pk', 'hostname').iterator():
+        System.objects.filter(pk=pk).update(
+            hostname_sort_key=natural_sort_key(hostname)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0012_site_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='system',
+            name='hostname_sort_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_hostname_sort_keys, migrations.RunPython.noop),
+    ]
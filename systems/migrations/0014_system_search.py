@@ -0,0 +1,82 @@
+# Generated by Django 2.0.13 on 2019-04-05 09:40
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SEARCH_FIELDS = ('hostname', 'serial', 'notes', 'asset_tag', 'oob_ip')
+
+INDEXABLE_RE = re.compile(r'[\x20-\x7e]{3}')
+
+
+def trigrams(text):
+    return set(
+        text[i:i + 3] for i in range(len(text) - 2)
+        if INDEXABLE_RE.fullmatch(text[i:i + 3])
+    )
+
+
+def populate_system_search(apps, schema_editor):
+    System = apps.get_model('systems', 'System')
+    KeyValue = apps.get_model('systems', 'KeyValue')
+    SystemSearchDocument = apps.get_model('systems', 'SystemSearchDocument')
+    SystemSearchTrigram = apps.get_model('systems', 'SystemSearchTrigram')
+
+    system_pks = list(System.objects.values_list('pk', flat=True))
+    for i in range(0, len(system_pks), 500):
+        pks = system_pks[i:i + 500]
+        values = {}
+        for row in System.objects.filter(pk__in=pks).values_list(
+                'pk', *SEARCH_FIELDS):
+            values[row[0]] = list(row[1:])
+        key_values = KeyValue.objects.filter(obj__in=pks).order_by('id')
+        for system_id, value in key_values.values_list('obj', 'value'):
+            values[system_id].append(value)
+        documents, rows = [], []
+        for system_id, system_values in values.items():
+            text = '\n'.join(value.lower() for value in system_values if value)
+            documents.append(SystemSearchDocument(system_id=system_id, text=text))
+            rows += [
+                SystemSearchTrigram(system_id=system_id, trigram=trigram)
+                for trigram in trigrams(text)
+            ]
+        SystemSearchDocument.objects.bulk_create(documents)
+        SystemSearchTrigram.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('systems', '0013_system_hostname_sort_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemSearchDocument',
+            fields=[
+                ('system', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='systems.System')),
+                ('text', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'system_search_documents',
+            },
+        ),
+        migrations.CreateModel(
+            name='SystemSearchTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='systems.System')),
+            ],
+            options={
+                'db_table': 'system_search_trigrams',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='systemsearchtrigram',
+            unique_together={('trigram', 'system')},
+        ),
+        migrations.RunPython(populate_system_search, migrations.RunPython.noop),
+    ]
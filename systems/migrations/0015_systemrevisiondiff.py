@@ -0,0 +1,30 @@
+# Generated by Django 2.0.13 on 2019-04-12 14:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reversion', '0001_squashed_0004_auto_20160611_1202'),
+        ('systems', '0014_system_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemRevisionDiff',
+            fields=[
+                ('version', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='system_diff', serialize=False, to='reversion.Version')),
+                ('system_id', models.IntegerField()),
+                ('changes', models.TextField()),
+            ],
+            options={
+                'db_table': 'system_revision_diff',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='systemrevisiondiff',
+            index_together={('system_id', 'version')},
+        ),
+    ]
@@ -1,20 +1,39 @@
 """ systems model """
+import contextlib
 import datetime
+import itertools
+import json
 import re
-import socket
 import math
 import string
+import threading
 import reversion
+from reversion.models import Version
 from reversion.signals import post_revision_commit
-from django.db import models
-from django.db.models import Q
+from django.db import IntegrityError, models, transaction
+from django.db.models import (
+    DEFERRED, Case, Count, F, Max, OuterRef, Q, Subquery, Value, When
+)
+from django.db.models.functions import Concat, Length, Substr
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db.models.signals import post_save
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import (
+    post_save, post_delete, pre_delete, pre_save
+)
 from django.db.models.query import QuerySet
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.dispatch import receiver
 from django.urls import reverse
 from settings import BUG_URL
+from systems.cached import CachedValue
+from systems.fragment_cache import system_fragments
+from systems.hostname_index import hostname_index
+from systems.resolver import resolver
+from systems.search import (
+    SEARCH_FIELDS, regex_literals, search_text, trigrams
+)
 
 
 class Refresher(object):
@@ -28,6 +47,24 @@ class Refresher(object):
         return self.__class__.objects.get(pk=self.pk)
 
 
+# Maximum number of pks put into a single ``IN (...)`` clause when batch
+# loading related rows. Keeps us under SQLite's 999 variable limit and keeps
+# MySQL packets small.
+BULK_ACTION_CHUNK_SIZE = 500
+
+
+def chunked(items, size):
+    """ yield successive lists of at most `size` items from `items` """
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# Upper bound on the number of keys remembered by
+# BaseKeyValue.get_validator_name() for each class.
+VALIDATOR_CACHE_SIZE = 10000
+
+
 def create_key_index(key_values):
     """ return list of dict with key/value pairs """
     index = {}
@@ -67,6 +104,10 @@ class BaseKeyValue(models.Model):
 
         Validation functions can start with '_aa_'. 'aa' stands for auxililary
         attribute.
+
+        Which attribute validates a key is looked up once per class and key
+        (see `get_validator_name`). Use `clean_many` to validate a batch of
+        pairs with a single uniqueness query.
     """
     id = models.AutoField(primary_key=True)
     key = models.CharField(max_length=255)
@@ -103,12 +144,38 @@ class BaseKeyValue(models.Model):
             'kv_pk': self.pk, 'obj_pk': self.obj.pk
         }
 
+    @classmethod
+    def get_validator_name(cls, key):
+        """
+        Return the name of the attribute that validates `key` on this class,
+        or None when there is no validator. Lookups are remembered in a
+        per-class table, misses included, so the attribute probing only
+        happens once per distinct key.
+        """
+        validators = cls.__dict__.get('_validators')
+        if validators is None:
+            validators = {}
+            cls._validators = validators
+        try:
+            return validators[key]
+        except KeyError:
+            pass
+        key_attr = key.replace('-', '_')
+        # aa stands for auxilarary attribute.
+        for name in (key_attr, "_aa_" + key_attr):
+            if hasattr(cls, name):
+                break
+        else:
+            name = None
+        if len(validators) >= VALIDATOR_CACHE_SIZE:
+            validators.clear()
+        validators[key] = name
+        return name
+
     def clean(self, require_validation=True, check_unique=True):  # pylint: disable=arguments-differ
         """ run clean """
-        key_attr = self.key.replace('-', '_')
-        # aa stands for auxilarary attribute.
-        if (not hasattr(self, key_attr) and
-                not hasattr(self, "_aa_" + key_attr)):
+        name = self.get_validator_name(self.key)
+        if name is None:
             # ??? Do we want this?
             if self.force_validation and require_validation:
                 raise ValidationError("No validator for key %s" % self.key)
@@ -116,14 +183,11 @@ class BaseKeyValue(models.Model):
                 if check_unique:  # Since we aren't call this later
                     self.validate_unique()
                 return
-        if hasattr(self, key_attr):
-            validate = getattr(self, key_attr)
-        else:
-            validate = getattr(self, "_aa_" + key_attr)
+        validate = getattr(self, name)
 
         if not callable(validate):
             raise ValidationError("No validator for key %s not callable" %
-                                  key_attr)
+                                  self.key.replace('-', '_'))
         try:
             validate()
         except TypeError as exc:
@@ -139,6 +203,58 @@ class BaseKeyValue(models.Model):
                 filter(~Q(id=self.pk)).exists()):
             raise ValidationError("A key with this value already exists.")
 
+    @classmethod
+    def clean_many(cls, key_values, require_validation=True):
+        """
+        clean() a batch of unsaved or modified key value pairs. Uniqueness
+        of the (obj, key, value) triples is checked against the database
+        with one query per chunk of pairs instead of one per pair, and
+        duplicates within the batch are caught too. Every problem is
+        collected and raised as a single ValidationError.
+        """
+        key_values = list(key_values)
+        errors = []
+        for kv in key_values:
+            try:
+                kv.clean(
+                    require_validation=require_validation, check_unique=False
+                )
+            except ValidationError as exc:
+                errors.extend(
+                    "Key: {0} Value {1}: {2}".format(kv.key, kv.value, message)
+                    for message in exc.messages
+                )
+
+        seen = {}
+        for kv in key_values:
+            triple = (kv.obj_id, kv.key, kv.value)
+            if triple in seen:
+                errors.append(
+                    "Key: {0} Value {1}: A key with this value already "
+                    "exists.".format(kv.key, kv.value)
+                )
+            else:
+                seen[triple] = kv.pk
+
+        # Each pair contributes an obj, key and value parameter
+        for chunk in chunked(seen, BULK_ACTION_CHUNK_SIZE // 3):
+            existing = cls.objects.filter(
+                obj__in=set(obj_id for obj_id, _, _ in chunk),
+                key__in=set(key for _, key, _ in chunk),
+                value__in=set(value for _, _, value in chunk),
+            ).values_list('pk', 'obj', 'key', 'value')
+            chunk = set(chunk)
+            for pk, obj_id, key, value in existing:
+                triple = (obj_id, key, value)
+                if triple in chunk and seen[triple] != pk:
+                    errors.append(
+                        "Key: {0} Value {1}: A key with this value already "
+                        "exists.".format(key, value)
+                    )
+
+        if errors:
+            raise ValidationError(errors)
+
 def validate_mac(mac):
     """
     Validates a mac address. If the mac is in the form XX-XX-XX-XX-XX-XX this
@@ -151,6 +267,23 @@ def validate_mac(mac):
     """
     return mac
 
+# "Allowable characters in a label for a host name are only ASCII letters,
+# digits, and the `-' character." "[T]he following characters are recommended
+# for use in a host name: "A-Z", "a-z", "0-9", dash and underscore"
+LABEL_CHARS = string.ascii_letters + string.digits + "-" + "_"
+LABEL_END_CHARS = tuple(string.ascii_letters + string.digits)
+# SRV records can start with '_'
+LABEL_START_CHARS = LABEL_END_CHARS + ('_',)
+
+# A label that passes validate_label() with the default character set, and a
+# name made of such labels. Anything these accept is valid; anything they
+# reject goes through the character by character checks below so the error
+# message stays the same.
+_LABEL_PATTERN = r'(?:[A-Za-z0-9]|[A-Za-z0-9_][A-Za-z0-9_-]*[A-Za-z0-9])'
+VALID_LABEL_RE = re.compile(_LABEL_PATTERN)
+VALID_NAME_RE = re.compile(r'{0}(?:\.{0})*'.format(_LABEL_PATTERN))
+
+
 def validate_label(label, valid_chars=None):
     """Validate a label.
         :param label: The label to be tested.
@@ -167,31 +300,25 @@ def validate_label(label, valid_chars=None):
     _name_type_check(label)
 
     if not valid_chars:
-        # "Allowable characters in a label for a host name are only
-        # ASCII letters, digits, and the `-' character." "[T]he
-        # following characters are recommended for use in a host name:
-        # "A-Z", "a-z", "0-9", dash and underscore"
-        valid_chars = string.ascii_letters + "0123456789" + "-" + "_"
+        if VALID_LABEL_RE.fullmatch(label):
+            return
+        valid_chars = LABEL_CHARS
 
     # Labels may not be all numbers, but may have a leading digit TODO
-    # Labels must end and begin only with a letter or digit TODO
 
     for char in label:
         if char == '.':
             raise ValidationError("Invalid name {0}. Please do not span "
                                   "multiple domains when creating records."
                                   .format(label))
-        if valid_chars.find(char) < 0:
+        if char not in valid_chars:
             raise ValidationError("Invalid name {0}. Character '{1}' is "
                                   "invalid.".format(label, char))
 
-    end_chars = string.ascii_letters + "0123456789"
-
     if (
             label and
-            not label.endswith(tuple(end_chars)) or
-            # SRV records can start with '_'
-            not label.startswith(tuple(end_chars + '_'))
+            not label.endswith(LABEL_END_CHARS) or
+            not label.startswith(LABEL_START_CHARS)
     ):
         raise ValidationError(
             "Labels must end and begin only with a letter or digit"
@@ -240,10 +367,13 @@ def validate_name(fqdn):
     _name_type_check(fqdn)
 
     # Star records are allowed. Remove them during validation.
-    if fqdn[0] == '*':
+    if fqdn[:1] == '*':
         fqdn = fqdn[1:]
         fqdn = fqdn.strip('.')
 
+    if VALID_NAME_RE.fullmatch(fqdn):
+        return
+
     for label in fqdn.split('.'):
         if not label:
             raise ValidationError("Invalid name {0}. Empty label."
@@ -251,6 +381,38 @@ def validate_name(fqdn):
         validate_label(label)
 
 
+def validate_names(fqdns):
+    """
+    Validate many names in one call. Returns a dict mapping every invalid
+    name to the ValidationError validate_name() raises for it; an empty
+    dict means every name is valid. Duplicate names are only checked once
+    and values that aren't strings are reported under their repr().
+
+        >>> errors = validate_names(hostnames)
+        >>> for name, error in errors.items():
+        ...     print(name, error.messages)
+    """
+    errors = {}
+    seen = set()
+    match = VALID_NAME_RE.fullmatch
+    for fqdn in fqdns:
+        if not isinstance(fqdn, str):
+            errors[repr(fqdn)] = ValidationError(
+                "Error: A name must be of type str."
+            )
+            continue
+        if fqdn in seen:
+            continue
+        seen.add(fqdn)
+        if match(fqdn):
+            continue
+        try:
+            validate_name(fqdn)
+        except ValidationError as exc:
+            errors[fqdn] = exc
+    return errors
+
+
 class QuerySetManager(models.Manager):
     """ manager """
     def get_query_set(self):
@@ -266,33 +428,50 @@ def to_a(text, obj, use_absolute_url=True):
         return "<a href='{0}'>{1}</a>".format(obj, text)
 
 class DirtyFieldsMixin(object):
-    """ mixin to detect fields that are dirty """
+    """
+    mixin to detect fields that are dirty
+
+    The original state is a tuple of field values ordered like
+    ``_meta.concrete_fields``, taken when the instance is created, with
+    DEFERRED for the fields a ``.only()`` or ``.defer()`` query didn't load.
+    A single post_save receiver (`reset_dirty_state`) refreshes it after
+    every save, so nothing is registered or copied per instance.
+    """
     def __init__(self, *args, **kwargs):
         super(DirtyFieldsMixin, self).__init__(*args, **kwargs)
-        post_save.connect(
-            self._reset_state, sender=self.__class__,
-            dispatch_uid='{0}-DirtyFieldsMixin-sweeper'.format(
-                self.__class__.__name__)
-        )
-        self._reset_state()
+        self._original_state = self._as_tuple()
 
     def _reset_state(self, **kwargs): # pylint: disable=unused-argument
-        self._original_state = self._as_dict()
+        self._original_state = self._as_tuple()
 
-    def _as_dict(self):
-        return dict([
-            (f.attname, getattr(self, f.attname))
-            for f in self._meta.local_fields
-        ])
+    def _as_tuple(self):
+        # Read __dict__ directly so deferred fields don't trigger a query
+        return tuple(
+            self.__dict__.get(f.attname, DEFERRED)
+            for f in self._meta.concrete_fields
+        )
 
     def get_dirty_fields(self):
-        new_state = self._as_dict()
+        fields = self._meta.concrete_fields
+        new_state = self._as_tuple()
         return dict([
-            (key, value) for key, value
-            in self._original_state.iteritems() if value != new_state[key]
+            (fields[i].attname, value) for i, value
+            in enumerate(self._original_state)
+            if value is not DEFERRED and new_state[i] is not DEFERRED and
+            value != new_state[i]
         ])
 
 
+# Connected without a sender on purpose, so it runs after the save of every
+# model: one receiver covers all DirtyFieldsMixin models, present and future,
+# and the isinstance() check is all it costs the others.
+@receiver(post_save)
+def reset_dirty_state(sender, instance, **kwargs): # pylint: disable=unused-argument
+    """ refresh the DirtyFieldsMixin snapshot of a saved instance """
+    if isinstance(instance, DirtyFieldsMixin):
+        instance._reset_state() # pylint: disable=protected-access
+
+
 class BuildManager(models.Manager):
     def get_query_set(self):
         return super(BuildManager, self).get_query_set().filter(
@@ -309,6 +488,25 @@ class SystemWithRelatedManager(models.Manager):
             'system_rack',
         )
 
+class SystemQuerySet(QuerySet):
+    """ queryset used by System.objects """
+    def delete(self):
+        with deleting_systems():
+            return super(SystemQuerySet, self).delete()
+
+    def with_primary_ip(self):
+        """
+        Annotate every system with ``annotated_primary_ip`` (the value of its
+        first ipv4_address key) using a subquery, so reading
+        System.primary_ip doesn't run one query per system.
+        """
+        return self.annotate(annotated_primary_ip=Subquery(
+            KeyValue.objects.filter(
+                obj=OuterRef('pk'), key__contains='ipv4_address'
+            ).order_by('key').values('value')[:1]
+        ))
+
+
 def validate_site_name(name):
     if not name:
         raise ValidationError("A site name must be non empty.")
@@ -317,11 +515,16 @@ def validate_site_name(name):
     if name.find('.') > 0:
         raise ValidationError("A site name must not contain a period.")
 
-class Site(models.Model):
-    systems = None
-    # This is memoized later. Remove it when SystemRack is moved into it's own
-    # file as this circular import is not required.
+def site_path(full_name):
+    """
+    Return the materialized path of a site: its full name with the labels
+    reversed and a trailing dot ('rack.scl3.us' -> 'us.scl3.rack.'), so all
+    descendants of a site share its path as an indexable prefix.
+    """
+    return '.'.join(reversed(full_name.split('.'))) + '.'
+
 
+class Site(models.Model):
     id = models.AutoField(primary_key=True)
     full_name = models.CharField(
         max_length=255, null=True, blank=True
@@ -330,6 +533,10 @@ class Site(models.Model):
         max_length=255, validators=[validate_site_name], blank=True
     )
     parent = models.ForeignKey("self", null=True, blank=True, on_delete=models.CASCADE)
+    # Maintained by save(), see site_path()
+    path = models.CharField(
+        max_length=255, blank=True, editable=False, db_index=True
+    )
 
     search_fields = ('full_name',)
 
@@ -357,8 +564,29 @@ class Site(models.Model):
 
     def save(self, *args, **kwargs): # pylint: disable=arguments-differ
         self.name = self.full_name.split('.')[0]
+        self._db_state = None # (full_name, path) as stored, set by clean()
         self.full_clean()
+        self.path = site_path(self.full_name)
         super(Site, self).save(*args, **kwargs)
+        if self._db_state and self._db_state[1] not in ('', self.path):
+            self._move_descendants(*self._db_state)
+
+    def _move_descendants(self, old_full_name, old_path):
+        """ rewrite full_name and path of every site below us """
+        if not old_path:
+            # Every path starts with ''
+            return
+        self.__class__.objects.filter(
+            path__startswith=old_path
+        ).exclude(pk=self.pk).update(
+            full_name=Concat(
+                Substr(
+                    'full_name', 1, Length('full_name') - len(old_full_name)
+                ),
+                Value(self.full_name)
+            ),
+            path=Concat(Value(self.path), Substr('path', len(old_path) + 1))
+        )
 
     def clean(self):
         map(validate_site_name, self.full_name.split('.'))
@@ -368,6 +596,7 @@ class Site(models.Model):
         validate_site_name(self.name)
         if self.pk:
             db_self = self.__class__.objects.get(pk=self.pk)
+            self._db_state = (db_self.full_name, db_self.path)
             if self.site_set.exists() and self.name != db_self.name:
                 raise ValidationError(
                     "This site has child sites. You cannot change it's name "
@@ -403,6 +632,8 @@ class Site(models.Model):
         return details
 
     def get_site_path(self):
+        if self.path:
+            return '.'.join(reversed(self.path.rstrip('.').split('.')))
         target = self
         npath = [self.name]
         while True:
@@ -413,11 +644,33 @@ class Site(models.Model):
                 target = target.parent
         return '.'.join(npath)
 
+    def get_descendant_sites(self, include_self=True):
+        """ this site and every site below it, in one indexed query """
+        if not self.path:
+            # Unsaved: every path starts with '', this would match all sites
+            return self.__class__.objects.none()
+        sites = self.__class__.objects.filter(path__startswith=self.path)
+        if not include_self:
+            sites = sites.exclude(pk=self.pk)
+        return sites
+
+    def get_descendant_racks(self):
+        """ all racks in this site or any site below it """
+        if not self.path:
+            return SystemRack.objects.none()
+        return SystemRack.objects.filter(site__path__startswith=self.path)
+
     def get_systems(self):
         """Get all systems associated to racks in this site"""
-        if not self.systems:
-            self.systems = System.objects.all()
-        return self.systems.filter(system_rack__in=self.systemrack_set.all())
+        return System.objects.filter(system_rack__site=self)
+
+    def get_descendant_systems(self):
+        """ all systems racked in this site or any site below it """
+        if not self.path:
+            return System.objects.none()
+        return System.objects.filter(
+            system_rack__site__path__startswith=self.path
+        )
 
 class ScheduledTask(models.Model):
     task = models.CharField(max_length=255, blank=False, unique=True)
@@ -538,6 +791,16 @@ class KeyValue(BaseKeyValue):
 
     class Meta:
         db_table = u'key_value'
+        # Match the access patterns of keyvalue_set lookups (obj, key), DHCP
+        # scope and alias lookups (key, value) and the "is this IP used by
+        # another system" check (value).
+        indexes = [
+            models.Index(fields=['obj', 'key'], name='key_value_obj_key_idx'),
+            models.Index(
+                fields=['key', 'value'], name='key_value_key_value_idx'
+            ),
+            models.Index(fields=['value'], name='key_value_value_idx'),
+        ]
 
     def __str__(self):
         return self.key if self.key else ''
@@ -545,6 +808,14 @@ class KeyValue(BaseKeyValue):
     def __repr__(self):
         return "<{0}: '{1}'>".format(self.key, self.value)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(KeyValue, cls).from_db(db, field_names, values)
+        # Remember the key we were loaded with so a renamed nic key can be
+        # dropped from SystemNic.
+        instance._loaded_key = instance.__dict__.get('key') # pylint: disable=protected-access
+        return instance
+
     def save(self, *args, **kwargs): # pylint: disable=arguments-differ
         if re.match(r'^nic\.\d+\.mac_address\.\d+$', self.key):
             self.value = self.value.replace('-', ':')
@@ -556,6 +827,324 @@ class KeyValue(BaseKeyValue):
         super(KeyValue, self).save(*args, **kwargs)
 
 
+NIC_KEY_RE = re.compile(r'^nic\.(\d+)\.(.+)\.(\d+)$')
+
+
+class SystemNic(models.Model):
+    """
+    Denormalized, indexed copy of the ``nic.N.field.M`` KeyValue keys of a
+    System. There is one row per (system, nic number N, sub index M) and the
+    well known fields get their own column.
+
+    The row of a nic key is rebuilt from the KeyValue store whenever the key
+    is saved or deleted (see `sync_system_nics`), so never edit them
+    directly. Code that bypasses signals (``QuerySet.update``,
+    ``bulk_create``) must call `rebuild_for_system` itself.
+    """
+    NIC_FIELDS = (
+        'mac_address', 'ipv4_address', 'dhcp_scope', 'hostname', 'name',
+        'adapter_name', 'option_hostname', 'dhcp_hostname', 'dhcp_filename',
+        'dhcp_domain_name', 'dhcp_domain_name_servers', 'reverse_dns_zone',
+    )
+
+    system = models.ForeignKey('System', on_delete=models.CASCADE)
+    nic_number = models.PositiveIntegerField()
+    sub_index = models.PositiveIntegerField()
+    mac_address = models.CharField(
+        max_length=255, null=True, blank=True, db_index=True
+    )
+    ipv4_address = models.CharField(
+        max_length=255, null=True, blank=True, db_index=True
+    )
+    dhcp_scope = models.CharField(
+        max_length=255, null=True, blank=True, db_index=True
+    )
+    hostname = models.CharField(
+        max_length=255, null=True, blank=True, db_index=True
+    )
+    name = models.CharField(max_length=255, null=True, blank=True)
+    adapter_name = models.CharField(max_length=255, null=True, blank=True)
+    option_hostname = models.CharField(max_length=255, null=True, blank=True)
+    dhcp_hostname = models.CharField(max_length=255, null=True, blank=True)
+    dhcp_filename = models.CharField(max_length=255, null=True, blank=True)
+    dhcp_domain_name = models.CharField(max_length=255, null=True, blank=True)
+    dhcp_domain_name_servers = models.CharField(
+        max_length=255, null=True, blank=True
+    )
+    reverse_dns_zone = models.CharField(max_length=255, null=True, blank=True)
+
+    class Meta:
+        db_table = u'system_nics'
+        ordering = ['nic_number', 'sub_index']
+        unique_together = ('system', 'nic_number', 'sub_index')
+
+    def __str__(self):
+        return "nic.{0}.{1}".format(self.nic_number, self.sub_index)
+
+    def __repr__(self):
+        return "<SystemNic {0}>".format(self)
+
+    @classmethod
+    def parse_key(cls, key):
+        """
+        Split a KeyValue key into ``(nic_number, field, sub_index)``. Returns
+        None for keys that are not of the form ``nic.N.field.M``.
+        """
+        match = NIC_KEY_RE.match(key or '')
+        if not match:
+            return None
+        return int(match.group(1)), match.group(2), int(match.group(3))
+
+    @classmethod
+    def build_rows(cls, system_id, key_values):
+        """
+        Build (unsaved) SystemNic rows for a system from an iterable of
+        ``(key, value)`` pairs. Later pairs win when a key is repeated.
+        """
+        rows = {}
+        for key, value in key_values:
+            parsed = cls.parse_key(key)
+            if not parsed:
+                continue
+            nic_number, field, sub_index = parsed
+            row = rows.get((nic_number, sub_index))
+            if row is None:
+                row = cls(
+                    system_id=system_id, nic_number=nic_number,
+                    sub_index=sub_index
+                )
+                rows[(nic_number, sub_index)] = row
+            if field in cls.NIC_FIELDS:
+                setattr(row, field, value)
+        return [rows[index] for index in sorted(rows)]
+
+    @classmethod
+    def rebuild_for_system(cls, system_id):
+        """ Replace all rows of a system with what is in the KeyValue store """
+        key_values = KeyValue.objects.filter(
+            obj=system_id, key__startswith='nic.'
+        ).order_by('id').values_list('key', 'value')
+        cls.objects.filter(system=system_id).delete()
+        cls.objects.bulk_create(cls.build_rows(system_id, key_values))
+
+    @classmethod
+    def rebuild_row(cls, system_id, nic_number, sub_index):
+        """
+        Rebuild the row of the ``nic.<nic_number>.*.<sub_index>`` keys of a
+        system, leaving its other nics alone.
+        """
+        key_values = KeyValue.objects.filter(
+            obj=system_id, key__startswith='nic.{0}.'.format(nic_number),
+            key__endswith='.{0}'.format(sub_index)
+        ).order_by('id').values_list('key', 'value')
+        rows = [
+            row for row in cls.build_rows(system_id, key_values)
+            if (row.nic_number, row.sub_index) == (nic_number, sub_index)
+        ]
+        existing = cls.objects.filter(
+            system=system_id, nic_number=nic_number, sub_index=sub_index
+        )
+        if not rows:
+            existing.delete()
+            return
+        values = dict(
+            (field, getattr(rows[0], field)) for field in cls.NIC_FIELDS
+        )
+        if not existing.update(**values):
+            rows[0].save()
+
+    @classmethod
+    def rebuild_all(cls, batch_size=BULK_ACTION_CHUNK_SIZE):
+        """ Rebuild the whole table from the KeyValue store """
+        cls.objects.all().delete()
+        key_values = KeyValue.objects.filter(
+            key__startswith='nic.', obj__isnull=False
+        ).order_by('obj', 'id').values_list('obj', 'key', 'value')
+
+        rows = []
+        cur_system, cur_pairs = None, []
+        for system_id, key, value in key_values.iterator():
+            if system_id != cur_system:
+                rows += cls.build_rows(cur_system, cur_pairs)
+                cur_system, cur_pairs = system_id, []
+            cur_pairs.append((key, value))
+            if len(rows) >= batch_size:
+                cls.objects.bulk_create(rows)
+                rows = []
+        rows += cls.build_rows(cur_system, cur_pairs)
+        cls.objects.bulk_create(rows, batch_size=batch_size)
+
+    def as_dict(self):
+        """ return the nic fields that are set, keyed by field name """
+        return dict(
+            (field, getattr(self, field)) for field in self.NIC_FIELDS
+            if getattr(self, field) is not None
+        )
+
+
+class SystemSearchDocument(models.Model):
+    """
+    Search index of a System: one lowercased document per system holding
+    its SEARCH_FIELDS and KeyValue values, plus the document's trigrams in
+    SystemSearchTrigram (see systems.search).
+
+    Like SystemNic this is rebuilt from signals whenever a System or one of
+    its KeyValues is saved or deleted, so never edit it directly. Code that
+    bypasses signals must call `rebuild_for_system` itself.
+    """
+    system = models.OneToOneField(
+        'System', primary_key=True, on_delete=models.CASCADE
+    )
+    text = models.TextField(blank=True)
+
+    class Meta:
+        db_table = u'system_search_documents'
+
+    @classmethod
+    def build_text(cls, system_id):
+        values = System.objects.filter(pk=system_id).values_list(
+            *SEARCH_FIELDS
+        ).first()
+        if values is None:
+            return None
+        return search_text(list(values) + list(
+            KeyValue.objects.filter(obj=system_id).order_by('id')
+            .values_list('value', flat=True)
+        ))
+
+    @classmethod
+    def rebuild_for_system(cls, system_id):
+        """
+        Rebuild the document of a system. Only the trigrams that changed are
+        written, so a single KeyValue edit touches a handful of rows.
+        """
+        text = cls.build_text(system_id)
+        if text is None:
+            cls.objects.filter(system=system_id).delete()
+            SystemSearchTrigram.objects.filter(system=system_id).delete()
+            return
+        cls.objects.update_or_create(
+            system_id=system_id, defaults={'text': text}
+        )
+        new = trigrams(text)
+        old = set(
+            SystemSearchTrigram.objects.filter(system=system_id)
+            .values_list('trigram', flat=True)
+        )
+        for chunk in chunked(old - new, BULK_ACTION_CHUNK_SIZE):
+            SystemSearchTrigram.objects.filter(
+                system=system_id, trigram__in=chunk
+            ).delete()
+        SystemSearchTrigram.objects.bulk_create([
+            SystemSearchTrigram(system_id=system_id, trigram=trigram)
+            for trigram in new - old
+        ], batch_size=BULK_ACTION_CHUNK_SIZE)
+
+    @classmethod
+    def rebuild_all(cls, batch_size=BULK_ACTION_CHUNK_SIZE):
+        """ Rebuild the whole index """
+        SystemSearchTrigram.objects.all().delete()
+        cls.objects.all().delete()
+        cls.index_systems(
+            System.objects.values_list('pk', flat=True).iterator(), batch_size
+        )
+
+    @classmethod
+    def index_systems(cls, system_pks, batch_size=BULK_ACTION_CHUNK_SIZE):
+        """
+        Index systems that have no document yet, e.g. ones inserted with
+        ``bulk_create``, a few queries per `batch_size` systems.
+        """
+        for pks in chunked(system_pks, batch_size):
+            values = {}
+            for row in System.objects.filter(pk__in=pks).values_list(
+                    'pk', *SEARCH_FIELDS):
+                values[row[0]] = list(row[1:])
+            key_values = KeyValue.objects.filter(obj__in=pks).order_by('id')
+            for system_id, value in key_values.values_list('obj', 'value'):
+                values[system_id].append(value)
+            documents, rows = [], []
+            for system_id, system_values in values.items():
+                text = search_text(system_values)
+                documents.append(cls(system_id=system_id, text=text))
+                rows += [
+                    SystemSearchTrigram(system_id=system_id, trigram=trigram)
+                    for trigram in trigrams(text)
+                ]
+            cls.objects.bulk_create(documents)
+            SystemSearchTrigram.objects.bulk_create(rows, batch_size=batch_size)
+
+    @classmethod
+    def matching(cls, term):
+        """
+        Return a values queryset of the pks of the systems matching `term`:
+        a case insensitive substring search of the whole document, or a
+        regex search of the hostname when the term starts with '/'.
+        """
+        if term.startswith('/') and len(term) > 1:
+            pattern = term[1:]
+            systems = System.objects.filter(hostname__regex=pattern)
+            required = set()
+            for literal in regex_literals(pattern):
+                required |= trigrams(literal)
+            if required:
+                systems = systems.filter(
+                    pk__in=SystemSearchTrigram.candidates(required)
+                )
+            return systems.values_list('pk', flat=True)
+
+        needle = term.lower()
+        documents = cls.objects.filter(text__contains=needle)
+        required = trigrams(needle)
+        if required:
+            documents = documents.filter(
+                system__in=SystemSearchTrigram.candidates(required)
+            )
+        return documents.values_list('system', flat=True)
+
+
+class SystemSearchTrigram(models.Model):
+    """ a trigram of a SystemSearchDocument """
+    system = models.ForeignKey('System', on_delete=models.CASCADE)
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        db_table = u'system_search_trigrams'
+        unique_together = ('trigram', 'system')
+
+    # Trigrams of a term intersected at most, see candidates()
+    MAX_TRIGRAMS = 3
+
+    @classmethod
+    def counts(cls, trigrams):
+        """ dict of trigram -> number of systems having it, for `trigrams` """
+        return dict(
+            cls.objects.filter(trigram__in=trigrams).values_list(
+                'trigram'
+            ).annotate(n=Count('pk'))
+        )
+
+    @classmethod
+    def candidates(cls, required):
+        """
+        Values queryset of the systems having the rarest MAX_TRIGRAMS
+        trigrams in `required`, a superset of those having all of them.
+        Common trigrams ('moz', 'com'...) match most systems and would only
+        make the GROUP BY scan more rows.
+        """
+        rarest = sorted(required)
+        if len(rarest) > cls.MAX_TRIGRAMS:
+            counts = cls.counts(rarest)
+            rarest = sorted(
+                rarest, key=lambda trigram: (counts.get(trigram, 0), trigram)
+            )[:cls.MAX_TRIGRAMS]
+        return cls.objects.filter(trigram__in=rarest).values(
+            'system'
+        ).annotate(hits=Count('pk')).filter(hits=len(rarest)).values(
+            'system'
+        )
+
+
 class NetworkAdapter(models.Model):
     system_id = models.IntegerField()
     mac_address = models.CharField(max_length=255)
@@ -609,6 +1198,24 @@ class OperatingSystem(models.Model):
         return ('name', 'version')
 
 
+# Digit runs are zero padded to this width in natural sort keys.
+NATURAL_SORT_DIGITS = 10
+DIGITS_RE = re.compile(r'[0-9]+')
+
+
+def natural_sort_key(value):
+    """
+    Return a string that sorts the way humans expect when compared as a
+    plain string, so the database can do natural sorting with an index:
+    'web2.scl3' -> 'web0000000002.scl0000000003' sorts before 'web10.scl3'.
+    """
+    key = DIGITS_RE.sub(
+        lambda match: match.group(0).lstrip('0').zfill(NATURAL_SORT_DIGITS),
+        value or ''
+    )
+    return key[:255]
+
+
 @reversion.register
 class ServerModel(models.Model):
     vendor = models.CharField(max_length=255, blank=True)
@@ -664,6 +1271,42 @@ class SystemRack(models.Model):
     def systems(self):
         return self.system_set.select_related().order_by('rack_order')
 
+    @classmethod
+    def with_systems(cls, racks, system_filter=None):
+        """
+        Return a list of ``(rack, systems)`` for `racks`, where systems are
+        the rack's systems matching the `system_filter` Q object, ordered by
+        `System.rack_ordering`. The systems of all racks are fetched with a
+        single query (per BULK_ACTION_CHUNK_SIZE racks when `racks` isn't a
+        queryset) instead of one query per rack.
+        """
+        systems = System.objects.select_related(
+            'server_model', 'system_status'
+        ).order_by('system_rack', '-rack_order')
+        if system_filter is not None:
+            systems = systems.filter(system_filter)
+
+        if isinstance(racks, QuerySet):
+            rack_list = list(racks)
+            loaded = systems.filter(system_rack__in=racks.values('pk'))
+        else:
+            rack_list = list(racks)
+            loaded = itertools.chain.from_iterable(
+                systems.filter(system_rack__in=pks) for pks in
+                chunked([rack.pk for rack in rack_list], BULK_ACTION_CHUNK_SIZE)
+            )
+
+        by_rack = dict((rack.pk, []) for rack in rack_list)
+        racks_by_pk = dict((rack.pk, rack) for rack in rack_list)
+        for system in loaded:
+            if system.system_rack_id in by_rack:
+                system.system_rack = racks_by_pk[system.system_rack_id]
+                by_rack[system.system_rack_id].append(system)
+        return [
+            (rack, list(System.rack_ordering(by_rack[rack.pk])))
+            for rack in rack_list
+        ]
+
 
 @reversion.register
 class SystemType(models.Model):
@@ -697,6 +1340,21 @@ class SystemStatus(models.Model):
     def get_api_fields(cls):
         return ('status',)
 
+    @classmethod
+    def get_id(cls, status):
+        """
+        Return the pk of the status named `status`, or None when there isn't
+        one. Results are cached in the process (see `system_status_ids`).
+        """
+        return system_status_ids().get(status)
+
+
+# status name -> pk, for SystemStatus.get_id
+system_status_ids = CachedValue( # pylint: disable=invalid-name
+    lambda: dict(SystemStatus.objects.values_list('status', 'pk')),
+    [SystemStatus], getattr(settings, 'CHOICES_CACHE_TTL', 60)
+)
+
 @reversion.register(follow= # pylint: disable=function-redefined
                     [
                         "system_type",
@@ -729,6 +1387,10 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
     hostname = models.CharField(
         unique=True, max_length=255, validators=[validate_name]
     )
+    # natural_sort_key(hostname), maintained by save()
+    hostname_sort_key = models.CharField(
+        max_length=255, blank=True, editable=False, db_index=True
+    )
     serial = models.CharField(max_length=255, blank=True, null=True)
     pdu1 = models.CharField(max_length=255, blank=True, null=True)
     pdu2 = models.CharField(max_length=255, blank=True, null=True)
@@ -751,7 +1413,7 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
     warranty_end = models.DateField(blank=True, null=True, default=None)
     current_revision = models.IntegerField(default=0)
 
-    objects = models.Manager()
+    objects = SystemQuerySet.as_manager()
     build_objects = BuildManager()
     with_related = SystemWithRelatedManager()
 
@@ -784,6 +1446,8 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
 
     @property
     def primary_ip(self):
+        if 'annotated_primary_ip' in self.__dict__:
+            return self.annotated_primary_ip
         try:
             first_ip = self.keyvalue_set.filter(
                 key__contains='ipv4_address').order_by('key')[0].value
@@ -793,10 +1457,35 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
 
     @property
     def primary_reverse(self):
-        try:
-            return str(socket.gethostbyaddr(self.primary_ip)[0])
-        except: # pylint: disable=bare-except
-            return None
+        return resolver.lookup(self.primary_ip)
+
+    @classmethod
+    def primary_reverses(cls, systems):
+        """
+        Reverse resolve the primary IP of every system in `systems` at once
+        and return a dict of system pk -> fqdn (None when there is no IP or
+        no PTR). The lookups run concurrently and land in the resolver cache,
+        so `primary_reverse` and `get_updated_fqdn` on these systems don't
+        block on DNS afterwards.
+        """
+        if isinstance(systems, SystemQuerySet):
+            primary_ips = dict(
+                systems.with_primary_ip()
+                .values_list('pk', 'annotated_primary_ip')
+            )
+            system_pks = list(primary_ips.keys())
+        else:
+            system_pks = [system.pk for system in systems]
+            primary_ips = {}
+            for pks in chunked(system_pks, BULK_ACTION_CHUNK_SIZE):
+                primary_ips.update(
+                    cls.objects.filter(pk__in=pks).with_primary_ip()
+                    .values_list('pk', 'annotated_primary_ip')
+                )
+        reverses = resolver.lookup_many(primary_ips.values())
+        return dict(
+            (pk, reverses.get(primary_ips.get(pk))) for pk in system_pks
+        )
 
     @property
     def notes_with_link(self):
@@ -842,7 +1531,11 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
         if isinstance(systems, QuerySet):
             systems = list(systems)
 
-        systems = list(reversed(sorted(systems, key=lambda s: s.rack_order)))
+        # Systems without a rack_order go last
+        systems = list(reversed(sorted(
+            systems,
+            key=lambda s: (s.rack_order is not None, s.rack_order or 0)
+        )))
         i = 0
         cur_integer = None
 
@@ -882,6 +1575,11 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
 
         This function will serialize and export StaticReg objects and their
         accompanying HWAdapter objects
+
+        Related rows are pulled in with chunked ``IN`` queries (see
+        BULK_ACTION_CHUNK_SIZE) so the number of queries scales with the
+        number of matched systems divided by the chunk size, not with the
+        number of systems.
         """
         if not fields:
             fields = cls.get_api_fields() + ['pk']
@@ -891,37 +1589,48 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
         sys_t_bundles = cls.objects.filter(query).values_list(*fields)
 
         sys_d_bundles = {}
-        sys_pks = []
+        pk_to_hostname = {}
         for t_bundle in sys_t_bundles:
             d_bundle = dict(zip(fields, t_bundle))
-            system_hostname = d_bundle['hostname']
-            sys_d_bundles[system_hostname] = d_bundle
-            sys_d_bundles[system_hostname]['keyvalue_set'] = create_key_index(
-                cls.keyvalue_set.related.model.objects.filter(
-                    obj=d_bundle['pk']
-                ).values('key', 'value', 'pk')
-            )
-            if show_related:
-                sys_pks.append(d_bundle['pk'])
-
-        sys_q = Q(system__in=sys_pks)
+            d_bundle['keyvalue_set'] = {}
+            sys_d_bundles[d_bundle['hostname']] = d_bundle
+            pk_to_hostname[d_bundle['pk']] = d_bundle['hostname']
 
-        # Note that CNAMEs are pulled in during this call
-        sreg_bundles = cls.staticreg_set.related.model.get_bulk_action_list(
-            sys_q
-        )
+        sys_pks = list(pk_to_hostname.keys())
 
-        hw_q = Q(sreg__system__in=sys_pks)
-        hw_bundles = (
-            cls.staticreg_set.related.model.
-            hwadapter_set.related.model.get_bulk_action_list(hw_q)
-        )
+        # JOIN system, key_value ON obj_id
+        for pks in chunked(sys_pks, BULK_ACTION_CHUNK_SIZE):
+            kv_rows = KeyValue.objects.filter(obj__in=pks).values(
+                'key', 'value', 'pk', 'obj'
+            )
+            for kv_row in kv_rows:
+                obj_pk = kv_row.pop('obj')
+                sys_d_bundles[pk_to_hostname[obj_pk]]['keyvalue_set'][
+                    kv_row['key']
+                ] = kv_row
+
+        if not show_related:
+            return sys_d_bundles
+
+        sreg_model = cls.staticreg_set.related.model
+        hw_model = sreg_model.hwadapter_set.related.model
+
+        sreg_bundles = {}
+        hw_bundles = {}
+        for pks in chunked(sys_pks, BULK_ACTION_CHUNK_SIZE):
+            # Note that CNAMEs are pulled in during this call
+            sreg_bundles.update(
+                sreg_model.get_bulk_action_list(Q(system__in=pks))
+            )
+            hw_bundles.update(
+                hw_model.get_bulk_action_list(Q(sreg__system__in=pks))
+            )
 
         # JOIN staticreg, hw_adapter ON sreg_pk
-        for sreg_pk, hw_bundle in hw_bundles.iteritems():
+        for sreg_pk, hw_bundle in hw_bundles.items():
             sreg_bundles[sreg_pk]['hwadapter_set'] = hw_bundle
 
-        for sreg_pk, sreg_bundle in sreg_bundles.iteritems():
+        for sreg_pk, sreg_bundle in sreg_bundles.items():
             system = sreg_bundle.pop('system__hostname')
             sys_d_bundles[system].setdefault(
                 'staticreg_set', {}
@@ -929,6 +1638,43 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
 
         return sys_d_bundles
 
+    @classmethod
+    def set_current_revisions(cls, versions):
+        """
+        Set current_revision from an iterable of reversion Version objects.
+        Versions of other models are ignored and when a system has several
+        versions the newest one wins. All systems are updated with one UPDATE
+        statement per BULK_ACTION_CHUNK_SIZE systems, which makes this usable
+        for bulk imports that commit a single revision.
+        """
+        content_type = ContentType.objects.get_for_model(cls)
+        current = {}
+        for version in versions:
+            if version.content_type_id != content_type.pk:
+                continue
+            system_pk = int(version.object_id)
+            current[system_pk] = max(version.pk, current.get(system_pk, 0))
+
+        if len(current) == 1:
+            system_pk, version_pk = current.popitem()
+            return cls.objects.filter(pk=system_pk).update(
+                current_revision=version_pk
+            )
+
+        updated = 0
+        for system_pks in chunked(sorted(current), BULK_ACTION_CHUNK_SIZE):
+            updated += cls.objects.filter(pk__in=system_pks).update(
+                current_revision=Case(
+                    *[
+                        When(pk=system_pk, then=Value(current[system_pk]))
+                        for system_pk in system_pks
+                    ],
+                    default=F('current_revision'),
+                    output_field=models.IntegerField()
+                )
+            )
+        return updated
+
     @property
     def rdtype(self):
         return 'SYS'
@@ -943,6 +1689,7 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
 
     def save(self, *args, **kwargs): # pylint: disable=arguments-differ
         #self.save_history(kwargs)
+        self.hostname_sort_key = natural_sort_key(self.hostname)
         self.full_clean()
         with reversion.create_revision():
             request = kwargs.pop('request', None)
@@ -955,6 +1702,10 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
                     pass
             super(System, self).save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs): # pylint: disable=arguments-differ
+        with deleting_systems():
+            return super(System, self).delete(*args, **kwargs)
+
     def clean(self):
         # Only do this validation on new systems. Current data is so poor that
         # requireing existing systems to have this data is impossible
@@ -1070,27 +1821,27 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
             key value store. This will go away,
             once we are on the StaticReg
             based system
+
+            The adapter is the lowest numbered nic with a
+            nic.N.mac_address.0 key, as a dict of its sub index 0
+            values and 'num', or False when there is none. The
+            KeyValue scan this replaced took the first mac_address
+            key in table order, failed on one with a sub index
+            other than 0 and returned False when it found one.
         """
+        nic = self.systemnic_set.filter(
+            sub_index=0, mac_address__isnull=False
+        ).order_by('nic_number').first()
+        if nic is None:
+            return False
         ret = {}
         ret['mac_address'] = None
         ret['ip_address'] = None
-        ret['num'] = None
         ret['dhcp_scope'] = None
         ret['name'] = 'nic0'
-        key_value = self.keyvalue_set.filter(
-            key__startswith='nic', key__icontains='mac_address')[0]
-        m = re.search(r'nic\.(\d+)\.mac_address\.0', key_value.key)
-        ret['num'] = int(m.group(1))
-        key_value_set = self.keyvalue_set.filter(
-            key__startswith='nic.%s' % ret['num'])
-        if not key_value_set:
-            for kv in key_value_set:
-                m = re.search(r'nic\.\d+\.(.*)\.0', kv.key)
-                if m:
-                    ret[m.group(1)] = str(kv.value)
-            return ret
-        else:
-            return False
+        ret.update(nic.as_dict())
+        ret['num'] = nic.nic_number
+        return ret
 
     def delete_key_value_adapter_by_index(self, index):
         """
@@ -1129,30 +1880,24 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
             'build.mtv1.mozilla.com',
             'build.mozilla.org',
         ]
-        reverse_fqdn = self.primary_reverse
-        if self.primary_ip and reverse_fqdn:
+        primary_ip = self.primary_ip
+        reverse_fqdn = resolver.lookup(primary_ip)
+        if primary_ip and reverse_fqdn:
             current_hostname = str(self.hostname)
 
             if current_hostname and current_hostname != reverse_fqdn:
                 res = reverse_fqdn.replace(current_hostname, '').strip('.')
                 if res in allowed_domains:
                     self.update_host_for_migration(reverse_fqdn)
-        elif not self.primary_ip or self.primary_reverse:
-            for domain in allowed_domains:
-                updated = False
-                if not updated:
-                    try:
-                        fqdn = socket.gethostbyaddr(
-                            '%s.%s' % (self.hostname, domain)
-                        )
-                        if fqdn:
-                            self.update_host_for_migration(fqdn[0])
-                            updated = True
-                    except Exception: #pylint: disable=broad-except
-                        pass
-            if not updated:
-                pass
-                #print "Could not update hostname %s" % (self.hostname)
+        elif not primary_ip:
+            candidates = [
+                '%s.%s' % (self.hostname, domain) for domain in allowed_domains
+            ]
+            fqdns = resolver.lookup_many(candidates)
+            for candidate in candidates:
+                if fqdns.get(candidate):
+                    self.update_host_for_migration(fqdns[candidate])
+                    break
 
     def update_host_for_migration(self, new_hostname):
         if new_hostname.startswith(self.hostname):
@@ -1182,26 +1927,17 @@ class System(Refresher, DirtyFieldsMixin, models.Model):
         return False
 
     def get_nic_names(self):
-        adapter_names = []
-        pairs = KeyValue.objects.filter(
-            obj=self, key__startswith='nic', key__contains='adapter_name'
-        )
-        for row in pairs:
-            m = re.match(r'^nic\.\d+\.adapter_name\.\d+', row.key)
-            if m:
-                adapter_names.append(str(row.value))
-        return adapter_names
+        return [
+            str(adapter_name) for adapter_name in
+            self.systemnic_set.filter(adapter_name__isnull=False)
+            .values_list('adapter_name', flat=True)
+        ]
 
     def get_adapter_numbers(self):
-        nic_numbers = []
-        pairs = KeyValue.objects.filter(obj=self, key__startswith='nic')
-        for row in pairs:
-            m = re.match(r'^nic\.(\d+)\.', row.key)
-            if m:
-                match = int(m.group(1))
-                if match not in nic_numbers:
-                    nic_numbers.append(match)
-        return nic_numbers
+        return list(
+            self.systemnic_set.order_by('nic_number')
+            .values_list('nic_number', flat=True).distinct()
+        )
 
     def get_adapter_count(self):
         return len(self.get_adapter_numbers())
@@ -1217,6 +1953,180 @@ class SystemChangeLog(models.Model):
         db_table = u'systems_change_log'
 
 
+# System fields left out of revision diffs, they only mirror other fields or
+# the revision history itself.
+REVISION_DIFF_EXCLUDE = ('current_revision', 'hostname_sort_key')
+
+
+def version_changes(old, new):
+    """
+    Return ``[field, old value, new value]`` for every System field that
+    differs between the versions `old` (None for the first version of a
+    system) and `new`. Field names are attnames, so foreign keys are pks.
+    """
+    old_fields = old.field_dict if old is not None else {}
+    new_fields = new.field_dict
+    changes = []
+    for field in System._meta.concrete_fields:
+        name = field.attname
+        if (field.primary_key or name in REVISION_DIFF_EXCLUDE or
+                name not in new_fields):
+            continue
+        old_value, new_value = old_fields.get(name), new_fields[name]
+        if old_value == new_value or (
+                old_value in (None, '') and new_value in (None, '')):
+            continue
+        changes.append([name, old_value, new_value])
+    return changes
+
+
+class SystemRevisionDiff(models.Model):
+    """
+    The fields a Version of a System changed compared to the previous
+    version of that system. Diffs are stored when a revision is committed,
+    so history pages read them instead of deserializing and comparing whole
+    versions. Versions older than this table get their diff the first time
+    it is asked for.
+    """
+    version = models.OneToOneField(
+        Version, primary_key=True, related_name='system_diff',
+        on_delete=models.CASCADE
+    )
+    # Version.object_id is a string, this can be filtered on as a number
+    system_id = models.IntegerField()
+    changes = models.TextField()  # JSON list of [field, old, new]
+
+    class Meta:
+        db_table = u'system_revision_diff'
+        index_together = (('system_id', 'version'),)
+
+    def get_changes(self):
+        return json.loads(self.changes)
+
+    @classmethod
+    def record(cls, versions, batch_size=BULK_ACTION_CHUNK_SIZE):
+        """
+        Store the diffs of the System versions in `versions`, the versions
+        of a single revision. The previous versions are loaded with two
+        queries per `batch_size` systems.
+        """
+        content_type = ContentType.objects.get_for_model(System)
+        versions = [
+            version for version in versions
+            if version.content_type_id == content_type.pk
+        ]
+        diffs = []
+        for chunk in chunked(versions, batch_size):
+            previous_pks = Version.objects.filter(
+                content_type=content_type,
+                object_id__in=[version.object_id for version in chunk],
+                pk__lt=min(version.pk for version in chunk),
+            ).order_by().values('object_id').annotate(
+                previous=Max('pk')
+            ).values_list('previous', flat=True)
+            previous = dict(
+                (version.object_id, version) for version in
+                Version.objects.filter(pk__in=list(previous_pks))
+            )
+            diffs += [
+                cls(
+                    version=version, system_id=int(version.object_id),
+                    changes=json.dumps(version_changes(
+                        previous.get(version.object_id), version
+                    ), cls=DjangoJSONEncoder)
+                )
+                for version in chunk
+            ]
+        cls.objects.bulk_create(diffs, batch_size=batch_size)
+
+    @classmethod
+    def between(cls, system_id, start, end):
+        """
+        Return the diffs of the versions of system `system_id` with
+        ``start < pk <= end``, oldest first. Missing diffs are computed and
+        stored.
+        """
+        diffs = list(cls.objects.filter(
+            system_id=system_id, version__gt=start, version__lte=end
+        ).order_by('version_id'))
+        versions = Version.objects.get_for_object_reference(
+            System, system_id
+        ).order_by('pk')
+        if len(diffs) == versions.filter(pk__gt=start, pk__lte=end).count():
+            return diffs
+
+        found = set(diff.version_id for diff in diffs)
+        first = versions.filter(pk__lte=start).values_list(
+            'pk', flat=True
+        ).last() or start
+        previous, missing = None, []
+        for version in versions.filter(pk__gte=first, pk__lte=end):
+            if version.pk > start and version.pk not in found:
+                missing.append(cls(
+                    version=version, system_id=system_id,
+                    changes=json.dumps(
+                        version_changes(previous, version),
+                        cls=DjangoJSONEncoder
+                    )
+                ))
+            previous = version
+        try:
+            with transaction.atomic():
+                cls.objects.bulk_create(missing)
+        except IntegrityError:
+            # A concurrent request stored them first, the same diffs
+            pass
+        return sorted(diffs + missing, key=lambda diff: diff.version_id)
+
+    @classmethod
+    def changes_between(cls, system_id, from_pk, to_pk):
+        """
+        Return ``[field, value at from_pk, value at to_pk]`` for the fields
+        that differ between two versions of a system, built from the stored
+        diffs of the versions in between.
+        """
+        start, end = sorted((from_pk, to_pk))
+        fields = {}
+        for diff in cls.between(system_id, start, end):
+            for name, old_value, new_value in diff.get_changes():
+                fields[name] = [fields.get(name, [old_value])[0], new_value]
+        changes = [
+            [name, first, last] for name, (first, last) in fields.items()
+            if first != last
+        ]
+        if from_pk > to_pk:
+            changes = [[name, last, first] for name, first, last in changes]
+        return changes
+
+    @staticmethod
+    def labelled(changes):
+        """
+        Return `changes` with field verbose names and foreign keys replaced
+        by the related objects, one query per related model.
+        """
+        related = {}
+        for name, old_value, new_value in changes:
+            field = System._meta.get_field(name)
+            if field.is_relation:
+                related.setdefault(field.related_model, set()).update(
+                    value for value in (old_value, new_value)
+                    if value is not None
+                )
+        objects = dict(
+            (model, model.objects.in_bulk(list(pks)))
+            for model, pks in related.items()
+        )
+        labelled = []
+        for name, old_value, new_value in changes:
+            field = System._meta.get_field(name)
+            if field.is_relation:
+                found = objects[field.related_model]
+                old_value = found.get(old_value, old_value)
+                new_value = found.get(new_value, new_value)
+            labelled.append((field.verbose_name, old_value, new_value))
+        return labelled
+
+
 class UserProfile(models.Model):
     PAGER_CHOICES = (
         ('epager', 'epager'),
@@ -1285,10 +2195,121 @@ class UserProfile(models.Model):
 
 @receiver(post_revision_commit)
 def on_revision_commit(sender, **kwargs): # pylint: disable=unused-argument
-    revision = kwargs['revision']
+    """
+    Point System.current_revision at the newest version of every system in
+    the revision. This is a plain UPDATE, so it doesn't re-run full_clean or
+    create another revision. Also store what each of those versions changed
+    (SystemRevisionDiff).
+    """
+    versions = list(kwargs['versions'])
+    System.set_current_revisions(versions)
+    SystemRevisionDiff.record(versions)
+
+
+@receiver(post_save, sender=KeyValue)
+@receiver(post_delete, sender=KeyValue)
+def sync_system_nics(sender, instance, **kwargs): # pylint: disable=unused-argument
+    """ keep SystemNic in step with the nic.* keys of a system """
+    loaded_key = getattr(instance, '_loaded_key', None)
+    if instance.obj_id and instance.obj_id not in _systems_being_deleted():
+        # The old row of a renamed key and the row of its new name
+        rows = set()
+        for key in (loaded_key, instance.key):
+            parsed = SystemNic.parse_key(key)
+            if parsed:
+                rows.add((parsed[0], parsed[2]))
+        for nic_number, sub_index in sorted(rows):
+            SystemNic.rebuild_row(instance.obj_id, nic_number, sub_index)
+    instance._loaded_key = instance.key # pylint: disable=protected-access
+
+
+# pks of the systems this thread is deleting. Their KeyValues are deleted
+# with them and there's no point re-indexing the system for each of them.
+_deleting_systems = threading.local()
+
+
+def _systems_being_deleted():
+    if not hasattr(_deleting_systems, 'pks'):
+        _deleting_systems.pks = set()
+    return _deleting_systems.pks
+
+
+@contextlib.contextmanager
+def deleting_systems():
+    """
+    Scope of a System delete. The pks marked by `mark_system_deleted` are
+    forgotten when it exits, even if the delete failed.
+    """
+    # Not in post_delete: the KeyValues may be deleted after the systems
+    pks = _systems_being_deleted()
+    before = set(pks)
+    _deleting_systems.depth = getattr(_deleting_systems, 'depth', 0) + 1
     try:
-        system = System.objects.get(pk=kwargs['versions'][0].object.id)
-        system.current_revision = revision.version_set.all().last().id
-        system.save()
-    except: # pylint: disable=bare-except
+        yield
+    finally:
+        _deleting_systems.depth -= 1
+        pks.intersection_update(before)
+
+
+@receiver(pre_delete, sender=System)
+def mark_system_deleted(sender, instance, **kwargs): # pylint: disable=unused-argument
+    # Systems deleted outside a scope, by the cascade of a rack or status
+    # delete, would never be unmarked
+    if getattr(_deleting_systems, 'depth', 0):
+        _systems_being_deleted().add(instance.pk)
+
+
+@receiver(post_delete, sender=System)
+def unindex_system(sender, instance, **kwargs): # pylint: disable=unused-argument
+    hostname_index.remove(instance.pk)
+
+
+@receiver(pre_save, sender=System)
+def note_hostname_change(sender, instance, raw=False, **kwargs): # pylint: disable=unused-argument
+    """ remember whether the save changes the hostname, see index_system """
+    # The dirty field snapshot is reset by the time post_save receivers run
+    instance._hostname_changed = ( # pylint: disable=protected-access
+        instance._state.adding or # pylint: disable=protected-access
+        'hostname' in instance.get_dirty_fields()
+    )
+
+
+@receiver(post_save, sender=System)
+def index_system(sender, instance, raw=False, **kwargs): # pylint: disable=unused-argument
+    """ keep the search and hostname indexes in step with a saved system """
+    if not raw:
+        SystemSearchDocument.rebuild_for_system(instance.pk)
+        # Every hostname index update makes the other processes reload
+        if getattr(instance, '_hostname_changed', True):
+            hostname_index.update(instance.pk, instance.hostname)
+
+
+@receiver(post_save, sender=KeyValue)
+@receiver(post_delete, sender=KeyValue)
+def index_system_key_value(sender, instance, raw=False, **kwargs): # pylint: disable=unused-argument
+    """ keep the search index in step with the KeyValues of a system """
+    if raw or not instance.obj_id:
+        return
+    if instance.obj_id in _systems_being_deleted():
         return
+    SystemSearchDocument.rebuild_for_system(instance.obj_id)
+
+
+@receiver(post_save, sender=KeyValue)
+@receiver(post_delete, sender=KeyValue)
+def expire_system_fragments(sender, instance, raw=False, **kwargs): # pylint: disable=unused-argument
+    """ KeyValue edits don't create a System revision, expire by hand """
+    if not raw and instance.obj_id:
+        system_fragments.expire(instance.obj_id)
+
+
+def expire_all_system_fragments(sender, raw=False, **kwargs): # pylint: disable=unused-argument
+    """ a row shown on every system page changed """
+    if not raw:
+        system_fragments.expire_all()
+
+
+for _model in (Site, SystemRack, SystemStatus, ServerModel, SystemType,
+               OperatingSystem):
+    post_save.connect(expire_all_system_fragments, sender=_model)
+    post_delete.connect(expire_all_system_fragments, sender=_model)
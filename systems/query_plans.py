@@ -0,0 +1,63 @@
+""" helpers to check how the database executes a queryset """
+from django.db import connections
+
+
+def explain(queryset):
+    """
+    Run EXPLAIN for `queryset` and return the plan as a list of dicts keyed by
+    the column names the database uses. Only SQLite and MySQL are supported.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif connection.vendor == 'mysql':
+        prefix = 'EXPLAIN '
+    else:
+        raise NotImplementedError(
+            "No EXPLAIN support for {0}".format(connection.vendor)
+        )
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _sqlite_table(detail):
+    # "SEARCH TABLE key_value USING ..." on older SQLite and
+    # "SEARCH key_value USING ..." on 3.36+
+    words = detail.split()
+    if len(words) < 2:
+        return None
+    if words[1] == 'TABLE' and len(words) > 2:
+        return words[2]
+    return words[1]
+
+
+def index_lookups(queryset, table):
+    """
+    Return the names of the indexes used to read `table`, or None when the
+    database falls back to a full scan of it for any part of the query.
+    """
+    connection = connections[queryset.db]
+    indexes = []
+    for row in explain(queryset):
+        if connection.vendor == 'sqlite':
+            detail = row['detail']
+            if _sqlite_table(detail) != table:
+                continue
+            if not detail.startswith('SEARCH'):
+                return None
+            if ' INDEX ' in detail:
+                indexes.append(detail.split(' INDEX ')[1].split()[0])
+            elif 'PRIMARY KEY' in detail:
+                indexes.append('PRIMARY')
+            else:
+                return None
+        else:
+            if row['table'] != table:
+                continue
+            if row['type'] == 'ALL' or not row['key']:
+                return None
+            indexes.append(row['key'])
+    return indexes
@@ -0,0 +1,120 @@
+"""
+Cached, concurrent wrapper around ``socket.gethostbyaddr``.
+
+Hostname migration passes resolve the primary IP and a handful of candidate
+names for every system. Each lookup can block for the full resolver timeout,
+so lookups are cached (negative results included) and bulk lookups are spread
+over a bounded thread pool. The cache keeps the `max_size` most recently used
+names.
+
+The function doing the actual lookup is injectable, which lets tests run
+against a stub resolver:
+
+    >>> resolver = CachingResolver(resolve=lambda name: ('a.example.com', [], []))
+    >>> resolver.lookup('10.0.0.1')
+    'a.example.com'
+"""
+import collections
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# Errors that mean "this name doesn't resolve" rather than a bug.
+# socket.herror, socket.gaierror and socket.timeout are all OSErrors.
+RESOLVE_ERRORS = (OSError, UnicodeError, ValueError)
+
+
+class CachingResolver(object):
+    """
+    Resolve names or addresses to their canonical hostname.
+
+    :param resolve: callable returning a ``gethostbyaddr`` style tuple
+    :param ttl: seconds a successful lookup is cached
+    :param negative_ttl: seconds a failed lookup is cached
+    :param max_workers: upper bound on concurrent lookups in `lookup_many`
+    :param max_size: most names cached, the least recently used go first
+    """
+    def __init__(self, resolve=socket.gethostbyaddr, ttl=300, negative_ttl=60,
+                 max_workers=16, clock=time.time, max_size=10000):
+        self.resolve = resolve
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_workers = max_workers
+        self.clock = clock
+        self.max_size = max_size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, name):
+        with self._lock:
+            entry = self._cache.get(name)
+            if entry is None:
+                return False, None
+            if entry[1] < self.clock():
+                del self._cache[name]
+                return False, None
+            self._cache.move_to_end(name)
+        return True, entry[0]
+
+    def _store(self, name, result):
+        ttl = self.ttl if result is not None else self.negative_ttl
+        with self._lock:
+            self._cache[name] = (result, self.clock() + ttl)
+            self._cache.move_to_end(name)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def _resolve(self, name):
+        try:
+            return str(self.resolve(name)[0])
+        except RESOLVE_ERRORS:
+            return None
+
+    def lookup(self, name):
+        """ return the canonical hostname for `name` or None """
+        if not name:
+            return None
+        hit, result = self._cached(name)
+        if hit:
+            return result
+        result = self._resolve(name)
+        self._store(name, result)
+        return result
+
+    def lookup_many(self, names):
+        """
+        Resolve every name in `names` and return a dict of name -> hostname
+        (None for names that don't resolve). Cache misses are resolved
+        concurrently with at most `max_workers` lookups in flight.
+        """
+        results = {}
+        misses = []
+        for name in set(name for name in names if name):
+            hit, result = self._cached(name)
+            if hit:
+                results[name] = result
+            else:
+                misses.append(name)
+
+        if misses:
+            workers = min(self.max_workers, len(misses))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for name, result in zip(misses, pool.map(self._resolve, misses)):
+                    self._store(name, result)
+                    results[name] = result
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+resolver = CachingResolver( # pylint: disable=invalid-name
+    ttl=getattr(settings, 'RESOLVER_CACHE_TTL', 300),
+    negative_ttl=getattr(settings, 'RESOLVER_NEGATIVE_CACHE_TTL', 60),
+    max_workers=getattr(settings, 'RESOLVER_MAX_WORKERS', 16),
+    max_size=getattr(settings, 'RESOLVER_CACHE_SIZE', 10000),
+)
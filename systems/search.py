@@ -0,0 +1,82 @@
+"""
+Text helpers for the system search index (see `SystemSearchDocument`).
+
+Every system gets one lowercased document made of its searchable fields and
+KeyValue values, and the set of trigrams (three character substrings) in
+that document is stored in an indexed table. A substring search for a term
+of three or more characters only has to look at the systems that have the
+rarest trigrams of the term:
+
+    >>> sorted(trigrams('web1'))
+    ['eb1', 'web']
+
+Only printable ASCII trigrams are indexed. Case and accent insensitive
+database collations would otherwise treat different trigrams as equal.
+"""
+import re
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# System fields that go into the search document, KeyValue values are added
+# after them.
+SEARCH_FIELDS = ('hostname', 'serial', 'notes', 'asset_tag', 'oob_ip')
+
+INDEXABLE_RE = re.compile(r'[\x20-\x7e]{3}')
+
+
+def search_text(values):
+    """ the search document for an iterable of field and KeyValue values """
+    return '\n'.join(value.lower() for value in values if value)
+
+
+def trigrams(text):
+    """ the set of indexable trigrams in `text` """
+    return set(
+        text[i:i + 3] for i in range(len(text) - 2)
+        if INDEXABLE_RE.fullmatch(text[i:i + 3])
+    )
+
+
+def regex_literals(pattern):
+    """
+    Return lowercased strings that appear in anything `pattern` matches, so
+    they can be used to narrow down a regex search with the trigram index.
+    Only literal runs at the top level of the pattern are considered, and a
+    pattern Python can't parse gives no literals.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, RecursionError, OverflowError):
+        return []
+    literals, current = [], []
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(arg))
+            continue
+        if op is sre_parse.BRANCH:
+            return []
+        if current:
+            literals.append(''.join(current).lower())
+            current = []
+    if current:
+        literals.append(''.join(current).lower())
+    return literals
+
+
+def search_rank(term, hostname):
+    """
+    Rank a hit for `term` by how well it matches the hostname: exact
+    matches first, then prefix matches, then substring matches and finally
+    systems that only matched on another field.
+    """
+    term, hostname = term.lower(), hostname.lower()
+    if hostname == term:
+        return 0
+    if hostname.startswith(term):
+        return 1
+    if term in hostname:
+        return 2
+    return 3
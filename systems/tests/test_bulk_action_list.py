@@ -0,0 +1,39 @@
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from systems.models import KeyValue, System, SystemType
+
+
+class BulkActionListTests(TestCase):
+    def setUp(self):
+        system_type = SystemType.objects.create(type_name='Virtual Server')
+        self.hostnames = []
+        for i in range(20):
+            hostname = 'export{0}.foobar.mozilla.com'.format(i)
+            system = System.objects.create(
+                hostname=hostname, system_type=system_type
+            )
+            KeyValue.objects.create(obj=system, key='foo', value=str(i))
+            KeyValue.objects.create(obj=system, key='bar', value=str(i))
+            self.hostnames.append(hostname)
+
+    def export_query_count(self, hostnames):
+        with CaptureQueriesContext(connection) as ctx:
+            bundles = System.get_bulk_action_list(
+                Q(hostname__in=hostnames), show_related=False
+            )
+        return len(ctx.captured_queries), bundles
+
+    def test_export_query_count(self):
+        one_count, _ = self.export_query_count(self.hostnames[:1])
+        many_count, bundles = self.export_query_count(self.hostnames)
+
+        # Exporting more systems must not issue more queries
+        self.assertEqual(one_count, many_count)
+        self.assertEqual(20, len(bundles))
+        for i, hostname in enumerate(self.hostnames):
+            kv_set = bundles[hostname]['keyvalue_set']
+            self.assertEqual(set(['foo', 'bar']), set(kv_set.keys()))
+            self.assertEqual(str(i), kv_set['foo']['value'])
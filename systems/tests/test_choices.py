@@ -0,0 +1,56 @@
+import copy
+
+from django import forms
+from django.test import TestCase
+
+from systems.choices import (
+    CachedChoices, rack_choices, racks_for_site, site_choices, with_all
+)
+from systems.forms import RackFilterForm
+from systems.models import Site, SystemRack
+
+
+class ChoicesTests(TestCase):
+    def setUp(self):
+        self.site = Site(full_name='scl3')
+        self.site.save()
+        self.rack = SystemRack.objects.create(name='rack1', site=self.site)
+        self.loose_rack = SystemRack.objects.create(name='loose')
+
+    def test_cached_until_changed(self):
+        site_choices()
+        with self.assertNumQueries(0):
+            self.assertIn((self.site.pk, 'scl3'), site_choices())
+        other = Site(full_name='phx1')
+        other.save()
+        self.assertIn((other.pk, 'phx1'), site_choices())
+
+    def test_rack_labels(self):
+        self.assertIn((self.rack.pk, 'scl3 - rack1'), rack_choices())
+        self.assertIn((self.loose_rack.pk, ' loose'), rack_choices())
+        self.assertEqual(
+            [(self.rack.pk, 'scl3', 'rack1')], racks_for_site(self.site.pk)
+        )
+        self.assertEqual(2, len(racks_for_site()))
+
+    def test_ttl(self):
+        now = [0]
+        builds = []
+        choices = CachedChoices(
+            lambda: builds.append(1) or [], [], ttl=10, clock=lambda: now[0]
+        )
+        choices()
+        now[0] = 5
+        choices()
+        now[0] = 11
+        choices()
+        self.assertEqual(2, len(builds))
+
+    def test_form(self):
+        self.assertIs(site_choices, copy.deepcopy(site_choices))
+        field = forms.ChoiceField(choices=with_all(site_choices))
+        self.assertIn((self.site.pk, 'scl3'), list(copy.deepcopy(field).choices))
+        rack_choices()
+        with self.assertNumQueries(0):
+            form = RackFilterForm({'rack': str(self.rack.pk)})
+            self.assertTrue(form.is_valid())
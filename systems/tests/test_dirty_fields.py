@@ -0,0 +1,34 @@
+from django.test import TestCase
+
+from systems.models import System
+
+
+class DirtyFieldsTests(TestCase):
+    def setUp(self):
+        System.objects.create(hostname='dirty1.foobar.mozilla.com', serial='A')
+
+    def test_loaded_system(self):
+        system = System.objects.get(hostname='dirty1.foobar.mozilla.com')
+        self.assertEqual({}, system.get_dirty_fields())
+        system.serial = 'B'
+        self.assertEqual({'serial': 'A'}, system.get_dirty_fields())
+        system.save()
+        self.assertEqual({}, system.get_dirty_fields())
+
+    def test_deferred_fields_are_ignored(self):
+        system = System.objects.only('hostname').get(
+            hostname='dirty1.foobar.mozilla.com'
+        )
+        system.hostname = 'dirty2.foobar.mozilla.com'
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                {'hostname': 'dirty1.foobar.mozilla.com'},
+                system.get_dirty_fields()
+            )
+
+    def test_new_system(self):
+        system = System(hostname='dirty3.foobar.mozilla.com')
+        system.serial = 'C'
+        self.assertEqual({'serial': None}, system.get_dirty_fields())
+        system.save()
+        self.assertEqual({}, system.get_dirty_fields())
@@ -0,0 +1,91 @@
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from systems.hostname_index import HostnameIndex
+from systems.models import System
+
+
+class HostnameIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.systems = {
+            1: 'web1.scl3.mozilla.com', 2: 'web10.scl3.mozilla.com',
+            3: 'db1.scl3.mozilla.com', 4: 'Webapp1.phx1.mozilla.com',
+        }
+        self.loads = 0
+        self.index = self.make_index()
+
+    def make_index(self, limit=50):
+        return HostnameIndex(
+            load=self.load, limit=limit,
+            generation_key='test.hostname_index.{0}'.format(id(self))
+        )
+
+    def load(self):
+        self.loads += 1
+        return list(self.systems.items())
+
+    def test_lazy(self):
+        self.assertEqual(0, self.loads)
+        self.index.complete('web')
+        self.index.complete('db')
+        self.assertEqual(1, self.loads)
+
+    def test_prefix_before_infix(self):
+        self.assertEqual(
+            [('web1.scl3.mozilla.com', 1), ('web10.scl3.mozilla.com', 2),
+             ('Webapp1.phx1.mozilla.com', 4)],
+            self.index.complete('WEB')
+        )
+        self.assertEqual(
+            ['db1.scl3.mozilla.com', 'web1.scl3.mozilla.com'],
+            [hostname for hostname, _ in self.index.complete('1.scl3')]
+        )
+        self.assertEqual(2, len(self.index.complete('mozilla', limit=2)))
+        self.assertEqual([], self.index.complete('nope'))
+
+    def test_updates(self):
+        self.index.complete('web')
+        self.index.update(5, 'web2.scl3.mozilla.com')
+        self.index.update(1, 'db2.scl3.mozilla.com')
+        self.index.remove(2)
+        self.assertEqual(
+            ['web2.scl3.mozilla.com', 'Webapp1.phx1.mozilla.com'],
+            [hostname for hostname, _ in self.index.complete('web')]
+        )
+        self.assertEqual(1, self.loads)
+
+    def test_other_process_changes(self):
+        other = self.make_index()
+        self.index.complete('web')
+        other.complete('web')
+        self.systems[5] = 'web2.scl3.mozilla.com'
+        other.update(5, 'web2.scl3.mozilla.com')
+        self.assertIn(('web2.scl3.mozilla.com', 5), self.index.complete('web'))
+        self.assertEqual(3, self.loads)
+        # The process that made the change doesn't reload
+        other.complete('web')
+        self.assertEqual(3, self.loads)
+
+
+class HostnameIndexSignalTests(TestCase):
+    def setUp(self):
+        System.objects.create(hostname='signal1.scl3.mozilla.com')
+
+    def test_waits_for_commit(self):
+        index = HostnameIndex(
+            load=lambda: [], generation_key='test.hostname_index.signal'
+        )
+        index.complete('signal')
+        # TestCase never commits, so the update stays pending
+        index.update(1, 'signal1.scl3.mozilla.com')
+        self.assertEqual([], index.complete('signal'))
+
+    def test_publishes_hostname_changes_only(self):
+        system = System.objects.get(hostname='signal1.scl3.mozilla.com')
+        pending = len(connection.run_on_commit)
+        system.serial = 'SERIAL1'
+        system.save()
+        self.assertEqual(pending, len(connection.run_on_commit))
+        system.hostname = 'signal2.scl3.mozilla.com'
+        system.save()
+        self.assertEqual(pending + 1, len(connection.run_on_commit))
@@ -0,0 +1,109 @@
+from django.test import TestCase
+from reversion.models import Version
+
+from systems.importer import SystemImporter
+from systems.models import (
+    ServerModel, Site, System, SystemRack, SystemSearchDocument, SystemStatus
+)
+
+HEADER = ['hostname', 'serial', 'system_status', 'system_rack',
+          'rack_order', 'server_model', 'unknown']
+
+
+class SystemImporterTests(TestCase):
+    def setUp(self):
+        site = Site(full_name='scl3')
+        site.save()
+        self.rack = SystemRack.objects.create(name='rack1', site=site)
+        self.status = SystemStatus.objects.create(status='production')
+        self.server_model = ServerModel.objects.create(
+            vendor='HP', model='DL360'
+        )
+        System.objects.create(hostname='taken.foobar.mozilla.com')
+
+    def test_import(self):
+        rows = [HEADER] + [
+            ['web{0}.foobar.mozilla.com'.format(i), 's{0}'.format(i),
+             'production', 'rack1', str(i), str(self.server_model.pk), 'x']
+            for i in range(20)
+        ]
+        result = SystemImporter(chunk_size=8).run(rows)
+        self.assertEqual(20, result.created)
+        self.assertEqual([], result.errors)
+
+        system = System.objects.get(hostname='web3.foobar.mozilla.com')
+        self.assertEqual('S3', system.serial)
+        self.assertEqual(self.status, system.system_status)
+        self.assertEqual(self.rack, system.system_rack)
+        self.assertEqual(self.server_model, system.server_model)
+        self.assertEqual(3, system.rack_order)
+        self.assertEqual('web0000000003.foobar.mozilla.com',
+                         system.hostname_sort_key)
+        self.assertEqual(
+            [system.pk],
+            list(SystemSearchDocument.matching('web3.foo').values_list(
+                'system', flat=True))
+        )
+        versions = Version.objects.get_for_model(System)
+        self.assertEqual(
+            1, len(set(versions.filter(
+                object_id__in=[str(pk) for pk in System.objects.filter(
+                    hostname__startswith='web').values_list('pk', flat=True)]
+            ).values_list('revision', flat=True)))
+        )
+
+    def test_errors(self):
+        rows = [
+            HEADER,
+            ['ok.foobar.mozilla.com', '', '', '', '', '', ''],
+            ['taken.foobar.mozilla.com', '', '', '', '', '', ''],
+            ['ok.foobar.mozilla.com', '', '', '', '', '', ''],
+            ['bad_name!.foobar.mozilla.com', '', '', '', 'abc', '', ''],
+            ['', '', '', '', '', '', ''],
+            ['order.foobar.mozilla.com', '', '', '', 'abc', '', ''],
+        ]
+        result = SystemImporter().run(rows)
+        self.assertEqual(1, result.created)
+        self.assertEqual([3, 4, 5, 7],
+                         [error.line for error in result.errors])
+        self.assertIn('already exists', result.errors[0].messages[0])
+        self.assertIn('duplicate of line 2', result.errors[1].messages[0])
+        # validate_names() reports the hostname once, the other fields are
+        # still checked
+        messages = result.errors[2].messages
+        self.assertEqual(2, len(messages))
+        self.assertTrue(messages[0].startswith('hostname'))
+        self.assertTrue(messages[1].startswith('rack_order'))
+        self.assertTrue(result.errors[3].messages[0].startswith('rack_order'))
+        system = System.objects.get(hostname='ok.foobar.mozilla.com')
+        self.assertEqual('building', system.system_status.status)
+
+    def test_case_insensitive(self):
+        rows = [
+            HEADER,
+            ['Web1.foobar.mozilla.com', '', ' Production', 'RACK1', '', '',
+             ''],
+            ['web1.FOOBAR.mozilla.com', '', '', '', '', '', ''],
+        ]
+        result = SystemImporter().run(rows)
+        self.assertEqual(1, result.created)
+        self.assertEqual([3], [error.line for error in result.errors])
+        self.assertIn('duplicate of line 2', result.errors[0].messages[0])
+        system = System.objects.get(hostname='Web1.foobar.mozilla.com')
+        self.assertEqual(self.status, system.system_status)
+        self.assertEqual(self.rack, system.system_rack)
+
+    def test_query_count(self):
+        def rows(count, prefix):
+            return [HEADER] + [
+                ['{0}{1}.foobar.mozilla.com'.format(prefix, i), '',
+                 'production', 'rack1', '', '', '']
+                for i in range(count)
+            ]
+
+        importer = SystemImporter(chunk_size=1000)
+        importer.load_references()
+        with self.assertNumQueries(1):
+            importer.validate(rows(50, 'a'))
+        with self.assertNumQueries(1):
+            importer.validate(rows(500, 'b'))
@@ -0,0 +1,54 @@
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from systems.models import KeyValue, System
+
+
+class ValidatedKeyValue(KeyValue):
+    class Meta:
+        proxy = True
+
+    def foo_bar(self):
+        if self.value != 'ok':
+            raise ValidationError("foo-bar must be ok")
+
+
+class KeyValueCleanTests(TestCase):
+    def setUp(self):
+        self.system = System.objects.create(
+            hostname='kvclean1.foobar.mozilla.com'
+        )
+        KeyValue.objects.create(obj=self.system, key='taken', value='1')
+
+    def test_validator_table(self):
+        self.assertEqual('foo_bar',
+                         ValidatedKeyValue.get_validator_name('foo-bar'))
+        self.assertEqual(None, ValidatedKeyValue.get_validator_name('baz'))
+        self.assertEqual(None, KeyValue.get_validator_name('foo-bar'))
+        self.assertIn('baz', ValidatedKeyValue.__dict__['_validators'])
+
+        kv = ValidatedKeyValue(obj=self.system, key='foo-bar', value='no')
+        self.assertRaises(ValidationError, kv.clean)
+        kv.value = 'ok'
+        kv.clean()
+
+    def test_clean_many(self):
+        kvs = [
+            KeyValue(obj=self.system, key='new', value=str(i))
+            for i in range(50)
+        ]
+        with self.assertNumQueries(1):
+            KeyValue.clean_many(kvs)
+
+    def test_clean_many_duplicates(self):
+        existing = KeyValue.objects.get(key='taken')
+        existing.clean()
+        kvs = [
+            existing,
+            KeyValue(obj=self.system, key='taken', value='1'),
+            KeyValue(obj=self.system, key='twice', value='2'),
+            KeyValue(obj=self.system, key='twice', value='2'),
+        ]
+        with self.assertRaises(ValidationError) as context:
+            KeyValue.clean_many(kvs)
+        self.assertEqual(2, len(context.exception.messages))
@@ -0,0 +1,46 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from systems.models import KeyValue, System
+from systems.query_plans import index_lookups
+
+
+@skipUnless(connection.vendor in ('sqlite', 'mysql'), "needs EXPLAIN support")
+class KeyValueIndexTests(TestCase):
+    def setUp(self):
+        self.system = System.objects.create(hostname='kv1.foobar.mozilla.com')
+
+    def assertIndexed(self, queryset, index=None):
+        indexes = index_lookups(queryset, 'key_value')
+        self.assertTrue(indexes, "full scan of key_value")
+        if index:
+            self.assertIn(index, indexes)
+
+    def test_obj_key(self):
+        self.assertIndexed(
+            KeyValue.objects.filter(obj=self.system, key='nic.0.name.0'),
+            'key_value_obj_key_idx'
+        )
+        # The planner may prefer the obj_id foreign key index for the
+        # prefix match, any index leading with obj_id will do.
+        indexes = index_lookups(
+            self.system.keyvalue_set.filter(key__startswith='nic.'),
+            'key_value'
+        )
+        self.assertTrue(
+            any(index.startswith('key_value_obj_') for index in indexes),
+            indexes
+        )
+
+    def test_key_value(self):
+        self.assertIndexed(
+            KeyValue.objects.filter(key='system.hostname.alias.0', value='x')
+        )
+
+    def test_value(self):
+        self.assertIndexed(
+            KeyValue.objects.filter(value='10.0.0.1').exclude(obj=self.system),
+            'key_value_value_idx'
+        )
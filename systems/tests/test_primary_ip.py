@@ -0,0 +1,31 @@
+from django.test import TestCase
+
+from systems.models import KeyValue, System
+
+
+class PrimaryIpTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            system = System.objects.create(
+                hostname='ip{0}.foobar.mozilla.com'.format(i)
+            )
+            KeyValue.objects.create(
+                obj=system, key='nic.1.ipv4_address.0', value='10.0.1.%s' % i
+            )
+            KeyValue.objects.create(
+                obj=system, key='nic.0.ipv4_address.0', value='10.0.0.%s' % i
+            )
+        System.objects.create(hostname='noip.foobar.mozilla.com')
+
+    def test_with_primary_ip(self):
+        with self.assertNumQueries(1):
+            ips = dict(
+                (system.hostname, system.primary_ip)
+                for system in System.objects.with_primary_ip()
+            )
+        self.assertEqual('10.0.0.2', ips['ip2.foobar.mozilla.com'])
+        self.assertEqual(None, ips['noip.foobar.mozilla.com'])
+
+    def test_without_annotation(self):
+        system = System.objects.get(hostname='ip1.foobar.mozilla.com')
+        self.assertEqual('10.0.0.1', system.primary_ip)
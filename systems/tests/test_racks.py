@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+from django.db.models import Q
+from django.test import TestCase
+
+from systems.models import Site, System, SystemRack, SystemStatus
+
+
+class RackLoaderTests(TestCase):
+    def setUp(self):
+        site = Site(full_name='scl3')
+        site.save()
+        self.decommissioned = SystemStatus.objects.create(
+            status='decommissioned'
+        )
+        self.racks = [
+            SystemRack.objects.create(name='rack{0}'.format(i), site=site)
+            for i in range(3)
+        ]
+        for i, order in enumerate(('2.00', '1.00', '2.01', None)):
+            System.objects.create(
+                hostname='rack0-{0}.foobar.mozilla.com'.format(i),
+                system_rack=self.racks[0],
+                rack_order=Decimal(order) if order else None
+            )
+        self.gone = System.objects.create(
+            hostname='rack1-0.foobar.mozilla.com', system_rack=self.racks[1],
+            system_status=self.decommissioned
+        )
+
+    def test_with_systems(self):
+        racks = SystemRack.objects.filter(site__full_name='scl3')
+        with self.assertNumQueries(2):
+            loaded = SystemRack.with_systems(racks.order_by('name'))
+            self.assertEqual(self.racks, [rack for rack, _ in loaded])
+            self.assertEqual(
+                [Decimal('2.00'), Decimal('2.01'), Decimal('1.00'), None],
+                [system.rack_order for system in loaded[0][1]]
+            )
+            for system in loaded[0][1]:
+                self.assertEqual(self.racks[0], system.system_rack)
+                str(system.system_status)
+        self.assertEqual([self.gone], loaded[1][1])
+        self.assertEqual([], loaded[2][1])
+
+    def test_filter_and_rack_list(self):
+        loaded = SystemRack.with_systems(
+            self.racks[1:],
+            ~Q(system_status=SystemStatus.get_id('decommissioned'))
+        )
+        self.assertEqual([(self.racks[1], []), (self.racks[2], [])], loaded)
+
+    def test_status_ids(self):
+        SystemStatus.get_id('decommissioned')
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.decommissioned.pk, SystemStatus.get_id('decommissioned')
+            )
+            self.assertEqual(None, SystemStatus.get_id('nope'))
+        spare = SystemStatus.objects.create(status='spare')
+        self.assertEqual(spare.pk, SystemStatus.get_id('spare'))
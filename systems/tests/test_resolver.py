@@ -0,0 +1,98 @@
+import socket
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from systems.resolver import CachingResolver
+
+
+class StubResolver(object):
+    """ stands in for socket.gethostbyaddr """
+    def __init__(self, records, delay=0):
+        self.records = records
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, name):
+        with self.lock:
+            self.calls.append(name)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if name not in self.records:
+                raise socket.herror(1, 'Unknown host')
+            return (self.records[name], [], [name])
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class CachingResolverTests(SimpleTestCase):
+    def setUp(self):
+        self.stub = StubResolver({'10.0.0.1': 'host1.mozilla.com'})
+        self.clock = FakeClock()
+        self.resolver = CachingResolver(
+            resolve=self.stub, ttl=300, negative_ttl=60, clock=self.clock
+        )
+
+    def test_positive_cache(self):
+        self.assertEqual('host1.mozilla.com', self.resolver.lookup('10.0.0.1'))
+        self.assertEqual('host1.mozilla.com', self.resolver.lookup('10.0.0.1'))
+        self.assertEqual(['10.0.0.1'], self.stub.calls)
+        self.clock.now = 301
+        self.resolver.lookup('10.0.0.1')
+        self.assertEqual(2, len(self.stub.calls))
+
+    def test_negative_cache(self):
+        self.assertEqual(None, self.resolver.lookup('10.0.0.2'))
+        self.assertEqual(None, self.resolver.lookup('10.0.0.2'))
+        self.assertEqual(1, len(self.stub.calls))
+        self.clock.now = 61
+        self.resolver.lookup('10.0.0.2')
+        self.assertEqual(2, len(self.stub.calls))
+
+    def test_size_limit(self):
+        resolver = CachingResolver(
+            resolve=self.stub, clock=self.clock, max_size=2
+        )
+        resolver.lookup('10.0.0.1')
+        resolver.lookup('10.0.0.2')
+        resolver.lookup('10.0.0.1')
+        resolver.lookup('10.0.0.3')  # evicts 10.0.0.2, used least recently
+        self.assertEqual(2, len(resolver._cache))
+        resolver.lookup('10.0.0.1')
+        self.assertEqual(3, len(self.stub.calls))
+        resolver.lookup('10.0.0.2')
+        self.assertEqual(4, len(self.stub.calls))
+
+    def test_empty_name(self):
+        self.assertEqual(None, self.resolver.lookup(None))
+        self.assertEqual([], self.stub.calls)
+
+    def test_lookup_many_is_bounded(self):
+        records = dict(
+            ('10.0.1.{0}'.format(i), 'h{0}.mozilla.com'.format(i))
+            for i in range(20)
+        )
+        stub = StubResolver(records, delay=0.01)
+        resolver = CachingResolver(resolve=stub, max_workers=4)
+        results = resolver.lookup_many(list(records) + ['10.0.2.1'])
+        self.assertEqual(records['10.0.1.7'], results['10.0.1.7'])
+        self.assertEqual(None, results['10.0.2.1'])
+        self.assertTrue(1 < stub.max_in_flight <= 4)
+
+        resolver.lookup_many(list(records))
+        self.assertEqual(21, len(stub.calls))
@@ -0,0 +1,106 @@
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from reversion.models import Version
+
+from systems.models import System, SystemRevisionDiff, SystemStatus
+
+
+class CurrentRevisionTests(TestCase):
+    def test_save_creates_one_revision(self):
+        system = System.objects.create(hostname='rev1.foobar.mozilla.com')
+        versions = Version.objects.get_for_object(system)
+        self.assertEqual(1, versions.count())
+        self.assertEqual(
+            versions[0].pk, System.objects.get(pk=system.pk).current_revision
+        )
+
+        system.serial = 'ABC'
+        system.save()
+        versions = Version.objects.get_for_object(system)
+        self.assertEqual(2, versions.count())
+        self.assertEqual(
+            versions[0].pk, System.objects.get(pk=system.pk).current_revision
+        )
+
+    def test_set_current_revisions_batch(self):
+        systems = [
+            System.objects.create(hostname='rev{0}.foobar.mozilla.com'.format(i))
+            for i in range(2, 5)
+        ]
+        System.objects.update(current_revision=0)
+        versions = list(Version.objects.get_for_model(System))
+        ContentType.objects.get_for_model(System)  # warm the cache
+        with self.assertNumQueries(1):
+            System.set_current_revisions(versions)
+        for system in systems:
+            self.assertEqual(
+                Version.objects.get_for_object(system)[0].pk,
+                System.objects.get(pk=system.pk).current_revision
+            )
+
+
+class RevisionDiffTests(TestCase):
+    def setUp(self):
+        self.system = System.objects.create(
+            hostname='diff1.foobar.mozilla.com'
+        )
+        self.system.serial = 'ABC'
+        self.system.save()
+        self.system.serial = 'DEF'
+        self.system.system_status = SystemStatus.objects.create(
+            status='production'
+        )
+        self.system.save()
+        self.versions = list(
+            Version.objects.get_for_object(self.system).order_by('pk')
+        )
+
+    def test_recorded_on_commit(self):
+        diff = SystemRevisionDiff.objects.get(version=self.versions[1])
+        self.assertEqual([['serial', None, 'ABC']], diff.get_changes())
+        first = SystemRevisionDiff.objects.get(version=self.versions[0])
+        self.assertIn(
+            ['hostname', None, 'diff1.foobar.mozilla.com'], first.get_changes()
+        )
+
+    def test_changes_between(self):
+        status = self.system.system_status
+        current, oldest = self.versions[-1].pk, self.versions[0].pk
+        with self.assertNumQueries(2):
+            changes = SystemRevisionDiff.changes_between(
+                self.system.pk, current, oldest
+            )
+        building = SystemStatus.objects.get(status='building')
+        self.assertEqual(
+            [['serial', 'DEF', None],
+             ['system_status_id', status.pk, building.pk]],
+            changes
+        )
+        self.assertEqual(
+            [('serial', 'DEF', None), ('system status', status, building)],
+            SystemRevisionDiff.labelled(changes)
+        )
+
+    def test_missing_diffs_are_built(self):
+        SystemRevisionDiff.objects.all().delete()
+        self.assertEqual(
+            [['serial', 'ABC', 'DEF']],
+            [change for change in SystemRevisionDiff.changes_between(
+                self.system.pk, self.versions[1].pk, self.versions[2].pk
+            ) if change[0] == 'serial']
+        )
+        self.assertEqual(1, SystemRevisionDiff.objects.count())
+
+    def test_concurrently_built_diffs(self):
+        SystemRevisionDiff.objects.all().delete()
+        # Stored after between() read the diffs: the system_id hides it
+        SystemRevisionDiff.objects.create(
+            version=self.versions[2], system_id=0, changes='[]'
+        )
+        diffs = SystemRevisionDiff.between(
+            self.system.pk, self.versions[0].pk, self.versions[2].pk
+        )
+        self.assertEqual(
+            [self.versions[1].pk, self.versions[2].pk],
+            [diff.version_id for diff in diffs]
+        )
@@ -0,0 +1,122 @@
+from django.db import connection
+from django.db.models.signals import post_delete
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from systems.models import (
+    KeyValue, ServerModel, System, SystemSearchDocument, SystemSearchTrigram,
+    _systems_being_deleted
+)
+from systems.search import regex_literals, search_rank, trigrams
+
+
+class SearchHelperTests(SimpleTestCase):
+    def test_regex_literals(self):
+        self.assertEqual(['web1', '.scl3'], regex_literals(r'^web1\d+\.scl3'))
+        self.assertEqual(['ba', 'x'], regex_literals('(foo)bar?x'))
+        self.assertEqual([], regex_literals('web|db'))
+        self.assertEqual([], regex_literals('[bad'))
+
+    def test_search_rank(self):
+        self.assertEqual(0, search_rank('Web1', 'web1'))
+        self.assertEqual(1, search_rank('web1', 'web1.mozilla.com'))
+        self.assertEqual(2, search_rank('mozilla', 'web1.mozilla.com'))
+        self.assertEqual(3, search_rank('serial', 'web1.mozilla.com'))
+
+
+class SystemSearchTests(TestCase):
+    def setUp(self):
+        self.web = System.objects.create(
+            hostname='web1.search.mozilla.com', serial='ABC123',
+            notes='Replaced disk'
+        )
+        self.db = System.objects.create(hostname='db1.search.mozilla.com')
+        KeyValue.objects.create(
+            obj=self.db, key='nic.0.ipv4_address.0', value='10.8.75.12'
+        )
+
+    def search(self, term):
+        return set(SystemSearchDocument.matching(term))
+
+    def test_substring(self):
+        self.assertEqual(set([self.web.pk]), self.search('WEB1.search'))
+        self.assertEqual(set([self.web.pk]), self.search('abc1'))
+        self.assertEqual(set([self.web.pk]), self.search('disk'))
+        self.assertEqual(set([self.db.pk]), self.search('8.75.1'))
+        self.assertEqual(set([self.web.pk, self.db.pk]), self.search('1.'))
+        self.assertEqual(set(), self.search('nothing'))
+
+    def test_regex(self):
+        self.assertEqual(set([self.db.pk]), self.search(r'/^db\d\.search'))
+        self.assertEqual(set([self.web.pk, self.db.pk]),
+                         self.search('/^(web|db)1'))
+
+    def test_kept_current(self):
+        kv = KeyValue.objects.get(obj=self.db)
+        kv.value = '10.8.99.12'
+        kv.save()
+        self.assertEqual(set(), self.search('8.75.1'))
+        self.assertEqual(set([self.db.pk]), self.search('8.99.1'))
+        kv.delete()
+        self.assertEqual(set(), self.search('8.99.1'))
+
+        self.web.hostname = 'www1.search.mozilla.com'
+        self.web.save()
+        self.assertEqual(set(), self.search('web1'))
+        self.assertEqual(set([self.web.pk]), self.search('www1'))
+
+    def test_delete(self):
+        pk = self.db.pk
+        with CaptureQueriesContext(connection) as queries:
+            self.db.delete()
+        self.assertFalse(
+            SystemSearchDocument.objects.filter(system=pk).exists()
+        )
+        self.assertFalse(SystemSearchTrigram.objects.filter(system=pk).exists())
+        # The deleted KeyValue didn't re-index the system
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT')
+        ])
+        self.assertEqual(set(), _systems_being_deleted())
+
+    def test_cascade_delete(self):
+        self.db.server_model = ServerModel.objects.create(
+            vendor='HP', model='DL360'
+        )
+        self.db.save()
+        self.db.server_model.delete()
+        self.assertFalse(System.objects.filter(pk=self.db.pk).exists())
+        self.assertEqual(set(), _systems_being_deleted())
+
+    def test_failed_delete(self):
+        def fail(**kwargs):
+            raise RuntimeError()
+        post_delete.connect(fail, sender=KeyValue)
+        try:
+            with self.assertRaises(RuntimeError):
+                System.objects.filter(pk=self.db.pk).delete()
+        finally:
+            post_delete.disconnect(fail, sender=KeyValue)
+        self.assertEqual(set(), _systems_being_deleted())
+
+    def test_candidates_use_rare_trigrams(self):
+        required = trigrams('web1.search.mozilla.com')
+        self.assertEqual(2, SystemSearchTrigram.counts(required)['moz'])
+        self.assertNotIn('db1', SystemSearchTrigram.counts(required))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                [self.web.pk],
+                [row['system'] for row in
+                 SystemSearchTrigram.candidates(required)]
+            )
+        # the counts of the term's trigrams, then the candidates: 'web' and
+        # 'eb1' are the rarest, 'moz' isn't looked at
+        self.assertEqual(2, len(queries.captured_queries))
+        self.assertIn("'web'", queries.captured_queries[1]['sql'])
+        self.assertNotIn("'moz'", queries.captured_queries[1]['sql'])
+
+    def test_rebuild_all(self):
+        SystemSearchDocument.rebuild_all()
+        self.assertEqual(set([self.db.pk]), self.search('8.75.1'))
+        self.assertEqual(2, SystemSearchDocument.objects.count())
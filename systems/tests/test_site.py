@@ -0,0 +1,55 @@
+from django.test import TestCase
+
+from systems.models import Site, System, SystemRack
+
+
+class SitePathTests(TestCase):
+    def setUp(self):
+        self.rack_site = Site(full_name='room1.scl3.us')
+        self.rack_site.save()
+        self.scl3 = Site.objects.get(full_name='scl3.us')
+        self.us = Site.objects.get(full_name='us')
+        Site(full_name='usa').save()
+
+    def test_path(self):
+        self.assertEqual('us.scl3.room1.', self.rack_site.path)
+        with self.assertNumQueries(0):
+            self.assertEqual('room1.scl3.us', self.rack_site.get_site_path())
+
+    def test_descendants(self):
+        self.assertEqual(
+            set(['us', 'scl3.us', 'room1.scl3.us']),
+            set(self.us.get_descendant_sites().values_list(
+                'full_name', flat=True
+            ))
+        )
+        rack = SystemRack.objects.create(name='r1', site=self.rack_site)
+        System.objects.create(
+            hostname='site1.foobar.mozilla.com', system_rack=rack
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(1, len(self.us.get_descendant_systems()))
+        self.assertEqual([rack], list(self.scl3.get_descendant_racks()))
+        self.assertEqual(0, self.scl3.get_systems().count())
+        self.assertEqual(1, self.rack_site.get_systems().count())
+
+    def test_no_path(self):
+        site = Site(full_name='room3.scl3.us')
+        with self.assertNumQueries(0):
+            self.assertEqual([], list(site.get_descendant_sites()))
+            self.assertEqual([], list(site.get_descendant_racks()))
+            self.assertEqual([], list(site.get_descendant_systems()))
+
+    def test_move(self):
+        Site(full_name='room2.scl3.us').save()
+        self.scl3.full_name = 'scl3.eu'
+        self.scl3.save()
+        self.assertEqual('eu.scl3.', self.scl3.path)
+        self.assertEqual(
+            [('room1.scl3.eu', 'eu.scl3.room1.'),
+             ('room2.scl3.eu', 'eu.scl3.room2.')],
+            list(Site.objects.filter(name__startswith='room').order_by(
+                'name'
+            ).values_list('full_name', 'path'))
+        )
+        self.assertEqual('usa.', Site.objects.get(full_name='usa').path)
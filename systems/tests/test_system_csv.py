@@ -0,0 +1,35 @@
+import csv
+import io
+
+from django.test import RequestFactory, TestCase
+
+from systems.models import ServerModel, Site, System, SystemRack
+from systems.views import SYSTEM_CSV_HEADER, system_csv
+
+
+class SystemCsvTests(TestCase):
+    def setUp(self):
+        site = Site(full_name='scl3')
+        site.save()
+        rack = SystemRack.objects.create(name='rack1', site=site)
+        server_model = ServerModel.objects.create(vendor='HP', model='DL360')
+        for i in range(3):
+            System.objects.create(
+                hostname='csv{0}.foobar.mozilla.com'.format(i),
+                serial='S{0}'.format(i), server_model=server_model,
+                system_rack=rack if i else None
+            )
+
+    def test_export(self):
+        response = system_csv(RequestFactory().get('/'))
+        with self.assertNumQueries(1):
+            content = b''.join(response.streaming_content).decode('utf-8')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(SYSTEM_CSV_HEADER, rows[0])
+        self.assertEqual(
+            ['csv0.foobar.mozilla.com', 'S0', '', 'HP - DL360', '', '', '',
+             ''],
+            rows[1]
+        )
+        self.assertEqual('scl3 - rack1', rows[2][5])
+        self.assertEqual(4, len(rows))
@@ -0,0 +1,96 @@
+import json
+
+from django.test import RequestFactory, TestCase
+
+from systems.models import System, SystemStatus, natural_sort_key
+from systems.views import (
+    decode_cursor, encode_cursor, page_systems, stream_systems_json
+)
+
+
+class SystemListTests(TestCase):
+    def setUp(self):
+        for i in (10, 2, 1, 33, 3):
+            System.objects.create(
+                hostname='web{0}.list.mozilla.com'.format(i)
+            )
+        self.request = RequestFactory().get('/')
+
+    def hostnames(self, systems):
+        return [system.hostname.split('.')[0] for system in systems]
+
+    def test_natural_sort_key(self):
+        self.assertTrue(natural_sort_key('web2') < natural_sort_key('web10'))
+        self.assertEqual(natural_sort_key('web02'), natural_sort_key('web2'))
+        self.assertEqual(
+            'web0000000002.list.mozilla.com',
+            System.objects.get(hostname='web2.list.mozilla.com')
+            .hostname_sort_key
+        )
+
+    def test_sorted_across_pages(self):
+        systems = System.objects.all()
+        first = page_systems(systems, 'hostname', 'asc', 0, 3)
+        second = page_systems(systems, 'hostname', 'asc', 3, 3)
+        self.assertEqual(['web1', 'web2', 'web3', 'web10', 'web33'],
+                         self.hostnames(list(first) + list(second)))
+        desc = page_systems(systems, 'hostname', 'desc', 0, -1)
+        self.assertEqual(['web33', 'web10', 'web3', 'web2', 'web1'],
+                         self.hostnames(desc))
+
+    def test_keyset_pages(self):
+        systems = System.objects.all()
+        for sort_dir, expected in (
+                ('asc', ['web1', 'web2', 'web3', 'web10', 'web33']),
+                ('desc', ['web33', 'web10', 'web3', 'web2', 'web1'])):
+            seen, cursor = [], None
+            for _ in range(3):
+                # The start is ignored when there is a cursor
+                page = list(page_systems(
+                    systems, 'hostname', sort_dir, 0, 2, cursor
+                ))
+                seen += self.hostnames(page)
+                cursor = encode_cursor(page[-1].hostname_sort_key,
+                                       page[-1].pk)
+            self.assertEqual(expected, seen)
+
+    def test_bad_cursor(self):
+        self.assertEqual(None, decode_cursor('garbage!'))
+        page = page_systems(
+            System.objects.all(), 'hostname', 'asc', 0, 2, 'garbage!'
+        )
+        self.assertEqual(['web1', 'web2'], self.hostnames(page))
+
+    def stream(self, length):
+        systems = page_systems(
+            System.objects.all(), 'hostname', 'asc', 0, length
+        )
+        return json.loads(''.join(stream_systems_json(
+            self.request, systems, 3, 5, 'hostname', length
+        )))
+
+    def test_stream(self):
+        system = System.objects.get(hostname='web1.list.mozilla.com')
+        system.serial = ' "quoted" '
+        system.save()
+        status = SystemStatus.objects.get(status='building')
+        with self.assertNumQueries(1):
+            data = self.stream(2)
+        self.assertEqual(3, data['sEcho'])
+        self.assertEqual(5, data['iTotalRecords'])
+        self.assertEqual(
+            ["%i,web1.list.mozilla.com" % system.pk, '"quoted"', '', '', ',',
+             '', status.status, "%i" % system.pk],
+            data['aaData'][0]
+        )
+        self.assertEqual(2, len(data['aaData']))
+        self.assertEqual(
+            ('web0000000002.list.mozilla.com',
+             System.objects.get(hostname='web2.list.mozilla.com').pk),
+            decode_cursor(data['sNextCursor'])
+        )
+
+    def test_stream_all(self):
+        data = self.stream(-1)
+        self.assertEqual(5, len(data['aaData']))
+        self.assertNotIn('sNextCursor', data)
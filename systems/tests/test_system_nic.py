@@ -0,0 +1,82 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from systems.models import KeyValue, System, SystemNic
+
+
+class SystemNicTests(TestCase):
+    def setUp(self):
+        self.system = System.objects.create(
+            hostname='nic1.foobar.mozilla.com'
+        )
+
+    def add_kv(self, key, value):
+        return KeyValue.objects.create(obj=self.system, key=key, value=value)
+
+    def test_rows_follow_key_values(self):
+        self.add_kv('nic.0.mac_address.0', '00-16-cb-a7-36-4a')
+        self.add_kv('nic.0.ipv4_address.0', '10.2.90.239')
+        self.add_kv('nic.0.dhcp_scope.0', 'phx-vlan73')
+        self.add_kv('nic.1.adapter_name.0', 'eth1')
+        self.add_kv('system.hostname.alias.0', 'nic1')
+
+        nics = list(self.system.systemnic_set.all())
+        self.assertEqual(2, len(nics))
+        self.assertEqual('00:16:cb:a7:36:4a', nics[0].mac_address)
+        self.assertEqual('10.2.90.239', nics[0].ipv4_address)
+        self.assertEqual('phx-vlan73', nics[0].dhcp_scope)
+        self.assertEqual(None, nics[1].mac_address)
+        self.assertEqual([0, 1], self.system.get_adapter_numbers())
+        self.assertEqual(['eth1'], self.system.get_nic_names())
+
+    def test_rename_and_delete(self):
+        kv = self.add_kv('nic.0.ipv4_address.0', '10.0.0.1')
+        kv = KeyValue.objects.get(pk=kv.pk)
+        kv.key = 'nic.3.ipv4_address.0'
+        kv.save()
+        self.assertEqual([3], self.system.get_adapter_numbers())
+
+        kv.delete()
+        self.assertFalse(SystemNic.objects.filter(system=self.system).exists())
+
+    def test_save_touches_one_row(self):
+        for i in range(10):
+            self.add_kv('nic.{0}.name.0'.format(i), 'eth{0}'.format(i))
+        with CaptureQueriesContext(connection) as queries:
+            self.add_kv('nic.4.mac_address.0', '00:00:00:00:00:04')
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'system_nics' in query['sql'] and
+            ('DELETE' in query['sql'] or 'INSERT' in query['sql'])
+        ])
+        nic = SystemNic.objects.get(system=self.system, nic_number=4)
+        self.assertEqual('eth4', nic.name)
+        self.assertEqual('00:00:00:00:00:04', nic.mac_address)
+        self.assertEqual(10, self.system.systemnic_set.count())
+
+    def test_system_delete(self):
+        for i in range(10):
+            self.add_kv('nic.{0}.name.0'.format(i), 'eth{0}'.format(i))
+        with CaptureQueriesContext(connection) as queries:
+            self.system.delete()
+        # The cascade deletes the rows, the nic keys don't rebuild them
+        self.assertEqual(1, len([
+            query for query in queries.captured_queries
+            if 'system_nics' in query['sql']
+        ]))
+        self.assertFalse(SystemNic.objects.exists())
+
+    def test_next_key_value_adapter(self):
+        self.assertFalse(self.system.get_next_key_value_adapter())
+        # only a mac address of sub index 0 makes an adapter
+        self.add_kv('nic.1.mac_address.1', '00:00:00:00:01:01')
+        self.assertFalse(self.system.get_next_key_value_adapter())
+        self.add_kv('nic.2.mac_address.0', '00:00:00:00:00:02')
+        self.add_kv('nic.2.name.0', 'mgmt0')
+        adapter = self.system.get_next_key_value_adapter()
+        self.assertEqual(2, adapter['num'])
+        self.assertEqual('mgmt0', adapter['name'])
+        self.assertEqual('00:00:00:00:00:02', adapter['mac_address'])
+        self.add_kv('nic.0.mac_address.0', '00:00:00:00:00:00')
+        self.assertEqual(0, self.system.get_next_key_value_adapter()['num'])
@@ -0,0 +1,50 @@
+from django.core.cache import caches
+from django.test import RequestFactory, TestCase
+
+from systems.models import KeyValue, Site, System, SystemRack
+from systems.views import system_show
+
+
+class SystemShowCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        site = Site(full_name='scl3')
+        site.save()
+        self.rack = SystemRack.objects.create(name='rack1', site=site)
+        self.system = System.objects.create(
+            hostname='show.foobar.mozilla.com', system_rack=self.rack
+        )
+        self.kv = KeyValue.objects.create(
+            obj=self.system, key='location', value='cage 1'
+        )
+
+    def show(self):
+        request = RequestFactory().get('/')
+        request.read_only = True
+        return system_show(request, str(self.system.pk)).content.decode('utf-8')
+
+    def test_cached(self):
+        content = self.show()
+        self.assertIn('cage 1', content)
+        with self.assertNumQueries(1):
+            self.assertEqual(content, self.show())
+
+    def test_system_save(self):
+        self.show()
+        self.system.serial = 'SERIAL123'
+        self.system.save()
+        self.assertIn('SERIAL123', self.show())
+
+    def test_key_value_save(self):
+        self.show()
+        self.kv.value = 'cage 2'
+        self.kv.save()
+        self.assertIn('cage 2', self.show())
+        self.kv.delete()
+        self.assertNotIn('cage 2', self.show())
+
+    def test_rack_save(self):
+        self.show()
+        self.rack.name = 'rack2'
+        self.rack.save()
+        self.assertIn('rack2', self.show())
@@ -0,0 +1,48 @@
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+
+from systems.models import validate_label, validate_name, validate_names
+
+
+class ValidateNameTests(SimpleTestCase):
+    def assertMessage(self, message, name):
+        with self.assertRaises(ValidationError) as context:
+            validate_name(name)
+        self.assertEqual([message], context.exception.messages)
+
+    def test_valid(self):
+        for name in ('a', 'web1.scl3.mozilla.com', '_srv._tcp.mozilla.com',
+                     '*.mozilla.com', '1a-b.mozilla.com'):
+            validate_name(name)
+
+    def test_messages(self):
+        self.assertMessage("Invalid name a..b. Empty label.", 'a..b')
+        self.assertMessage("Invalid name a b. Character ' ' is invalid.",
+                           'a b.mozilla.com')
+        self.assertMessage(
+            "Labels must end and begin only with a letter or digit",
+            'web-.mozilla.com'
+        )
+        self.assertMessage(
+            "Labels must end and begin only with a letter or digit", '_'
+        )
+        self.assertMessage("Error: A name must be of type str.", None)
+
+    def test_trailing_newline(self):
+        self.assertRaises(ValidationError, validate_name, 'web1.mozilla.com\n')
+        self.assertRaises(ValidationError, validate_label, 'web1\n')
+
+    def test_label_span(self):
+        with self.assertRaises(ValidationError) as context:
+            validate_label('a.b')
+        self.assertIn("do not span multiple domains",
+                      context.exception.messages[0])
+
+    def test_batch(self):
+        errors = validate_names(
+            ['web1.mozilla.com', 'a..b', 'a..b', 'web-.mozilla.com']
+        )
+        self.assertEqual(set(['a..b', 'web-.mozilla.com']), set(errors))
+        self.assertEqual(["Invalid name a..b. Empty label."],
+                         errors['a..b'].messages)
+        self.assertEqual({}, validate_names([]))
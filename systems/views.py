@@ -1,12 +1,16 @@
+import base64
+import codecs
 import csv
 import re
 import simplejson as json
 from django.views.decorators.csrf import csrf_exempt
-from django.core.exceptions import ValidationError
 from django.urls import reverse
 from django.db import IntegrityError
+from django.core.paginator import Paginator
 from django.db.models import Q
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import (
+    Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+)
 from django.shortcuts import  redirect, get_object_or_404, render, render_to_response
 from django.template import RequestContext
 from django.template.loader import render_to_string
@@ -14,11 +18,15 @@ from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.test.client import RequestFactory
 from django.views.generic.list import ListView
 from reversion.models import Version
-from reversion_compare.mixins import CompareMixin
 from middleware.restrict_to_remote import allow_anyone
 from systems import models
 from systems.models import System, SystemStatus
+from systems.choices import racks_for_site
 from systems.forms import SystemForm
+from systems.fragment_cache import system_fragments
+from systems.hostname_index import hostname_index
+from systems.importer import IMPORT_COLUMNS, SystemImporter
+from systems.search import search_rank
 
 # Use this object to generate request objects for calling tastypie views
 factory = RequestFactory()
@@ -70,15 +78,93 @@ def check_dupe_nic_name(request, system_id, adapter_name): # pylint: disable=unu
 @allow_anyone
 def system_auto_complete_ajax(request):
     query = request.GET['query']
-    system_list = models.System.objects.filter(hostname__icontains=query)
-    hostname_list = [system.hostname for system in system_list]
-    id_list = [system.id for system in system_list]
+    matches = hostname_index.complete(query)
+    hostname_list = [hostname for hostname, _ in matches]
+    id_list = [pk for _, pk in matches]
     ret_dict = {}
     ret_dict['query'] = query
     ret_dict['suggestions'] = hostname_list
     ret_dict['data'] = id_list
     return HttpResponse(json.dumps(ret_dict))
 
+# DataTables column -> ORDER BY fields. The pk is always added last so the
+# order is total, which keyset pagination needs.
+SYSTEM_SORT_FIELDS = {
+    'hostname': ['hostname_sort_key'],
+    'serial': ['serial'],
+    'asset_tag': ['asset_tag'],
+    'server_model': ['server_model__vendor', 'server_model__model'],
+    'system_rack': [
+        'system_rack__site__name', 'system_rack__name', 'rack_order'
+    ],
+    'oob_ip': ['oob_ip'],
+    'system_status': ['system_status__status'],
+}
+
+
+# Columns fetched for each row of the systems list. Related names are
+# joined in the same query.
+SYSTEM_LIST_VALUES = (
+    'id', 'hostname', 'hostname_sort_key', 'serial', 'asset_tag', 'oob_ip',
+    'rack_order', 'server_model', 'server_model__vendor',
+    'server_model__model', 'system_rack', 'system_rack__name',
+    'system_rack__site', 'system_rack__site__name', 'system_status',
+    'system_status__status',
+)
+
+# Rows encoded per chunk handed to the response
+SYSTEM_LIST_STREAM_ROWS = 100
+
+
+def encode_cursor(sort_key, pk):
+    """ opaque keyset cursor pointing just after (sort_key, pk) """
+    return base64.urlsafe_b64encode(
+        json.dumps([sort_key, pk]).encode('utf-8')
+    ).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """ return the (hostname_sort_key, pk) in `cursor` or None """
+    try:
+        sort_key, pk = json.loads(base64.urlsafe_b64decode(
+            cursor.encode('ascii')
+        ).decode('utf-8'))
+        return str(sort_key), int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def page_systems(systems, sort_col, sort_dir, start, length, cursor=None):
+    """
+    Sort `systems` in the database and return the queryset for one page.
+
+    Hostname sorting uses the indexed natural sort key, and when a cursor
+    from the previous page is passed in the page is found by seeking to
+    (hostname_sort_key, pk) instead of with OFFSET, so deep pages cost the
+    same as the first one. Other columns are paged with OFFSET. A negative
+    `length` returns everything from `start` on.
+    """
+    fields = SYSTEM_SORT_FIELDS[sort_col] + ['pk']
+    lookup = 'gt'
+    if sort_dir == 'desc':
+        fields = ['-' + field for field in fields]
+        lookup = 'lt'
+    systems = systems.order_by(*fields)
+
+    after = decode_cursor(cursor) if sort_col == 'hostname' and cursor else None
+    if after:
+        sort_key, pk = after
+        systems = systems.filter(
+            Q(**{'hostname_sort_key__' + lookup: sort_key}) |
+            Q(**{'hostname_sort_key': sort_key, 'pk__' + lookup: pk})
+        )
+        start = 0
+
+    if length < 0:
+        return systems[start:]
+    return systems[start:start + length]
+
+
 @allow_anyone
 def list_all_systems_ajax(request):
 #iSortCol_0 = which column is sorted
@@ -98,12 +184,14 @@ def list_all_systems_ajax(request):
         sort_col = cols[int(request.GET['iSortCol_0'])]
 
     sort_dir = 'asc'
-    if 'sSortDir_0' in request.GET:
-        sort_dir = request.GET['sSortDir_0']
+    if request.GET.get('sSortDir_0') == 'desc':
+        sort_dir = 'desc'
 
 
-    if 'sEcho' in request.GET:
-        sEcho = request.GET['sEcho']
+    try:
+        sEcho = int(request.GET.get('sEcho', 0))
+    except ValueError:
+        sEcho = 0
 
     if 'sSearch' in request.GET and request.GET['sSearch'] > '':
         search_term = request.GET['sSearch']
@@ -121,145 +209,104 @@ def list_all_systems_ajax(request):
     else:
         iDisplayStart = 0
 
+    cursor = request.GET.get('sCursor')
+
+    iDisplayStart, iDisplayLength = int(iDisplayStart), int(iDisplayLength)
     if search_term is None:
-        end_display = int(iDisplayStart) + int(iDisplayLength)
-        system_count = models.System.objects.all().count()
-        systems = models.System.objects.all()[int(iDisplayStart):int(end_display)]
-        the_data = build_json(
-            request,
-            systems,
-            sEcho,
-            system_count,
-            iDisplayLength,
-            sort_col,
-            sort_dir
-        )
+        systems = models.System.objects.all()
+        total_count = systems.count()
 
     if search_term is not None and len(search_term) > 0: # pylint: disable=len-as-condition
-        if search_term.startswith('/') and len(search_term) > 1:
-            try:
-                search_term = search_term[1:]
-                search_q = Q(hostname__regex=search_term)
-            except: # pylint: disable=bare-except
-                search_q = Q(hostname__icontains=search_term)
-        else:
-            search_q = Q(hostname__icontains=search_term)
-        search_q |= Q(serial__icontains=search_term)
-        search_q |= Q(notes__icontains=search_term)
-        search_q |= Q(asset_tag=search_term)
-        search_q |= Q(oob_ip__icontains=search_term)
-        search_q |= Q(keyvalue__value__icontains=search_term)
+        systems = models.System.objects.filter(
+            pk__in=models.SystemSearchDocument.matching(search_term)
+        )
         try:
-            total_count = models.System.with_related\
-                .filter(search_q).values('hostname').distinct().count()
+            # Also catches bad /regex searches before we start streaming
+            total_count = systems.count()
         except: # pylint: disable=bare-except
-            total_count = 0
-        end_display = int(iDisplayStart) + int(iDisplayLength)
-        try:
-            systems = models.System.objects.filter(
-                pk__in=models.System.with_related\
-                    .filter(search_q).values_list('id', flat=True).distinct()
-            )[int(iDisplayStart):int(end_display)]
-            the_data = build_json(
-                request,
-                systems,
-                sEcho,
-                total_count,
-                iDisplayLength,
-                sort_col,
-                sort_dir
+            return HttpResponse(
+                '{"sEcho": %i, "iTotalRecords":0, "iTotalDisplayRecords":0, "aaData":[]}' % (sEcho), # pylint: disable=line-too-long
+                content_type='application/json'
             )
-        except: # pylint: disable=bare-except
-            the_data = '{"sEcho": %s, "iTotalRecords":0, "iTotalDisplayRecords":0, "aaData":[]}' % (sEcho) # pylint: disable=line-too-long
-    return HttpResponse(the_data)
-
-def build_json(request, systems, sEcho, total_records, display_count, sort_col, sort_dir):
-    system_list = []
-    for system in systems:
-        if system.serial is not None:
-            serial = system.serial.strip()
-        else:
-            serial = ''
 
-        if system.server_model is not None:
-            server_model = str(system.server_model)
-        else:
-            server_model = ''
-        if system.system_rack is not None:
-            system_rack = "%s - %s" % (str(system.system_rack), system.rack_order)
-            system_rack_id = str(system.system_rack.id)
-        else:
-            system_rack = ''
-            system_rack_id = ''
-
-        if system.system_status is not None:
-            system_status = str(system.system_status)
-        else:
-            system_status = ''
-
-        if system.asset_tag is not None:
-            asset_tag = system.asset_tag.strip()
-        else:
-            asset_tag = ''
-        if system.oob_ip is not None:
-            oob_ip = system.oob_ip.strip()
-        else:
-            oob_ip = ''
+    systems = page_systems(
+        systems, sort_col, sort_dir, iDisplayStart, iDisplayLength, cursor
+    )
+    return StreamingHttpResponse(
+        stream_systems_json(
+            request, systems, sEcho, total_count, sort_col, iDisplayLength
+        ),
+        content_type='application/json'
+    )
 
-        ro = getattr(request, 'read_only', False)
-        if ro:
-            system_id = 0
+def system_list_row(row, read_only=False):
+    """ the DataTables row for a dict of SYSTEM_LIST_VALUES """
+    system_id = 0 if read_only else row['id']
+    if row['system_rack'] is not None:
+        if row['system_rack__site'] is not None:
+            rack = "{} - {}".format(
+                row['system_rack__site__name'], row['system_rack__name']
+            )
         else:
-            system_id = system.id
-
-        system_list.append(
-            {
-                'hostname': system.hostname.strip(),
-                'oob_ip': oob_ip,
-                'serial': serial,
-                'asset_tag': asset_tag,
-                'server_model': server_model,
-                'system_rack':system_rack,
-                'system_status':system_status,
-                'id':system_id,
-                'system_rack_id': system_rack_id
-            }
+            rack = row['system_rack__name']
+        system_rack = "%s,%s - %s" % (
+            row['system_rack'], rack, row['rack_order']
         )
-
-    the_data = '{"sEcho": %s, "iTotalRecords":0, "iTotalDisplayRecords":0, "aaData":[]}' % (sEcho)
-
-    #try:
-    if system_list:
-        system_list.sort(key=lambda x: alphanum_key(x[sort_col]))
-        if sort_dir == 'desc':
-            system_list.reverse()
-        the_data = '{"sEcho": %s, "iTotalRecords":%i, "iTotalDisplayRecords":%i, "aaData":[' % (
-            sEcho,
-            total_records,
-            total_records
+    else:
+        system_rack = ','
+    if row['server_model'] is not None:
+        server_model = "%s - %s" % (
+            row['server_model__vendor'], row['server_model__model']
         )
-        counter = 0
-        for system in system_list:
-            if int(counter) < int(display_count):
-                the_data += '["%i,%s","%s","%s","%s","%s,%s", "%s", "%s", "%i"],' % (
-                    system['id'],
-                    system['hostname'],
-                    system['serial'],
-                    system['asset_tag'],
-                    system['server_model'],
-                    system['system_rack_id'],
-                    system['system_rack'],
-                    system['oob_ip'],
-                    system['system_status'],
-                    system['id']
-                )
-                counter += 1
-            else:
-                counter = display_count
-        the_data = the_data[:-1]
-        the_data += ']}'
+    else:
+        server_model = ''
+    return [
+        "%i,%s" % (system_id, row['hostname'].strip()),
+        (row['serial'] or '').strip(),
+        (row['asset_tag'] or '').strip(),
+        server_model,
+        system_rack,
+        (row['oob_ip'] or '').strip(),
+        row['system_status__status'] or '',
+        "%i" % system_id,
+    ]
 
-    return the_data
+
+def stream_systems_json(request, systems, sEcho, total_records, sort_col,
+                        length):
+    """
+    Encode a page of systems as a DataTables response a chunk of rows at a
+    time, so memory use doesn't grow with the page size. When the page is
+    sorted by hostname and full, the response also carries the sNextCursor
+    for the page after it.
+    """
+    read_only = getattr(request, 'read_only', False)
+    yield '{"sEcho": %i, "iTotalRecords": %i, "iTotalDisplayRecords": %i, "aaData": [' % ( # pylint: disable=line-too-long
+        sEcho,
+        total_records,
+        total_records
+    )
+    separator = ''
+    chunk = []
+    count = 0
+    last = None
+    for row in systems.values(*SYSTEM_LIST_VALUES).iterator():
+        chunk.append(json.dumps(system_list_row(row, read_only)))
+        count += 1
+        last = row
+        if len(chunk) >= SYSTEM_LIST_STREAM_ROWS:
+            yield separator + ','.join(chunk)
+            separator = ','
+            chunk = []
+    if chunk:
+        yield separator + ','.join(chunk)
+
+    if sort_col == 'hostname' and last is not None and count == length:
+        yield '], "sNextCursor": %s}' % json.dumps(
+            encode_cursor(last['hostname_sort_key'], last['id'])
+        )
+    else:
+        yield ']}'
 
 
 #@ldap_group_required('build')
@@ -275,11 +322,16 @@ def home(request): # pylint: disable=unused-argument
 def system_quicksearch_ajax(request):
     """Returns systems sort table"""
     search_term = request.POST['quicksearch']
-    search_q = Q(hostname__icontains=search_term)
-    search_q |= Q(serial__contains=search_term)
-    search_q |= Q(notes__contains=search_term)
-    search_q |= Q(asset_tag=search_term)
-    systems = models.System.with_related.filter(search_q).order_by('hostname')
+    systems = models.System.objects.filter(
+        pk__in=models.SystemSearchDocument.matching(search_term)
+    ).select_related('operating_system', 'server_model', 'system_rack')
+    if search_term.startswith('/'):
+        systems = systems.order_by('hostname_sort_key')
+    else:
+        systems = sorted(systems, key=lambda system: (
+            search_rank(search_term, system.hostname),
+            system.hostname_sort_key
+        ))
     if 'is_test' not in request.POST:
         return render_to_response('systems/quicksearch.html', {
             'systems': systems,
@@ -553,59 +605,91 @@ def sync_external_data_ajax(request):
     }))
 
 
-@allow_anyone
-def system_show(request, a_id):
-    system = get_object_or_404(models.System, pk=a_id)
-    if system.notes:
-        system.notes = system.notes.replace("\n", "<br />")
-    show_nics_in_key_value = False
-    is_release = False
+# Related rows shown on the system page
+SYSTEM_SHOW_RELATED = (
+    'operating_system', 'system_type', 'system_status', 'server_model',
+    'system_rack__site',
+)
+
+
+def warranty_link(system):
     if (system.serial and
             system.server_model and
             system.server_model.part_number and
             system.server_model.vendor == "HP"):
+        return "http://www11.itrc.hp.com/service/ewarranty/warrantyResults.do?productNumber=%s&serialNumber1=%s&country=US" % (system.server_model.part_number, system.serial)  # noqa pylint: disable=line-too-long
+    return None
 
-        system.warranty_link = "http://www11.itrc.hp.com/service/ewarranty/warrantyResults.do?productNumber=%s&serialNumber1=%s&country=US" % (system.server_model.part_number, system.serial)  # noqa pylint: disable=line-too-long
-    if show_nics_in_key_value:
-        key_values = system.keyvalue_set.all()
-    else:
-        key_values = system.keyvalue_set.exclude(key__istartswith='nic.')
-
-    sregs = []
-    groups = []
 
-    object_search_str = "(/^{0}$".format(system)
-    for sreg in filter(lambda sreg: not sreg.decommissioned, sregs):
-        object_search_str += " OR /^{0}$".format(sreg.fqdn)
-        object_search_str += " OR /^{0}$".format(sreg.ip_str)
-    object_search_str += " ) AND !type=:sreg AND !type=:sys"
+@allow_anyone
+def system_show(request, a_id):
+    # The only query when the page is cached: whether the system exists and
+    # which revision it is at.
+    row = System.objects.filter(pk=a_id).values_list(
+        'pk', 'hostname', 'current_revision'
+    ).first()
+    if row is None:
+        raise Http404
+    pk, hostname, current_revision = row
+    read_only = getattr(request, 'read_only', False)
+
+    def render_body():
+        system = get_object_or_404(
+            System.objects.select_related(*SYSTEM_SHOW_RELATED), pk=pk
+        )
+        if system.notes:
+            system.notes = system.notes.replace("\n", "<br />")
+        show_nics_in_key_value = False
+        is_release = False
+        system.warranty_link = warranty_link(system)
+        if show_nics_in_key_value:
+            key_values = system.keyvalue_set.all()
+        else:
+            key_values = system.keyvalue_set.exclude(key__istartswith='nic.')
+
+        sregs = []
+        groups = []
+
+        object_search_str = "(/^{0}$".format(system)
+        for sreg in filter(lambda sreg: not sreg.decommissioned, sregs):
+            object_search_str += " OR /^{0}$".format(sreg.fqdn)
+            object_search_str += " OR /^{0}$".format(sreg.ip_str)
+        object_search_str += " ) AND !type=:sreg AND !type=:sys"
+
+        return render_to_string('systems/system_show_body.html', {
+            'system': system,
+            'object_search_str': object_search_str,
+            'sregs': sregs,
+            'groups': groups,
+            'key_values': list(key_values),
+            'is_release': is_release,
+            'read_only': read_only,
+        }, request=request)
 
     return render(request, 'systems/system_show.html', {
-        'system': system,
-        'object_search_str': object_search_str,
-        'sregs': sregs,
-        'groups': groups,
-        'key_values': key_values,
-        'is_release': is_release,
-        'read_only': getattr(request, 'read_only', False),
+        'hostname': hostname,
+        'body': system_fragments.get_or_render(
+            pk, (current_revision, read_only), render_body
+        ),
     })
 
 
 @allow_anyone
 def system_show_by_asset_tag(request, a_id):
-    system = get_object_or_404(models.System, asset_tag=a_id)
-    if (system.serial and
-            system.server_model and
-            system.server_model.part_number and
-            system.server_model.vendor == "HP"):
-
-        system.warranty_link = "http://www11.itrc.hp.com/service/ewarranty/warrantyResults.do?productNumber=%s&serialNumber1=%s&country=US" % (system.server_model.part_number, system.serial) # pylint: disable=line-too-long
+    system = get_object_or_404(
+        System.objects.select_related(*SYSTEM_SHOW_RELATED), asset_tag=a_id
+    )
+    system.warranty_link = warranty_link(system)
+    read_only = getattr(request, 'read_only', False)
 
-    return render_to_response('systems/system_show.html', {
-        'system': system,
-        'is_release': True,
-        'read_only': getattr(request, 'read_only', False),
-    }, RequestContext(request))
+    return render(request, 'systems/system_show.html', {
+        'hostname': system.hostname,
+        'body': render_to_string('systems/system_show_body.html', {
+            'system': system,
+            'is_release': True,
+            'read_only': read_only,
+        }, request=request),
+    })
 
 
 def system_view(request, template, data, instance=None):
@@ -631,14 +715,24 @@ def system_view(request, template, data, instance=None):
 def system_new(request):
     return system_view(request, 'systems/system_new.html', {})
 
+
+# Revisions listed per page of the edit page's history tab
+REVISION_HISTORY_PAGE_SIZE = 50
+
+
 @csrf_exempt
 def system_edit(request, a_id):
     system = get_object_or_404(models.System, pk=a_id)
-    versions = Version.objects.get_for_object(system)
+    versions = Version.objects.get_for_object(system).select_related(
+        'revision__user'
+    )
+    history = Paginator(versions, REVISION_HISTORY_PAGE_SIZE).get_page(
+        request.GET.get('history_page')
+    )
 
     return system_view(request, 'systems/system_edit.html', {
         'system': system,
-        'revision_history':versions
+        'revision_history': history,
     }, system)
 
 
@@ -676,53 +770,63 @@ def system_delete(request, a_id):
     return redirect(home)
 
 
-def system_csv(request): # pylint: disable=unused-argument
-    systems = models.System.objects.all().order_by('hostname')
+SYSTEM_CSV_HEADER = [
+    'Host Name',
+    'Serial',
+    'Asset Tag',
+    'Model',
+    'Allocation',
+    'Rack',
+    'Switch Ports',
+    'OOB IP'
+]
 
-    response = HttpResponse(mimetype='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=systems.csv'
+# Rows fetched from the database cursor per round trip
+SYSTEM_CSV_CHUNK_SIZE = 2000
 
-    writer = csv.writer(response)
-    writer.writerow(
-        [
-            'Host Name',
-            'Serial',
-            'Asset Tag',
-            'Model',
-            'Allocation',
-            'Rack',
-            'Switch Ports',
-            'OOB IP'
-        ]
+
+class Echo(object):
+    """ file-like object handing back whatever csv.writer writes to it """
+    def write(self, value): # pylint: disable=no-self-use
+        return value
+
+
+def system_csv_rows():
+    """
+    Yield the rows of the systems CSV export. The model and rack names are
+    joined in the same query and rows are read in chunks, so memory use
+    doesn't depend on the number of systems.
+    """
+    yield SYSTEM_CSV_HEADER
+    systems = models.System.objects.order_by('hostname').values_list(
+        'hostname', 'serial', 'asset_tag', 'server_model',
+        'server_model__vendor', 'server_model__model', 'system_rack',
+        'system_rack__name', 'system_rack__site', 'system_rack__site__name',
+        'switch_ports', 'oob_ip'
     )
-    for s in systems:
-        try:
-            writer.writerow(
-                [
-                    s.hostname,
-                    s.serial,
-                    s.asset_tag,
-                    s.server_model,
-                    s.system_rack,
-                    s.switch_ports,
-                    s.oob_ip
-                ]
-            )
-        except: # pylint: disable=bare-except
-            writer.writerow(
-                [
-                    s.hostname,
-                    s.serial,
-                    s.asset_tag,
-                    s.server_model,
-                    '',
-                    s.system_rack,
-                    s.switch_ports,
-                    s.oob_ip
-                ]
-            )
+    for (hostname, serial, asset_tag, server_model, vendor, model, rack,
+         rack_name, site, site_name, switch_ports, oob_ip) in \
+            systems.iterator(chunk_size=SYSTEM_CSV_CHUNK_SIZE):
+        if server_model is not None:
+            server_model = "%s - %s" % (vendor, model)
+        if rack is not None:
+            if site is not None:
+                rack = "{} - {}".format(site_name, rack_name)
+            else:
+                rack = rack_name
+        yield [
+            hostname, serial, asset_tag, server_model, '', rack,
+            switch_ports, oob_ip
+        ]
 
 
+def system_csv(request): # pylint: disable=unused-argument
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in system_csv_rows()),
+        content_type='text/csv'
+    )
+    response['Content-Disposition'] = 'attachment; filename=systems.csv'
     return response
 
 def get_expanded_key_value_store(request, system_id):
@@ -776,16 +880,9 @@ def new_rack_system_ajax(request, rack_id):
 @allow_anyone
 def racks_by_site(request, site_pk=0): # pylint: disable=unused-argument
     ret_list = []
-    if int(site_pk) > 0:
-        site = models.Site.objects.get(id=site_pk)
-        l_racks = models.SystemRack.objects\
-            .select_related('site')\
-            .filter(site=site).order_by('name')
-    else:
-        l_racks = models.SystemRack.objects.select_related('site').order_by('site', 'name')
-
-    for r in l_racks:
-        ret_list.append({'name':'%s %s' % (r.site.full_name if r.site else '', r.name), 'id':r.id})
+    site_id = int(site_pk) if int(site_pk) > 0 else None
+    for pk, site_name, name in racks_for_site(site_id):
+        ret_list.append({'name':'%s %s' % (site_name or '', name), 'id':pk})
     return HttpResponse(json.dumps(ret_list))
 
 @allow_anyone
@@ -800,10 +897,9 @@ def racks(request):
         site_id = request.GET['site']
         has_query = True
         if site_id and int(site_id) > 0:
-            site = models.Site.objects.get(id=site_id)
             filter_form.fields['rack'].choices = [('', 'ALL')] + [
-                (m.id, m.site.full_name + ' ' +  m.name)
-                for m in models.SystemRack.objects.filter(site=site).order_by('name')
+                (pk, site_name + ' ' +  name)
+                for pk, site_name, name in racks_for_site(int(site_id))
             ]
     else:
         has_query = False
@@ -820,17 +916,14 @@ def racks(request):
             system_query &= Q(system_status=filter_form.cleaned_data['status'])
             has_query = True
         if not filter_form.cleaned_data['show_decommissioned']:
-            decommissioned = models.SystemStatus.objects.get(status='decommissioned')
-            system_query = system_query & ~Q(system_status=decommissioned)
+            decommissioned = models.SystemStatus.get_id('decommissioned')
+            if decommissioned is not None:
+                system_query = system_query & ~Q(system_status=decommissioned)
 
-    ##Here we create an object to hold decommissioned systems for the following filter
     if not has_query:
         l_racks = []
     else:
-        l_racks = [(k, list(k.system_set.select_related(
-            'server_model',
-            'system_status',
-        ).filter(system_query).order_by('-rack_order'))) for k in l_racks]
+        l_racks = models.SystemRack.with_systems(l_racks, system_query)
 
     return render_to_response('systems/racks.html', {
         'racks': l_racks,
@@ -869,11 +962,10 @@ class OperatingSystemListView(ListView):
     model = models.OperatingSystem
     template_name = "operating_system_list"
 
-class SystemRevision(CompareMixin, UpdateView):
+class SystemRevision(UpdateView):
     template_name = "systems/revision_confirm_restore.html"
     model = Version
     fields = '__all__'
-    compare_exclude = ['current_revision']
 
     def get_queryset(self):
         self.queryset = Version.objects.all()
@@ -889,18 +981,24 @@ class SystemRevision(CompareMixin, UpdateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        _id = self.kwargs['pk']
-        version = Version.objects.get(pk=_id)
-        system = System.objects.get(pk=version.object_id)
-        if system.current_revision > 0:
-            current = Version.objects.get(pk=system.current_revision)
-        else:
-            current = Version.objects.get_for_object(version.object).last()
+        version = self.object
+        system_id = int(version.object_id)
+        current = System.objects.filter(pk=system_id).values_list(
+            'current_revision', flat=True
+        ).first()
+        if not current:
+            current = Version.objects.get_for_object_reference(
+                System, system_id
+            ).values_list('pk', flat=True).first()
 
         context['revision'] = version
         context['current'] = current
-        compare = self.compare(version.object, current, version)[0]
-        context['compare'] = compare
+        # (field, current value, value in this revision)
+        context['compare'] = models.SystemRevisionDiff.labelled(
+            models.SystemRevisionDiff.changes_between(
+                system_id, current, version.pk
+            )
+        )
         return context
 
 def rack_delete(request, object_id):
@@ -1065,64 +1163,14 @@ def server_model_list(request):
 def csv_import(request):
     from .forms import CSVImportForm
 
-    def generic_getter(field):
-        return field
-
-    def uppercase_getter(field):
-        return field.upper()
-
-    def system_status_getter(field):
-        try:
-            return models.SystemStatus.objects.get(status=field)
-        except models.SystemStatus.DoesNotExist:
-            return
-
-    def server_model_getter(field):
-        try:
-            return models.ServerModel.objects.get(id=field)
-        except models.ServerModel.DoesNotExist:
-            return
-
-    def rack_getter(field):
-        try:
-            return models.SystemRack.objects.get(name=field)
-        except models.SystemRack.DoesNotExist:
-            return None
-
-    ALLOWED_COLUMNS = {
-        'hostname': generic_getter,
-        'asset_tag': generic_getter,
-        'serial': uppercase_getter,
-        'notes': generic_getter,
-        'oob_ip': generic_getter,
-        'system_status': system_status_getter,
-        'system_rack': rack_getter,
-        'rack_order': generic_getter,
-        'server_model': server_model_getter,
-        'purchase_price': generic_getter,
-    }
-
     new_systems = 0
+    errors = []
     if request.method == 'POST':
         form = CSVImportForm(request.POST, request.FILES)
         if form.is_valid():
-            csv_reader = csv.reader(form.cleaned_data['csv'])
-            headers = csv_reader.next()
-            for line in csv_reader:
-                cur_data = dict(zip(headers, line))
-
-                system_data = dict(
-                    (a, getter(cur_data.get(a, None)))
-                    for a, getter in ALLOWED_COLUMNS.iteritems())
-
-                s = models.System(**system_data)
-                try:
-                    s.full_clean()
-                except ValidationError as exc:
-                    print(exc)
-                else:
-                    s.save()
-                    new_systems += 1
+            lines = codecs.iterdecode(form.cleaned_data['csv'], 'utf-8-sig')
+            result = SystemImporter(user=request.user).run(csv.reader(lines))
+            new_systems, errors = result.created, result.errors
             form = None
     else:
         form = CSVImportForm()
@@ -1131,7 +1179,8 @@ def csv_import(request):
         'systems/csv_import.html',
         {
             'form': form,
-            'allowed_columns': ALLOWED_COLUMNS,
+            'allowed_columns': IMPORT_COLUMNS,
             'new_systems': new_systems,
+            'errors': errors,
         },
         RequestContext(request))
@@ -24,6 +24,10 @@ system_root = apiviews.SystemViewSet.as_view({
         'post': 'create',
 })
 
+system_bulk = apiviews.SystemViewSet.as_view({
+        'post': 'bulk',
+})
+
 router = routers.DefaultRouter()
 router.register(r'systemstatus', apiviews.SystemStatusViewSet)
 router.register(r'servermodel', apiviews.ServerModelViewSet)
@@ -44,6 +48,7 @@ urlpatterns = [
 #    url(r'^admin/', include(admin.site.urls)),
 #    url(r'^api/', include(router.urls)),
     url(r'^tokenapi/systems/$', system_root, name="tokenapi-system-root"),
+    url(r'^tokenapi/systems/bulk/$', system_bulk, name="tokenapi-system-bulk"),
     url(r'^tokenapi/systems/(?P<pk>.+)/$', system_detail, name="tokenapi-system-detail"),
     url(r'^tokenapi/', include(router.urls)),
     url(r'^$', system_views.home, name='system-home'),